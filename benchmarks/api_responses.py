@@ -0,0 +1,165 @@
+"""
+Local load test of the API lookup routes, with and without the fast response path.
+
+Starts the API with uvicorn in a subprocess, over an in-memory catalogue
+holding one title with many chapters and image lists, in offline mode so no
+request reaches the site. Keep-alive clients then hammer ``/manga``,
+``/chapters`` and ``/images`` for a fixed time, first with
+``DOUDESU_RESPONSE_CACHE=0`` (FastAPI validation and serialization, a
+catalogue lookup per request) and then with the cached, pre-serialized path.
+
+Requires ``doudesu[api]``.
+
+Usage:
+    python benchmarks/api_responses.py [--seconds 5] [--clients 8] [--chapters 400] [--images 120]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+TITLE_URL = "https://doujindesu.tv/manga/benchmark-title/"
+
+
+def chapter_url(number: int) -> str:
+    return f"https://doujindesu.tv/benchmark-title-chapter-{number}/"
+
+
+def serve(port: int, chapters: int, images: int):
+    """Run the API on ``port`` over a populated in-memory catalogue."""
+    import uvicorn
+
+    from doudesu.core import catalog as catalog_module
+    from doudesu.core.doudesu import Doujindesu
+    from doudesu.models import DetailsResult
+
+    catalog = catalog_module.Catalog(":memory:", max_age=3600, images_max_age=3600)
+    catalog.put_details(
+        DetailsResult(
+            name="Benchmark Title",
+            url=TITLE_URL,
+            thumbnail="https://desu.photos/storage/uploads/thumbnail/benchmark.webp",
+            genre=[f"Genre {i}" for i in range(12)],
+            series="Original",
+            author="Someone",
+            type="Manga",
+            score=8.5,
+            status="Publishing",
+            chapter_urls=[chapter_url(i) for i in range(1, chapters + 1)],
+        )
+    )
+    for i in range(1, 11):
+        catalog.put_images(
+            chapter_url(i),
+            [f"https://desu.photos/storage/uploads/chapter/{i}/{page:03d}.webp" for page in range(1, images + 1)],
+        )
+    catalog_module._catalog = catalog
+    Doujindesu.offline = True
+
+    from doudesu.api import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def load(port: int, paths: list[str], seconds: float, clients: int) -> tuple[float, float, int]:
+    """Requests per second, median latency in seconds and bytes per response over ``seconds``."""
+    latencies: list[list[float]] = [[] for _ in range(clients)]
+    size = [0]
+    deadline = time.monotonic() + seconds
+
+    def client(index: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        n = index
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            conn.request("GET", paths[n % len(paths)])
+            response = conn.getresponse()
+            body = response.read()
+            latencies[index].append(time.perf_counter() - start)
+            if response.status != 200:
+                raise RuntimeError(f"{paths[n % len(paths)]}: {response.status} {body[:200]!r}")
+            size[0] = len(body)
+            n += 1
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    samples = [latency for client_latencies in latencies for latency in client_latencies]
+    return len(samples) / elapsed, statistics.median(samples), size[0]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Load time per route and variant (default: 5)")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent keep-alive clients (default: 8)")
+    parser.add_argument("--chapters", type=int, default=400, help="Chapters of the title (default: 400)")
+    parser.add_argument("--images", type=int, default=120, help="Images per chapter (default: 120)")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.serve:
+        serve(opts.serve, opts.chapters, opts.images)
+        return 0
+
+    routes = {
+        "/manga": [f"/manga/{quote(TITLE_URL, safe='')}"],
+        "/chapters": [f"/chapters/{quote(TITLE_URL, safe='')}"],
+        "/images": [f"/images/{quote(chapter_url(i), safe='')}" for i in range(1, 11)],
+    }
+    results: dict[str, dict[str, tuple[float, float, int]]] = {}
+    for variant, enabled in (("before", "0"), ("after", "1")):
+        port = free_port()
+        env = {**os.environ, "DOUDESU_RESPONSE_CACHE": enabled}
+        size_args = ["--chapters", str(opts.chapters), "--images", str(opts.images)]
+        server = subprocess.Popen([sys.executable, __file__, "--serve", str(port), *size_args], env=env)
+        try:
+            wait_for(port)
+            for route, paths in routes.items():
+                load(port, paths, 0.5, opts.clients)  # warm up
+                results.setdefault(route, {})[variant] = load(port, paths, opts.seconds, opts.clients)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{opts.clients} clients, {opts.seconds:.0f}s per route; before: DOUDESU_RESPONSE_CACHE=0, after: default")
+    print(f"{'route':<10} {'size':>9} {'before':>12} {'after':>12} {'speedup':>8} {'p50 before':>11} {'p50 after':>10}")
+    for route, variants in results.items():
+        (old_rps, old_p50, size), (new_rps, new_p50, _) = variants["before"], variants["after"]
+        print(
+            f"{route:<10} {size / 1000:7.1f}KB {old_rps:8.0f} rps {new_rps:8.0f} rps {new_rps / old_rps:7.1f}x "
+            f"{old_p50 * 1000:9.1f}ms {new_p50 * 1000:8.1f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
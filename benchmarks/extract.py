@@ -0,0 +1,151 @@
+"""
+Microbenchmark of image URL, chapter ID and chapter number extraction.
+
+Compares :mod:`doudesu.utils.extract` with the extraction it replaced: an
+uncompiled ``src="(.*?)"`` ``findall`` over the decoded chapter API response,
+``load_data`` searched in the prettified BeautifulSoup tree of the chapter
+page, and a ``chapter-N`` search per chapter URL.
+
+Responses are read from ``--responses DIR``: ``*.chapter.html`` files are
+chapter pages and ``*.images.html`` files chapter API answers. Record real
+ones with ``--record CHAPTER_URL``; without any, representative synthetic
+responses are generated.
+
+Usage:
+    python benchmarks/extract.py [--responses DIR] [--record CHAPTER_URL] [--runs 5]
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+OLD_IMAGE_SRC_PATTERN = r"src=\"(.*?)\""
+OLD_CHAPTER_ID_PATTERN = r"load_data\((\d+)\)"
+
+
+def record(chapter_url: str, directory: Path):
+    """Save the chapter page and its chapter API answer under ``directory``."""
+    from doudesu.core import Doujindesu
+    from doudesu.utils.constants import CHAPTER_API_ENDPOINT
+
+    manga = Doujindesu(chapter_url)
+    name = chapter_url.rstrip("/").rsplit("/", 1)[-1]
+    with manga._session() as ses:
+        page = ses.get(chapter_url).content
+        chapter_id = manga.get_id(page)
+        images = ses.post(CHAPTER_API_ENDPOINT, data={"id": chapter_id}).content
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{name}.chapter.html").write_bytes(page)
+    (directory / f"{name}.images.html").write_bytes(images)
+    print(f"recorded {name}: page {len(page)} bytes, images {len(images)} bytes")
+
+
+def synthetic() -> tuple[list[bytes], list[bytes]]:
+    """A chapter page padded with markup and scripts, and a chapter API answer of 40 pages."""
+    filler = "".join(
+        f'<div class="item"><a href="/manga/title-{i}/"><img src="https://cdn.example.com/thumb/{i}.webp"'
+        f' alt="Title {i}" loading="lazy"></a><span class="eps">Chapter {i}</span></div>\n'
+        for i in range(400)
+    )
+    script = "<script>" + "var x = 'abcdefghij';" * 3000 + "</script>"
+    page = f"<html><head>{script}</head><body>{filler}<script>load_data(123456);</script></body></html>"
+    images = "".join(
+        f'<img src="https://desu.photos/storage/uploads/chapter/123456/{i:03d}.webp" alt="Page {i}">\n' for i in range(1, 41)
+    )
+    return [page.encode()], [images.encode()]
+
+
+def load(directory: Path) -> tuple[list[bytes], list[bytes]]:
+    pages = [path.read_bytes() for path in sorted(directory.glob("*.chapter.html"))]
+    images = [path.read_bytes() for path in sorted(directory.glob("*.images.html"))]
+    return pages, images
+
+
+def bench(fn: Callable[[], object], runs: int, min_time: float = 0.2) -> float:
+    """Median seconds per call of ``fn`` over ``runs`` timed batches."""
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / runs or calls >= 1 << 20:
+            break
+        calls *= 2
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - start) / calls)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=Path, help="Directory of recorded responses")
+    parser.add_argument("--record", metavar="CHAPTER_URL", help="Record a chapter into --responses and exit")
+    parser.add_argument("--runs", type=int, default=5, help="Timed batches per case (default: 5)")
+    opts = parser.parse_args()
+
+    if opts.record:
+        if not opts.responses:
+            parser.error("--record needs --responses")
+        record(opts.record, opts.responses)
+        return 0
+
+    from bs4 import BeautifulSoup as Bs
+
+    from doudesu.utils import extract
+
+    pages, images = load(opts.responses) if opts.responses else ([], [])
+    source = str(opts.responses)
+    if not pages or not images:
+        pages, images = synthetic()
+        source = "synthetic responses"
+    chapter_urls = [f"https://doujindesu.tv/title-chapter-{i}/" for i in range(1, 501)]
+
+    for body in images:
+        old = re.findall(OLD_IMAGE_SRC_PATTERN, body.decode())
+        new = extract.image_urls(body)
+        if [url for url in old if url.startswith(("http://", "https://"))] != new:
+            print("FAIL: extracted image URLs differ")
+            return 1
+
+    cases = [
+        (
+            "image URLs (chapter API)",
+            lambda: [re.findall(OLD_IMAGE_SRC_PATTERN, body.decode()) for body in images],
+            lambda: [extract.image_urls(body) for body in images],
+        ),
+        (
+            "chapter ID (regex only)",
+            lambda: [re.search(OLD_CHAPTER_ID_PATTERN, body.decode()) for body in pages],
+            lambda: [extract.chapter_id(body) for body in pages],
+        ),
+        (
+            "chapter ID (page as scraped)",
+            lambda: [re.search(OLD_CHAPTER_ID_PATTERN, Bs(body.decode(), "html.parser").prettify()) for body in pages],
+            lambda: [extract.chapter_id(body) for body in pages],
+        ),
+        (
+            "chapter numbers (500 URLs)",
+            lambda: [re.search(r"chapter-([0-9.-]+)", url) for url in chapter_urls],
+            lambda: [extract.chapter_number(url) for url in chapter_urls],
+        ),
+    ]
+
+    print(f"{len(pages)} chapter pages, {len(images)} chapter API answers from {source}")
+    print(f"{'case':<30} {'before':>12} {'after':>12} {'speedup':>9}")
+    for name, before, after in cases:
+        old, new = bench(before, opts.runs), bench(after, opts.runs)
+        print(f"{name:<30} {old * 1e6:10.1f}us {new * 1e6:10.1f}us {old / new:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+HTTP/1.1 vs HTTP/2 image download benchmark.
+
+Starts a local HTTPS server (hypercorn, self-signed certificate made with
+``openssl``) that serves fake chapter pages with a fixed per-request latency,
+then downloads the same chapter with the ``requests`` transport and with the
+HTTP/2 transport of :class:`~doudesu.utils.converter.ImageDownloader`, and
+reports wall time, pages per second and connections used.
+
+Requires ``doudesu[http2]`` plus ``hypercorn``.
+
+Usage:
+    python benchmarks/http2_images.py [--pages 60] [--size-kb 200] [--latency-ms 50] [--threads 10] [--pool 6]
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def make_certificate(directory: Path) -> tuple[Path, Path]:
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+            "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+            "-keyout", str(key), "-out", str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    return cert, key
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(cert: Path, key: Path, port: int, size: int, latency: float):
+    """Serve ``size`` bytes after ``latency`` seconds on every path, over h2 or HTTP/1.1."""
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    body = bytes(size)
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await asyncio.sleep(latency)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"image/jpeg"), (b"content-length", str(size).encode())],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.certfile = str(cert)
+    config.keyfile = str(key)
+    config.alpn_protocols = ["h2", "http/1.1"]
+    config.loglevel = "WARNING"
+    # A shutdown trigger that never fires keeps hypercorn off signal handlers,
+    # which only work on the main thread.
+    never = lambda: asyncio.Event().wait()  # noqa: E731
+    threading.Thread(target=lambda: asyncio.run(serve(app, config, shutdown_trigger=never)), daemon=True).start()
+
+
+def run(downloader, urls: list[str], threads: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for response in executor.map(downloader.get, urls):
+            response.raise_for_status()
+            assert response.content
+    return time.perf_counter() - started
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60, help="Pages per chapter")
+    parser.add_argument("--size-kb", type=int, default=200, help="Size of each page")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Server latency per request")
+    parser.add_argument("--threads", type=int, default=10, help="Concurrent downloads, like num_threads")
+    parser.add_argument("--pool", type=int, default=6, help="HTTP/1.1 connections per host (pool_maxsize)")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    from doudesu.utils.converter import ImageDownloader
+    from doudesu.utils.ratelimit import RateLimiter, get_rate_limiter
+
+    # Measure the transports, not the politeness limits.
+    limiter = get_rate_limiter()
+    unlimited = RateLimiter(rate=1e9, burst=10**9, initial_concurrency=1024, max_concurrency=1024)
+    limiter.__dict__.update(unlimited.__dict__)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_certificate(Path(tmp))
+        port = free_port()
+        start_server(cert, key, port, args.size_kb * 1024, args.latency_ms / 1000)
+        time.sleep(1)
+
+        results = {}
+        for name, http2 in (("HTTP/1.1 (requests)", False), ("HTTP/2 (httpx)", True)):
+            downloader = ImageDownloader(http2=http2, verify=str(cert), pool_maxsize=args.pool)
+            if http2 and downloader.client is None:
+                print("httpx/h2 not installed, install doudesu[http2]")
+                return 1
+            times = []
+            for run_index in range(args.runs):
+                urls = [f"https://127.0.0.1:{port}/{run_index}/{page}.jpg" for page in range(args.pages)]
+                times.append(run(downloader, urls, args.threads))
+            stats = downloader.stats()[0]
+            downloader.close()
+            results[name] = statistics.median(times)
+            print(
+                f"{name:20} median {results[name] * 1000:7.1f}ms  "
+                f"{args.pages / results[name]:7.1f} pages/s  "
+                f"{stats.connections} connections, {stats.http2}/{stats.requests} over h2"
+            )
+
+    baseline, candidate = results.values()
+    print(f"speedup: {baseline / candidate:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
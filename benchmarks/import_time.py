@@ -0,0 +1,125 @@
+"""
+Import-time benchmark for the ``doudesu`` entry point.
+
+Runs ``python -X importtime -m doudesu --help`` several times, reports the
+median cumulative import time of the ``doudesu`` package and fails if it goes
+over the budget or if any heavy dependency gets imported just to print help.
+
+The ``--search`` and ``--url`` modes can't run offline, so they are measured
+by importing what their handlers import. They need the scraper and rich, but
+must not load the catalogue, jobs, GUI, API or PDF writer before they are
+used.
+
+Usage:
+    python benchmarks/import_time.py [--runs 5] [--budget-ms 50] [--search-budget-ms 400]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Modules that must never be imported by ``doudesu --help``.
+HEAVY_MODULES = (
+    "rich",
+    "bs4",
+    "tls_client",
+    "PIL",
+    "reportlab",
+    "requests",
+    "pydantic",
+    "flet",
+    "fastapi",
+    "uvicorn",
+)
+
+# Modules that must not be imported before ``doudesu --search`` or ``--url`` needs them.
+SEARCH_HEAVY_MODULES = (
+    "PIL",
+    "reportlab",
+    "numpy",
+    "sqlite3",
+    "asyncio",
+    "flet",
+    "fastapi",
+    "uvicorn",
+)
+
+# What run_search() and run_url() import before they touch the network.
+SEARCH_IMPORTS = "import doudesu.__main__; from doudesu.core import Doujindesu; import doudesu.ui.cli"
+
+
+def parse_importtime(stderr: str) -> dict[str, int]:
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        dict[str, int]: Cumulative microseconds per module. Nested imports are
+        prefixed with a ``+`` per level so top-level entries can be told apart.
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        try:
+            timings["+" * depth + name.strip()] = int(cumulative)
+        except ValueError:
+            continue
+    return timings
+
+
+def measure(args: list[str]) -> dict[str, int]:
+    """Run Python once with ``-X importtime`` and ``args`` and return its import timings."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs (default: 5)")
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Budget for doudesu imports (default: 50ms)")
+    parser.add_argument(
+        "--search-budget-ms",
+        type=float,
+        default=400.0,
+        help="Budget for doudesu imports of --search and --url (default: 400ms)",
+    )
+    opts = parser.parse_args()
+
+    cases = [
+        ("--help", ["-m", "doudesu", "--help"], HEAVY_MODULES, opts.budget_ms),
+        ("--search/--url", ["-c", SEARCH_IMPORTS], SEARCH_HEAVY_MODULES, opts.search_budget_ms),
+    ]
+    failed = False
+    for label, args, heavy, budget in cases:
+        samples = []
+        offenders = set()
+        for _ in range(opts.runs):
+            timings = measure(args)
+            samples.append(sum(us for name, us in timings.items() if name.split(".")[0] in ("doudesu", "argparse")))
+            offenders.update(package for package in (name.lstrip("+").split(".")[0] for name in timings) if package in heavy)
+
+        median_ms = statistics.median(samples) / 1000
+        print(f"doudesu {label}: median import time {median_ms:.2f}ms over {opts.runs} runs (budget {budget}ms)")
+        if offenders:
+            print(f"FAIL: heavy modules imported by {label}: {', '.join(sorted(offenders))}")
+            failed = True
+        elif median_ms > budget:
+            print(f"FAIL: {label} import time over budget")
+            failed = True
+
+    if failed:
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
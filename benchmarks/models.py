@@ -0,0 +1,125 @@
+"""
+Construction time and memory of search results: pydantic models vs records.
+
+Builds N search results the way a search page is parsed, with type, status
+and the ``|`` separated genre tags split out of the page text, once as
+pydantic :class:`~doudesu.models.manga.Result` models and once as
+:class:`~doudesu.models.records.ResultRecord` records, and reports the time
+to build them and the memory they hold. Also times turning a page of records
+into pydantic models at the API boundary.
+
+Usage:
+    python benchmarks/models.py [--count 100000] [--runs 3]
+"""
+
+import argparse
+import gc
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+GENRES = [f"Genre{i}" for i in range(60)]
+TYPES = ["Doujinshi", "Manga", "Manhwa"]
+STATUSES = ["Finished", "Publishing"]
+
+
+def raw_rows(count: int) -> list[tuple[str, str, str, str, str]]:
+    """Fields as they come out of a page: name, URL, thumbnail, score, and ``type|status|genre|genre...``."""
+    rng = random.Random(0)
+    rows = []
+    for i in range(count):
+        tags = "|".join([rng.choice(TYPES), rng.choice(STATUSES), *rng.sample(GENRES, rng.randint(3, 8))])
+        rows.append(
+            (
+                f"Title number {i}",
+                f"https://doujindesu.tv/manga/title-number-{i}/",
+                f"https://desu.photos/storage/uploads/thumbnail/{i}.webp",
+                f"{rng.uniform(5, 10):.2f}",
+                tags,
+            )
+        )
+    return rows
+
+
+def build_models(rows) -> list:
+    from doudesu.models import Result
+
+    results = []
+    for name, url, thumbnail, score, tags in rows:
+        type, status, *genre = tags.split("|")
+        results.append(
+            Result(name=name, url=url, thumbnail=thumbnail, genre=genre, type=type, score=float(score), status=status)
+        )
+    return results
+
+
+def build_records(rows) -> list:
+    from doudesu.models import ResultRecord
+
+    results = []
+    for name, url, thumbnail, score, tags in rows:
+        type, status, *genre = tags.split("|")
+        results.append(ResultRecord.create(name, url, thumbnail, genre, type, float(score), status))
+    return results
+
+
+def timed(build: Callable, rows, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        build(rows)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def held_memory(build: Callable, rows) -> int:
+    """Bytes still allocated by ``build`` once it returns, i.e. held by its results."""
+    gc.collect()
+    tracemalloc.start()
+    results = build(rows)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del results
+    return held
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000, help="Results to build (default: 100000)")
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per variant (default: 3)")
+    opts = parser.parse_args()
+
+    from doudesu.models import SearchRecord
+
+    rows = raw_rows(opts.count)
+    # Warm up imports and pydantic's validator.
+    build_models(rows[:100])
+    build_records(rows[:100])
+
+    print(f"{opts.count} results")
+    print(f"{'variant':<18} {'build':>10} {'per result':>12} {'memory':>10} {'per result':>12}")
+    timings = {}
+    for name, build in (("pydantic Result", build_models), ("ResultRecord", build_records)):
+        seconds = timed(build, rows, opts.runs)
+        memory = held_memory(build, rows)
+        timings[name] = (seconds, memory)
+        print(
+            f"{name:<18} {seconds * 1000:8.1f}ms {seconds / opts.count * 1e6:10.2f}us "
+            f"{memory / 1e6:8.1f}MB {memory / opts.count:10.0f} B"
+        )
+    (model_s, model_mem), (record_s, record_mem) = timings.values()
+    print(f"records: {model_s / record_s:.1f}x faster to build, {model_mem / record_mem:.1f}x less memory")
+
+    page = SearchRecord(tuple(build_records(rows[:20])))
+    seconds = timed(lambda _: [page.to_model() for _ in range(1000)], None, opts.runs) / 1000
+    print(f"20-result page to pydantic at the API boundary: {seconds * 1e6:.1f}us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Cost of the page blocklist filter per chapter.
+
+Times the three parts of filtering a chapter: shrinking each page to the
+pixels it is hashed from (done on the download threads), hashing the whole
+chapter, and matching the hashes against a blocklist. Hashing and matching are
+timed with NumPy, batched over the chapter, and with the plain Python
+fallback. Pages are synthetic JPEGs of ``--size`` pixels.
+
+Requires ``doudesu[filter]`` for the NumPy columns.
+
+Usage:
+    python benchmarks/pagefilter.py [--pages 60] [--blocked 200] [--size 1200x1700] [--runs 5]
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from io import BytesIO
+
+
+def synthetic_pages(count: int, size: tuple[int, int]) -> list[bytes]:
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(0)
+    pages = []
+    for _ in range(count):
+        img = Image.new("L", size, 255)
+        draw = ImageDraw.Draw(img)
+        for _ in range(60):
+            x0, x1 = sorted(rng.randint(0, size[0]) for _ in range(2))
+            y0, y1 = sorted(rng.randint(0, size[1]) for _ in range(2))
+            draw.rectangle((x0, y0, x1, y1), fill=rng.randint(0, 255))
+        out = BytesIO()
+        img.convert("RGB").save(out, "JPEG", quality=85)
+        pages.append(out.getvalue())
+    return pages
+
+
+def timed(fn: Callable[[], object], runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60, help="Pages per chapter (default: 60)")
+    parser.add_argument("--blocked", type=int, default=200, help="Hashes in the blocklist (default: 200)")
+    parser.add_argument("--size", default="1200x1700", help="Page size in pixels (default: 1200x1700)")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per case (default: 5)")
+    opts = parser.parse_args()
+
+    from doudesu.utils import pagefilter
+
+    width, height = map(int, opts.size.split("x"))
+    pages = synthetic_pages(opts.pages, (width, height))
+    rng = random.Random(1)
+    directory = tempfile.TemporaryDirectory()
+    blocklist = pagefilter.PageBlocklist(f"{directory.name}/blocklist.txt")
+    for _ in range(opts.blocked):
+        blocklist.add(rng.getrandbits(64))
+
+    thumbnails = [pagefilter.page_thumbnail(page) for page in pages]
+    shrink = timed(lambda: [pagefilter.page_thumbnail(page) for page in pages], opts.runs)
+    print(f"{opts.pages} pages of {width}x{height}, {opts.blocked} blocked hashes")
+    print(f"shrink (download threads): {shrink / opts.pages * 1e6:8.1f}us per page")
+
+    numpy = pagefilter._numpy()
+    variants = [("python", lambda: None)] + ([("numpy", lambda: numpy)] if numpy is not None else [])
+    print(f"{'variant':<8} {'hash':>12} {'match':>12} {'per chapter':>12}")
+    results = {}
+    for name, loader in variants:
+        pagefilter._numpy = loader
+        hashes = pagefilter.hash_pages(thumbnails)
+        hash_s = timed(lambda: pagefilter.hash_pages(thumbnails), opts.runs)
+        match_s = timed(lambda hashes=hashes: blocklist.match(hashes), opts.runs)
+        results[name] = hashes
+        print(f"{name:<8} {hash_s * 1e6:10.1f}us {match_s * 1e6:10.1f}us {(hash_s + match_s) * 1e6:10.1f}us")
+    directory.cleanup()
+    if len({tuple(hashes) for hashes in results.values()}) > 1:
+        print("FAIL: NumPy and Python hashes differ")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,32 @@
 """Dodesu - A Python wrapper for doujindesu.tv manga downloader"""
 
-from importlib.metadata import version
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-from .core.doudesu import Doujindesu
-from .models.manga import DetailsResult, Result, SearchResult
+if TYPE_CHECKING:
+    from .core.doudesu import Doujindesu
+    from .models.manga import DetailsResult, Result, SearchResult
 
-__version__ = version("doudesu")
 __all__ = ["Doujindesu", "Result", "DetailsResult", "SearchResult"]
+
+# Public names are resolved on first access so that ``python -m doudesu --help``
+# doesn't import pydantic, bs4 or tls_client.
+_LAZY_ATTRS = {
+    "Doujindesu": ".core.doudesu",
+    "Result": ".models.manga",
+    "DetailsResult": ".models.manga",
+    "SearchResult": ".models.manga",
+}
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        from importlib.metadata import version
+
+        value = version("doudesu")
+    elif name in _LAZY_ATTRS:
+        value = getattr(import_module(_LAZY_ATTRS[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -1,24 +1,24 @@
 """
 Main entry point for the Doudesu package.
 Handles both CLI and GUI modes.
+
+Imports are kept inside the mode handlers so that each mode only loads the
+dependencies it needs, and ``--help`` loads none of them.
 """
 
 import argparse
+import atexit
 import sys
+from functools import cache
 from importlib.util import find_spec
 
-from rich.console import Console
 
-from .core import Doujindesu
-from .ui import run_cli
-from .ui.cli import (
-    ImageToPDFConverter,
-    display_manga_details,
-    get_int_input,
-    select_chapters,
-)
+@cache
+def get_console():
+    """Return the shared rich console, importing rich on first use."""
+    from rich.console import Console
 
-console = Console()
+    return Console()
 
 
 def check_gui_dependencies() -> bool:
@@ -31,8 +31,8 @@ def check_api_dependencies() -> bool:
     return all(find_spec(pkg) is not None for pkg in ["fastapi", "uvicorn"])
 
 
-def main():
-    """Main entry point for the package."""
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line argument parser."""
     parser = argparse.ArgumentParser(description="Doudesu - A manga downloader for doujindesu.tv")
     parser.add_argument(
         "--gui",
@@ -46,8 +46,93 @@ def main():
     )
     parser.add_argument("--search", type=str, help="Search manga by keyword")
     parser.add_argument("--page", type=int, default=1, help="Page number for search results (default: 1)")
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        help="Search the local catalogue instead of the site, works offline",
+    )
+    parser.add_argument(
+        "--genre",
+        action="append",
+        help="Only list titles with this genre, can be repeated (with --local)",
+    )
+    parser.add_argument("--type", type=str, help="Only list titles of this type (with --local)")
+    parser.add_argument("--status", type=str, help="Only list titles with this status (with --local)")
+    parser.add_argument("--min-score", type=float, help="Minimum score (with --local)")
+    parser.add_argument("--max-score", type=float, help="Maximum score (with --local)")
     parser.add_argument("--url", type=str, help="Download manga by URL")
+    parser.add_argument(
+        "--chapters",
+        metavar="EXPR",
+        help="Download these chapters without prompting, e.g. '1-10,15,latest:3' (with --url or --input)",
+    )
+    parser.add_argument("--all", action="store_true", help="Download every chapter without prompting (same as --chapters all)")
+    parser.add_argument(
+        "--input",
+        metavar="FILE",
+        help="Download the title URLs in FILE ('-' for stdin), one per line, each optionally followed by a chapter selection",
+    )
+    parser.add_argument("--format", choices=["pdf", "cbz"], default="pdf", help="Format of batch downloads (default: pdf)")
+    parser.add_argument("--output", metavar="DIR", default="result", help="Directory for batch downloads (default: result)")
+    parser.add_argument("--jobs", type=int, default=4, help="Chapters downloaded concurrently in batch mode (default: 4)")
+    parser.add_argument(
+        "--crawl",
+        nargs="?",
+        const="",
+        metavar="URL",
+        help="Index every title of a listing or search into the local catalogue (default: full manga listing)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Pages fetched concurrently by --crawl, and titles looked up concurrently in batch mode (default: 4)",
+    )
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=0.5,
+        help="Minimum seconds between page requests for --crawl (default: 0.5)",
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the --crawl checkpoint and start over")
+    parser.add_argument(
+        "--block-page",
+        action="append",
+        metavar="IMAGE",
+        help="Drop pages looking like IMAGE (a file or URL of an ad or credit page) from downloads, can be repeated",
+    )
+    parser.add_argument(
+        "--image-store",
+        action="store_true",
+        help="Keep downloaded page images in ~/.doudesu/images (up to 1 GB) and reuse them instead of downloading again",
+    )
     parser.add_argument("--cli", action="store_true", help="Run in interactive CLI mode")
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help="Record metrics and write them to PATH on exit (JSON if it ends in .json, else Prometheus text)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        help="Append OTLP/JSON spans of every chapter download to PATH (view with python -m doudesu.utils.tracing PATH)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Profile the run and write the hottest functions per stage to PATH on exit (JSON if it ends in .json)",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=["sample", "cprofile"],
+        default="sample",
+        help="Sample every thread's stack (default, low overhead) or run cProfile in every thread (also writes PATH.prof)",
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="Also report the top allocation sites with tracemalloc (much slower)",
+    )
     parser.add_argument(
         "--api",
         action="store_true",
@@ -59,133 +144,366 @@ def main():
         default=6969,
         help="Port number for API server (default: 6969)",
     )
+    return parser
 
-    args = parser.parse_args()
 
-    if args.gui or args.browser:
-        if check_gui_dependencies():
-            from .ui import run_gui
+def download_selected_chapters(manga, details, chapters: list[str]):
+    """Prompt for a chapter selection and download each selected chapter as a PDF."""
+    from .ui.cli import download_chapters, select_chapters
 
-            run_gui(browser_mode=args.browser)
-        else:
-            console.print(
-                "[red]GUI dependencies not installed. Please install with:[/red]"
-                "\n[yellow]pip install doudesu\[gui][/yellow]"  # noqa: W605
+    selected_indices = select_chapters(len(chapters))
+    download_chapters(manga, [(chapters[idx], f"{details.name} - Chapter {idx + 1}") for idx in selected_indices])
+
+
+def finish_profile(profiler, path: str):
+    """Stop ``profiler`` and write its report, run at exit so every mode is covered."""
+    profiler.stop()
+    profiler.write(path)
+    get_console().print(f"[green]Profile written to: {path}[/green]")
+
+
+def run_search(args: argparse.Namespace):
+    """Handle ``--search``: list a page of results and download the selected manga."""
+    from .core import Doujindesu
+    from .ui.cli import display_manga_details, get_int_input
+
+    console = get_console()
+    if args.local:
+        current_results = Doujindesu.search_local(
+            args.search or "",
+            args.page,
+            genre=args.genre,
+            type=args.type,
+            status=args.status,
+            min_score=args.min_score,
+            max_score=args.max_score,
+        )
+    else:
+        current_results = Doujindesu.search(args.search, args.page)
+    if not current_results or not current_results.results:
+        console.print("[red]No results found[/red]")
+        return
+
+    console.print(f"\n[bold cyan]Search Results (Page {args.page}):[/bold cyan]")
+    for i, manga in enumerate(current_results.results, 1):
+        type_color = "green" if manga.type.lower() == "manga" else "yellow"
+        score_color = "green" if float(manga.score) >= 7 else "yellow"
+
+        console.print(f"\n[bold white]{i}. {manga.name}[/bold white]")
+        console.print(f"   URL: [blue]{manga.url}[/blue]")
+        console.print(f"   Type: [{type_color}]{manga.type}[/{type_color}]")
+        console.print(f"   Score: [{score_color}]★ {manga.score}[/{score_color}]")
+
+    if current_results.next_page_url:
+        next_page = args.page + 1
+        console.print(f"\n[blue]Next page available. Use --page {next_page} to view[/blue]")
+    if current_results.previous_page_url:
+        prev_page = args.page - 1
+        console.print(f"[blue]Previous page available. Use --page {prev_page} to view[/blue]")
+
+    selection = get_int_input(
+        "Select manga number (0 to cancel)",
+        0,
+        len(current_results.results),
+    )
+
+    if selection == 0:
+        return
+
+    selected_manga = current_results.results[selection - 1]
+    manga = Doujindesu(selected_manga.url)
+    details = manga.get_details()
+
+    display_manga_details(details)
+
+    chapters = manga.get_all_chapters()
+    if not chapters:
+        console.print("[red]No chapters found[/red]")
+        return
+
+    download_selected_chapters(manga, details, chapters)
+
+
+def run_url(args: argparse.Namespace):
+    """Handle ``--url``: show manga details and download the selected chapters."""
+    from .core import Doujindesu
+    from .ui.cli import display_manga_details
+
+    console = get_console()
+    manga = Doujindesu(args.url)
+    details = manga.get_details()
+
+    display_manga_details(details)
+
+    chapters = manga.get_all_chapters()
+    if not chapters:
+        console.print("[red]No chapters found[/red]")
+        return
+
+    download_selected_chapters(manga, details, chapters)
+
+
+def read_batch_input(path: str) -> list[tuple[str, str | None]]:
+    """Read ``URL [SELECTION]`` lines from ``path``, or stdin for ``-``, skipping blanks and ``#`` comments."""
+    with open(sys.stdin.fileno() if path == "-" else path, closefd=path != "-") as f:
+        entries = []
+        for line in f:
+            fields = line.split("#", 1)[0].split(None, 1)
+            if fields:
+                entries.append((fields[0], fields[1].strip() if len(fields) > 1 else None))
+    return entries
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Handle batch mode: download the selected chapters of every title without prompting.
+
+    Titles come from ``--url`` and ``--input``. Their details are looked up
+    once per title, ``--workers`` at once, then every selected chapter is
+    queued as a job carrying them, ``--jobs`` of them running at once. A line
+    per chapter goes to stderr as it finishes and a JSON summary to stdout at
+    the end. Ctrl+C cancels what hasn't finished and still prints the summary.
+
+    Returns:
+        int: Exit status, 1 if any title or chapter failed, 130 if interrupted
+    """
+    import json
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .core import Doujindesu, JobManager, parse_chapter_selection
+
+    started = time.monotonic()
+    default = "all" if args.all else args.chapters
+    entries = [(args.url, None)] if args.url else []
+    if args.input:
+        entries += read_batch_input(args.input)
+
+    def resolve(entry: tuple[str, str | None]) -> dict:
+        url, selection = entry
+        try:
+            details = Doujindesu(url).get_details()
+            if not details:
+                raise ValueError("Manga not found")
+            numbers = parse_chapter_selection(selection or default or "all", len(details.chapter_urls))
+        except Exception as e:
+            return {"url": url, "error": str(e)}
+        return {"url": url, "name": details.name, "chapters": numbers, "details": details}
+
+    interrupted = False
+    pool = ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="doudesu-resolve")
+    futures = [pool.submit(resolve, entry) for entry in entries]
+    try:
+        titles = [future.result() for future in futures]
+    except KeyboardInterrupt:
+        interrupted = True
+        pool.shutdown(wait=False, cancel_futures=True)
+        titles = [
+            future.result()
+            if future.done() and not future.cancelled()
+            else {"url": url, "error": "Cancelled", "cancelled": True}
+            for future, (url, _) in zip(futures, entries, strict=True)
+        ]
+    pool.shutdown(wait=False)
+
+    queued = []
+    if not interrupted:
+        manager = JobManager(workers=max(1, args.jobs), output_dir=args.output)
+        queued = [
+            (title, number, manager.submit(title["url"], [number], args.format, args.output, title["details"]))
+            for title in titles
+            if "error" not in title
+            for number in title["chapters"]
+        ]
+
+    results = []
+    for title in titles:
+        if "error" in title:
+            status = "cancelled" if title.get("cancelled") else "failed"
+            print(f"{status.upper()} {title['url']}: {title['error']}", file=sys.stderr)
+            results.append(
+                {"url": title["url"], "name": None, "chapter": None, "status": status, "file": None, "error": title["error"]}
             )
-            sys.exit(1)
-    elif args.search:
+    received = saved = 0
+    for title, number, job in queued:
         try:
-            current_results = Doujindesu.search(args.search, args.page)
-            if not current_results or not current_results.results:
-                console.print("[red]No results found[/red]")
-                return
-
-            console.print(f"\n[bold cyan]Search Results (Page {args.page}):[/bold cyan]")
-            for i, manga in enumerate(current_results.results, 1):
-                type_color = "green" if manga.type.lower() == "manga" else "yellow"
-                score_color = "green" if float(manga.score) >= 7 else "yellow"
-
-                console.print(f"\n[bold white]{i}. {manga.name}[/bold white]")
-                console.print(f"   URL: [blue]{manga.url}[/blue]")
-                console.print(f"   Type: [{type_color}]{manga.type}[/{type_color}]")
-                console.print(f"   Score: [{score_color}]★ {manga.score}[/{score_color}]")
-
-            if current_results.next_page_url:
-                next_page = args.page + 1
-                console.print(f"\n[blue]Next page available. Use --page {next_page} to view[/blue]")
-            if current_results.previous_page_url:
-                prev_page = args.page - 1
-                console.print(f"[blue]Previous page available. Use --page {prev_page} to view[/blue]")
-
-            selection = get_int_input(
-                "Select manga number (0 to cancel)",
-                0,
-                len(current_results.results),
+            job.wait()
+        except KeyboardInterrupt:
+            interrupted = True
+            for _, _, other in queued:
+                other.cancel()
+            job.wait()
+        latest = job.progress.latest
+        received += latest.job_bytes_received if latest else 0
+        saved += latest.job_bytes_saved if latest else 0
+        file = job.files[0] if job.files else None
+        error = job.error or (None if file else "No images found")
+        status = "done" if file else "cancelled" if job.cancelled else "failed"
+        print(f"{status.upper()} {title['name']} chapter {number}: {file or error}", file=sys.stderr)
+        results.append(
+            {"url": title["url"], "name": title["name"], "chapter": number, "status": status, "file": file, "error": error}
+        )
+
+    failed = sum(result["status"] == "failed" for result in results)
+    cancelled = sum(result["status"] == "cancelled" for result in results)
+    summary = {
+        "ok": failed == 0 and not interrupted,
+        "interrupted": interrupted,
+        "format": args.format,
+        "output": args.output,
+        "titles": len(titles),
+        "chapters": len(queued),
+        "downloaded": len(results) - failed - cancelled,
+        "failed": failed,
+        "cancelled": cancelled,
+        "bytes_received": received,
+        "bytes_saved": saved,
+        "elapsed": round(time.monotonic() - started, 3),
+        "results": results,
+    }
+    print(json.dumps(summary, indent=2))
+    if interrupted:
+        return 130
+    return 0 if failed == 0 else 1
+
+
+def run_crawl(args: argparse.Namespace):
+    """Handle ``--crawl``: walk a listing into the catalogue, reporting pages per second."""
+    from .core import Crawler
+
+    console = get_console()
+    crawler = Crawler(
+        seeds=[args.crawl] if args.crawl else None,
+        workers=args.workers,
+        delay=args.delay,
+        resume=not args.restart,
+    )
+
+    with console.status("Crawling...") as status:
+
+        def on_page(url, result):
+            stats = crawler.stats
+            status.update(
+                f"Crawling: {stats.pages} pages, {stats.titles} titles, "
+                f"{stats.pending} pending, {stats.pages_per_second:.1f} pages/s"
             )
 
-            if selection == 0:
-                return
+        crawler.on_page = on_page
+        try:
+            stats = crawler.run()
+        except KeyboardInterrupt:
+            crawler.stop()
+            stats = crawler.stats
+            console.print("[yellow]Crawl interrupted, progress saved. Run again to resume.[/yellow]")
 
-            selected_manga = current_results.results[selection - 1]
-            manga = Doujindesu(selected_manga.url)
-            details = manga.get_details()
+    console.print(
+        f"[green]Crawled {stats.pages} pages ({stats.failed} failed) and found {stats.titles} titles "
+        f"in {stats.elapsed:.1f}s, {stats.pages_per_second:.2f} pages/s[/green]"
+    )
 
-            display_manga_details(details)
 
-            chapters = manga.get_all_chapters()
-            if not chapters:
-                console.print("[red]No chapters found[/red]")
-                return
+def run_block_pages(args: argparse.Namespace):
+    """Handle ``--block-page``: add the perceptual hash of each image to the page blocklist."""
+    from pathlib import Path
 
-            selected_indices = select_chapters(len(chapters))
-            for idx in selected_indices:
-                chapter_url = chapters[idx]
-                console.print(f"\n[cyan]Downloading Chapter {idx + 1}...[/cyan]")
+    from .utils.converter import get_image_downloader
+    from .utils.pagefilter import get_page_blocklist, hash_pages, page_thumbnail
 
-                manga.url = chapter_url
-                images = manga.get_all_images()
+    console = get_console()
+    blocklist = get_page_blocklist()
+    for source in args.block_page:
+        if source.startswith(("http://", "https://")):
+            response = get_image_downloader().get(source)
+            response.raise_for_status()
+            data = response.content
+        else:
+            data = Path(source).read_bytes()
+        (page_hash,) = hash_pages([page_thumbnail(data)])
+        blocklist.add(page_hash, source)
+        console.print(f"[green]Blocked {page_hash:016x}[/green] {source}")
+    console.print(f"Page blocklist: {blocklist.path}")
 
-                if images:
-                    console.print(f"Found {len(images)} images")
-                    title = f"{details.name} - Chapter {idx + 1}"
-                    pdf_path = f"result/{title}.pdf"
-                    ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path)
-                    console.print(f"[green]Saved as: {pdf_path}[/green]")
-                else:
-                    console.print("[red]No images found in chapter[/red]")
 
-        except KeyboardInterrupt:
-            console.print("\n[red]Operation cancelled[/red]")
-        except Exception as e:
-            console.print(f"[red]Error: {e!s}[/red]")
-    elif args.url:
-        try:
-            manga = Doujindesu(args.url)
-            details = manga.get_details()
+def main():
+    """Main entry point for the package."""
+    parser = build_parser()
+    args = parser.parse_args()
 
-            display_manga_details(details)
+    if args.metrics_file:
+        from .utils import metrics
 
-            chapters = manga.get_all_chapters()
-            if not chapters:
-                console.print("[red]No chapters found[/red]")
-                return
+        metrics.enable()
+        atexit.register(metrics.REGISTRY.write, args.metrics_file)
 
-            selected_indices = select_chapters(len(chapters))
-            for idx in selected_indices:
-                chapter_url = chapters[idx]
-                console.print(f"\n[cyan]Downloading Chapter {idx + 1}...[/cyan]")
+    if args.trace:
+        from .utils import tracing
 
-                manga.url = chapter_url
-                images = manga.get_all_images()
+        tracing.configure(args.trace)
 
-                if images:
-                    console.print(f"Found {len(images)} images")
-                    title = f"{details.name} - Chapter {idx + 1}"
-                    pdf_path = f"result/{title}.pdf"
-                    ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path)
-                    console.print(f"[green]Saved as: {pdf_path}[/green]")
-                else:
-                    console.print("[red]No images found in chapter[/red]")
+    if args.image_store:
+        from .utils.imagestore import ImageStore
+
+        ImageStore.enabled = True
+
+    if args.profile:
+        from .utils.profiling import Profiler
+
+        profiler = Profiler(mode=args.profile_mode, memory=args.profile_memory)
+        profiler.start()
+        atexit.register(finish_profile, profiler, args.profile)
+
+    if args.gui or args.browser:
+        if check_gui_dependencies():
+            from .ui import run_gui
 
+            run_gui(browser_mode=args.browser)
+        else:
+            get_console().print(
+                "[red]GUI dependencies not installed. Please install with:[/red]"
+                "\n[yellow]pip install doudesu\[gui][/yellow]"  # noqa: W605
+            )
+            sys.exit(1)
+    elif args.crawl is not None:
+        run_crawl(args)
+    elif args.block_page:
+        try:
+            run_block_pages(args)
+        except Exception as e:
+            get_console().print(f"[red]Error: {e!s}[/red]")
+            sys.exit(1)
+    elif args.input or (args.url and (args.chapters or args.all)):
+        try:
+            sys.exit(run_batch(args))
+        except (OSError, ValueError) as e:
+            print(f"Error: {e!s}", file=sys.stderr)
+            sys.exit(2)
+    elif args.search or args.local or args.url:
+        try:
+            if args.search or args.local:
+                run_search(args)
+            else:
+                run_url(args)
         except KeyboardInterrupt:
-            console.print("\n[red]Operation cancelled[/red]")
+            get_console().print("\n[red]Operation cancelled[/red]")
         except Exception as e:
-            console.print(f"[red]Error: {e!s}[/red]")
+            get_console().print(f"[red]Error: {e!s}[/red]")
     elif args.cli:
+        from .ui import run_cli
+
         try:
             run_cli()
         except KeyboardInterrupt:
-            console.print("\n[red]Exiting...[/red]")
+            get_console().print("\n[red]Exiting...[/red]")
     elif args.api:
         if check_api_dependencies():
             import uvicorn
 
             from .api import app
 
-            console.print(f"[green]Starting API server on port {args.port}...[/green]")
+            get_console().print(f"[green]Starting API server on port {args.port}...[/green]")
             uvicorn.run(app, host="0.0.0.0", port=args.port)
         else:
-            console.print(
+            get_console().print(
                 "[red]API dependencies not installed. Please install with:[/red]"
                 "\n[yellow]pip install doudesu\[api][/yellow]"  # noqa: W605
             )
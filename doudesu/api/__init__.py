@@ -2,15 +2,94 @@
 API for the Doudesu.
 """
 
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import RedirectResponse
-from pydantic import BaseModel
+import json
+import os
+import re
+import threading
+from collections.abc import AsyncIterator
+from datetime import datetime
+from pathlib import Path
+from typing import Annotated, Any
 
-from ..core import Doujindesu
+import anyio
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
+
+from ..core import Doujindesu, get_catalog, get_job_manager, resolve_images
 from ..models.manga import DetailsResult, SearchResult
+from ..utils import metrics
+from ..utils.constants import BATCH_MAX_CHAPTERS
+from ..utils.profiling import Profiler
+from ..utils.thumbnails import get_thumbnail_cache
+from .responses import dumps, get_response_cache
+
+# Seconds of silence after which progress streams send a keep-alive.
+STREAM_KEEPALIVE = 15.0
 
 app = FastAPI(title="Doudesu API", description="API for doudesu library", version="1.0.0")
 
+# The API always serves /metrics; set DOUDESU_METRICS=0 to turn recording off.
+if os.environ.get("DOUDESU_METRICS") != "0":
+    metrics.enable()
+
+
+def route_of(request: Request) -> str:
+    """The template of the route ``request`` matches, e.g. ``/manga/{url:path}``."""
+    return next(
+        (r.path for r in app.router.routes if r.matches(request.scope)[0] == Match.FULL),
+        "unmatched",
+    )
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    """Time every request and count it by route template and status code."""
+    if not metrics.REGISTRY.enabled:
+        return await call_next(request)
+
+    # Label by the matched route template, not the raw path, to keep label sets bounded.
+    labels = {"method": request.method, "route": route_of(request)}
+    status = 500
+    with metrics.API_IN_FLIGHT.track_in_progress(**labels), metrics.API_REQUEST_SECONDS.time(**labels):
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            metrics.API_REQUESTS.inc(status=status, **labels)
+    return response
+
+
+# Opt-in profiling: with DOUDESU_PROFILE_DIR set, requests are profiled one at a
+# time (the sampler sees every thread, so overlapping requests would mix) and a
+# report per request is written to that directory. DOUDESU_PROFILE_MEMORY=1 adds
+# tracemalloc allocation sites.
+PROFILE_DIR = os.environ.get("DOUDESU_PROFILE_DIR")
+
+if PROFILE_DIR:
+    _profile_lock = threading.Lock()
+
+    @app.middleware("http")
+    async def profile_requests(request: Request, call_next):
+        """Profile the request, unless another one is being profiled, and write its report."""
+        if not _profile_lock.acquire(blocking=False):
+            return await call_next(request)
+        try:
+            profiler = Profiler(memory=os.environ.get("DOUDESU_PROFILE_MEMORY") == "1")
+            profiler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.stop()
+            route = re.sub(r"[^A-Za-z0-9]+", "_", route_of(request)).strip("_") or "root"
+            path = Path(PROFILE_DIR) / f"{datetime.now():%Y%m%d-%H%M%S-%f}-{request.method}-{route}.txt"
+            await run_in_threadpool(profiler.write, path)
+            return response
+        finally:
+            _profile_lock.release()
+
 
 class ChaptersResult(BaseModel):
     """Result for chapters"""
@@ -24,9 +103,43 @@ class ImagesResult(BaseModel):
     images: list[str]
 
 
+class ImagesBatchRequest(BaseModel):
+    """Chapters to look up images for: chapter URLs, or a manga URL and a range of its chapters"""
+
+    urls: list[str] | None = None
+    url: str | None = None
+    start: int = Field(default=1, ge=1)
+    end: int | None = Field(default=None, ge=1)
+
+
+class DownloadRequest(BaseModel):
+    """Chapters to download as PDFs"""
+
+    url: str
+    chapters: list[int] | None = None
+
+
+class JobResult(BaseModel):
+    """State of a download job, with its latest progress event"""
+
+    id: str
+    url: str
+    status: str
+    files: list[str]
+    error: str | None = None
+    progress: dict[str, Any] | None = None
+
+
+class LocalSearchResult(SearchResult):
+    """Result for a local catalogue search, with facet counts over all matches"""
+
+    facets: dict[str, dict[str, int]]
+
+
 @app.get("/search/{keyword}", response_model=SearchResult)
-async def search(
+def search(
     keyword: str,
+    request: Request,
     page: int = Query(default=1, ge=1, description="Page number"),
 ):
     """
@@ -34,52 +147,249 @@ async def search(
 
     - page: Page number (starts from 1)
     """
+    key = ("search", keyword, page)
+    cached = get_response_cache().get(key, request)
+    if cached is not None:
+        return cached
     results = Doujindesu.search(keyword, page)
     if not results or not results.results:
         raise HTTPException(status_code=404, detail="No results found")
 
-    return results
+    get_thumbnail_cache().prefetch([result.thumbnail for result in results.results])
+    return get_response_cache().put(key, results, request)
+
+
+@app.get("/local/search", response_model=LocalSearchResult)
+def search_local(
+    q: str = Query(default="", description="Keywords matched against name, series, author and genres"),
+    genre: Annotated[list[str] | None, Query(description="Required genres")] = None,
+    type: str | None = Query(default=None, description="Title type, e.g. Manga"),
+    status: str | None = Query(default=None, description="Title status, e.g. Finished"),
+    min_score: float | None = Query(default=None, ge=0, le=10, description="Minimum score"),
+    max_score: float | None = Query(default=None, ge=0, le=10, description="Maximum score"),
+    page: int = Query(default=1, ge=1, description="Page number"),
+):
+    """
+    Search the local catalogue, without contacting the site
+
+    Only titles seen before through search or details are indexed.
+    Facets count all matches per genre, type, status and score range.
+    """
+    catalog = get_catalog()
+    filters = {"genre": genre, "type": type, "status": status, "min_score": min_score, "max_score": max_score}
+    results = catalog.search(q, page, **filters)
+    if not results or not results.results:
+        raise HTTPException(status_code=404, detail="No results found")
+    return LocalSearchResult(**results.model_dump(), facets=catalog.facets(q, **filters))
 
 
 @app.get("/manga/{url:path}", response_model=DetailsResult)
-async def get_manga_details(url: str):
+def get_manga_details(url: str, request: Request):
     """Get manga details by URL"""
+    cached = get_response_cache().get(("manga", url), request)
+    if cached is not None:
+        return cached
     try:
         manga = Doujindesu(url)
         details = manga.get_details()
         if not details:
             raise HTTPException(status_code=404, detail="Manga not found")
-        return details
+        get_thumbnail_cache().allow([details.thumbnail])
+        return get_response_cache().put(("manga", url), details, request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @app.get("/chapters/{url:path}", response_model=ChaptersResult)
-async def get_chapters(url: str):
+def get_chapters(url: str, request: Request):
     """Get all chapters for a manga"""
+    cached = get_response_cache().get(("chapters", url), request)
+    if cached is not None:
+        return cached
     try:
         manga = Doujindesu(url)
         chapters = manga.get_all_chapters()
         if not chapters:
             raise HTTPException(status_code=404, detail="No chapters found")
-        return {"chapters": chapters}
+        return get_response_cache().put(("chapters", url), {"chapters": chapters}, request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
 @app.get("/images/{url:path}", response_model=ImagesResult)
-async def get_chapter_images(url: str):
+def get_chapter_images(url: str, request: Request):
     """Get all images from a chapter"""
+    cached = get_response_cache().get(("images", url), request)
+    if cached is not None:
+        return cached
     try:
         manga = Doujindesu(url)
         images = manga.get_all_images()
         if not images:
             raise HTTPException(status_code=404, detail="No images found")
-        return {"images": images}
+        return get_response_cache().put(("images", url), {"images": images}, request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@app.post("/images:batch", response_class=StreamingResponse)
+def get_chapter_images_batch(batch: ImagesBatchRequest, request: Request):
+    """
+    Get the images of many chapters, streamed as NDJSON as each chapter resolves
+
+    - urls: Chapter URLs
+    - url, start, end: Or a manga URL and the chapter numbers to include,
+      starting from 1; up to the last chapter when `end` is omitted
+
+    Chapters are resolved concurrently, so lines arrive in completion order.
+    Each line is `{"index", "url", "images", "error"}`, where `index` is the
+    position of the chapter in `urls` or in the range.
+    """
+    if batch.urls is not None:
+        urls = batch.urls
+    elif batch.url:
+        try:
+            details = Doujindesu(batch.url).get_details()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e)) from e
+        if not details:
+            raise HTTPException(status_code=404, detail="Manga not found")
+        urls = details.chapter_urls[batch.start - 1 : batch.end]
+    else:
+        raise HTTPException(status_code=422, detail="Either urls or url is required")
+    if not urls:
+        raise HTTPException(status_code=422, detail="No chapters to look up")
+    if len(urls) > BATCH_MAX_CHAPTERS:
+        raise HTTPException(status_code=422, detail=f"At most {BATCH_MAX_CHAPTERS} chapters per batch")
+
+    async def stream():
+        results = resolve_images(urls)
+        try:
+            while (result := await run_in_threadpool(next, results, None)) is not None:
+                if await request.is_disconnected():
+                    break
+                yield dumps(result.as_dict()) + b"\n"
+        finally:
+            # Runs on disconnect too: cancel chapters not started and release the sessions.
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(results.close)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@app.get("/thumbnail/{url:path}", response_class=Response)
+def get_thumbnail(url: str):
+    """
+    Get a downscaled manga cover, served from the local thumbnail cache
+
+    Only covers of titles returned by search, details or the local catalogue are served.
+    """
+    cache = get_thumbnail_cache()
+    if not cache.allowed(url) and not (Doujindesu.use_catalog and get_catalog().has_thumbnail(url)):
+        raise HTTPException(status_code=403, detail="Not the cover of a known title")
+    data = cache.get(url)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return Response(content=data, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=86400"})
+
+
+@app.post("/jobs", response_model=JobResult, status_code=202)
+def create_job(request: DownloadRequest):
+    """
+    Start downloading chapters of a manga as PDFs in the background
+
+    - chapters: Chapter numbers, starting from 1; all chapters when omitted
+
+    Poll `/jobs/{job_id}` for progress.
+    """
+    if request.chapters is not None and (not request.chapters or min(request.chapters) < 1):
+        raise HTTPException(status_code=422, detail="Chapter numbers start from 1")
+    return get_job_manager().submit(request.url, request.chapters).as_dict()
+
+
+@app.get("/jobs/{job_id}", response_model=JobResult)
+def get_job(job_id: str):
+    """Get the status of a download job, with pages, bytes, throughput and ETA of its latest progress"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.as_dict()
+
+
+@app.get("/jobs/{job_id}/files/{index}", response_class=FileResponse)
+def get_job_file(job_id: str, index: int):
+    """Download a PDF written by a job, by its position in `files`"""
+    job = get_job_manager().get(job_id)
+    if job is None or not 0 <= index < len(job.files):
+        raise HTTPException(status_code=404, detail="File not found")
+    path = job.files[index]
+    return FileResponse(path, media_type="application/pdf", filename=os.path.basename(path))
+
+
+async def job_events(job_id: str, after: int = 0) -> AsyncIterator[tuple[int, dict] | None]:
+    """
+    Progress events of a job as ``(sequence, event)`` pairs, None on idle keep-alive ticks.
+
+    Intermediate progress events are skipped for clients that read slower than
+    they are published; chapter and job boundaries are always delivered.
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    with metrics.STREAM_SUBSCRIBERS.track_in_progress():
+        async for item in job.events.subscribe(after, timeout=STREAM_KEEPALIVE):
+            yield None if item is None else (item[0], item[1].as_dict())
+
+
+@app.get("/jobs/{job_id}/events", response_class=StreamingResponse)
+async def stream_job_events(job_id: str, request: Request):
+    """
+    Stream the progress of a download job as Server-Sent Events
+
+    Each event is named after its kind (`chapter.start`, `progress`,
+    `chapter.done`, `job.done`) and carries the same fields as the `progress`
+    of `/jobs/{job_id}`. The stream ends after `job.done`. Reconnecting with
+    `Last-Event-ID` resumes after that event.
+    """
+    if get_job_manager().get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_id = request.headers.get("last-event-id", "")
+    after = int(last_id) if last_id.isdigit() else 0
+
+    async def stream():
+        async for item in job_events(job_id, after):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            sequence, event = item
+            yield f"id: {sequence}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(stream(), media_type="text/event-stream", headers=headers)
+
+
+@app.websocket("/jobs/{job_id}/ws")
+async def job_websocket(websocket: WebSocket, job_id: str):
+    """Send the progress events of a download job as JSON messages, then close."""
+    if get_job_manager().get(job_id) is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    try:
+        async for item in job_events(job_id):
+            if item is not None:
+                await websocket.send_json(item[1])
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+
+@app.get("/metrics", response_class=Response, include_in_schema=False)
+def get_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/", include_in_schema=False)
 def redirect_to_docs():
     """Redirect to docs"""
@@ -0,0 +1,262 @@
+"""
+Fast JSON responses for the API.
+
+FastAPI validates what a route returns against its ``response_model`` and then
+serializes it. For the lookup routes the data is already validated, either
+parsed by us or read back from the catalogue, so those routes return a
+:class:`FastJSONResponse` instead: the body is serialized once, with orjson
+when it's installed, and FastAPI passes it through untouched.
+
+Serialized bodies of successful lookups are also kept in a short-lived,
+size-capped LRU (:func:`get_response_cache`), so a hot title is answered
+without a catalogue lookup or any serialization. Set
+``DOUDESU_RESPONSE_CACHE=0`` to go back to plain FastAPI responses.
+
+Cached responses carry a strong ETag, a hash of the body, and requests whose
+``If-None-Match`` matches get an empty 304. Bodies above
+:data:`~doudesu.utils.constants.COMPRESS_MIN_SIZE` are sent compressed with
+the best encoding the client accepts, brotli or zstd when installed, else
+gzip. Each encoding of an entry is compressed once, on first request, and
+kept next to the entry.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from ..utils.constants import COMPRESS_LEVELS, COMPRESS_MIN_SIZE, RESPONSE_CACHE_MEMORY_LIMIT, RESPONSE_CACHE_TTL
+from ..utils.metrics import CACHE_LOOKUPS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _compressors() -> dict[str, Callable[[bytes], bytes]]:
+    """Available content encodings, most preferred first."""
+    compressors = {}
+    try:
+        import brotli
+
+        compressors["br"] = lambda data: brotli.compress(data, quality=COMPRESS_LEVELS["br"])
+    except ImportError:
+        pass
+    try:
+        import zstandard
+
+        # Compressor objects aren't thread-safe, so each call makes its own.
+        compressors["zstd"] = lambda data: zstandard.ZstdCompressor(level=COMPRESS_LEVELS["zstd"]).compress(data)
+    except ImportError:
+        pass
+    compressors["gzip"] = lambda data: gzip.compress(data, compresslevel=COMPRESS_LEVELS["gzip"], mtime=0)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """The encoding of :data:`COMPRESSORS` to use for an ``Accept-Encoding`` header, None for identity."""
+    weights = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name] = weight
+    best, best_weight = None, 0.0
+    for encoding in COMPRESSORS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def _etag_matches(if_none_match: str, tag: str) -> bool:
+    """Weak comparison of ``If-None-Match`` against the opaque ``tag``, any encoding suffix ignored."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        candidate = candidate.removeprefix("W/").strip('"')
+        if candidate.split("-", 1)[0] == tag:
+            return True
+    return False
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize ``content`` to JSON bytes; pydantic models go through pydantic's own serializer."""
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response serialized with :func:`dumps`; ``bytes`` content is sent as it is."""
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """
+    A serialized response body, its compressed variants and when it stops being served.
+
+    Attributes:
+        tag (str): Hash of the body, the opaque part of its ETags
+        encoded (dict[str, bytes]): Compressed bodies by content encoding,
+            filled as clients ask for them
+    """
+
+    body: bytes
+    expires: float
+    tag: str = ""
+    encoded: dict[str, bytes] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.tag:
+            self.tag = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(data) for data in self.encoded.values())
+
+
+class ResponseCache:
+    """
+    LRU of serialized response bodies, capped in bytes, with a fixed time to live.
+
+    Args:
+        ttl (float): Seconds an entry is served
+        memory_limit (int): Maximum bytes of bodies kept, compressed variants included
+
+    Attributes:
+        enabled (bool): Class-wide switch, off with ``DOUDESU_RESPONSE_CACHE=0``.
+            When off, :meth:`get` always misses and :meth:`put` hands the
+            content back for FastAPI to validate and serialize
+    """
+
+    enabled: bool = os.environ.get("DOUDESU_RESPONSE_CACHE", "1") != "0"
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL, memory_limit: int = RESPONSE_CACHE_MEMORY_LIMIT):
+        self.ttl = ttl
+        self.memory_limit = memory_limit
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, request: Request) -> Response | None:
+        """The cached response for ``key``, encoded for ``request``, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                self._evict(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        CACHE_LOOKUPS.inc(cache="response", result="hit" if entry is not None else "miss")
+        return self._respond(key, entry, request) if entry is not None else None
+
+    def put(self, key: Hashable, content: Any, request: Request) -> Any:
+        """
+        Serialize ``content``, cache it under ``key`` and return it as a response for ``request``.
+
+        Returns:
+            Response | Any: The response, or ``content`` itself when disabled
+        """
+        if not self.enabled:
+            return content
+        entry = CachedResponse(dumps(content), time.monotonic() + self.ttl)
+        if entry.size <= self.memory_limit:
+            with self._lock:
+                if key in self._entries:
+                    self._evict(key)
+                self._entries[key] = entry
+                self._bytes += entry.size
+                self._trim()
+        return self._respond(key, entry, request)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _respond(self, key: Hashable, entry: CachedResponse, request: Request) -> Response:
+        """The body of ``entry`` in the best encoding ``request`` accepts, or a 304 if the client has it."""
+        encoding = None
+        if len(entry.body) >= COMPRESS_MIN_SIZE:
+            encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        # Each encoding is a different representation, so it gets its own strong ETag.
+        headers = {"ETag": f'"{entry.tag}-{encoding}"' if encoding else f'"{entry.tag}"', "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, entry.tag):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return FastJSONResponse(entry.body, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return FastJSONResponse(self._encoded(key, entry, encoding), headers=headers)
+
+    def _encoded(self, key: Hashable, entry: CachedResponse, encoding: str) -> bytes:
+        """The body compressed with ``encoding``, compressing and keeping it on first use."""
+        data = entry.encoded.get(encoding)
+        if data is not None:
+            return data
+        data = COMPRESSORS[encoding](entry.body)
+        with self._lock:
+            # Only an entry still in the cache keeps its variants, so the byte count stays right.
+            if encoding not in entry.encoded and self._entries.get(key) is entry:
+                entry.encoded[encoding] = data
+                self._bytes += len(data)
+                self._trim()
+        return data
+
+    def _trim(self):
+        """Evict the least recently used entries until under the limit. Caller holds the lock."""
+        while self._bytes > self.memory_limit and self._entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: Hashable):
+        """Drop an entry. Caller holds the lock."""
+        self._bytes -= self._entries.pop(key).size
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide response cache of the API."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
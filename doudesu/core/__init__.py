@@ -1,3 +1,52 @@
-from .doudesu import Doujindesu
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-__all__ = ["Doujindesu"]
+if TYPE_CHECKING:
+    from .batch import ChapterImages, resolve_images
+    from .catalog import Catalog, get_catalog
+    from .crawler import Crawler, CrawlStats
+    from .doudesu import Doujindesu
+    from .jobs import DownloadJob, JobManager, get_job_manager, parse_chapter_selection
+    from .prefetch import Prefetcher, PrefetchStats
+
+__all__ = [
+    "Catalog",
+    "ChapterImages",
+    "CrawlStats",
+    "Crawler",
+    "Doujindesu",
+    "DownloadJob",
+    "JobManager",
+    "PrefetchStats",
+    "Prefetcher",
+    "get_catalog",
+    "get_job_manager",
+    "parse_chapter_selection",
+    "resolve_images",
+]
+
+# Names are resolved on first access, so ``--search`` and ``--url`` only load
+# the scraper and not sqlite3 (catalogue), asyncio (jobs) or the crawler.
+_LAZY_ATTRS = {
+    "Catalog": ".catalog",
+    "ChapterImages": ".batch",
+    "CrawlStats": ".crawler",
+    "Crawler": ".crawler",
+    "Doujindesu": ".doudesu",
+    "DownloadJob": ".jobs",
+    "JobManager": ".jobs",
+    "PrefetchStats": ".prefetch",
+    "Prefetcher": ".prefetch",
+    "get_catalog": ".catalog",
+    "get_job_manager": ".jobs",
+    "parse_chapter_selection": ".jobs",
+    "resolve_images": ".batch",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,98 @@
+"""
+Concurrent image lookups for many chapters.
+
+:func:`resolve_images` looks up the image URLs of a list of chapters on a
+small worker pool and yields each chapter as soon as it is resolved, so a
+caller such as the API's ``POST /images:batch`` can stream results instead of
+waiting for the slowest chapter. Each worker keeps one scraping session for
+all of its chapters, reusing its connection and TLS session, and every lookup
+reads through the catalogue, so chapters seen before are served locally.
+Origin requests still go through the per-host rate limiter.
+"""
+
+import threading
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+
+from ..utils import tracing
+from ..utils.constants import BATCH_WORKERS
+from .doudesu import Doujindesu
+
+
+@dataclass
+class ChapterImages:
+    """
+    Image lookup result of one chapter of a batch.
+
+    Attributes:
+        index (int): Position of the chapter in the request, from 0
+        url (str): Chapter URL
+        images (list[str]): Image URLs, empty when the lookup failed
+        error (str | None): Why the lookup failed
+    """
+
+    index: int
+    url: str
+    images: list[str]
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def resolve_images(urls: list[str], workers: int = BATCH_WORKERS, proxy: str | None = None) -> Iterator[ChapterImages]:
+    """
+    Look up the images of every chapter in ``urls``, yielding results in completion order.
+
+    A URL listed more than once is looked up once and yielded for each of its
+    positions. Closing the iterator early cancels chapters not started yet.
+
+    Args:
+        urls (list[str]): Chapter URLs
+        workers (int): Chapters looked up concurrently
+        proxy (str | None): Proxy for the scraping sessions
+    """
+    positions: dict[str, list[int]] = {}
+    for index, url in enumerate(urls):
+        positions.setdefault(url, []).append(index)
+    if not positions:
+        return
+
+    local = threading.local()
+    clients: list[Doujindesu] = []
+    clients_lock = threading.Lock()
+
+    def client() -> Doujindesu:
+        manga = getattr(local, "manga", None)
+        if manga is None:
+            manga = local.manga = Doujindesu("", proxy=proxy)
+            manga.scrape_session = manga.create_session
+            with clients_lock:
+                clients.append(manga)
+        return manga
+
+    def resolve(url: str) -> tuple[list[str], str | None]:
+        manga = client()
+        manga.url = url
+        try:
+            images = manga.get_all_images()
+        except Exception as e:
+            return [], str(e)
+        return (images, None) if images else ([], "No images found")
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(workers, len(positions))), thread_name_prefix="doudesu-batch")
+    try:
+        running = {executor.submit(tracing.wrap(resolve), url): url for url in positions}
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                url = running.pop(future)
+                images, error = future.result()
+                for index in positions[url]:
+                    yield ChapterImages(index, url, images, error)
+    finally:
+        # Waits for chapters in flight, so no session is closed while in use.
+        executor.shutdown(wait=True, cancel_futures=True)
+        for manga in clients:
+            manga.scrape_session.close()
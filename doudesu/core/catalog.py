@@ -0,0 +1,537 @@
+"""
+Persistent local catalogue of manga metadata.
+
+Stores titles, genres, authors, chapter lists and resolved image URL lists in
+SQLite together with the time they were fetched, so that repeated lookups are
+answered locally and already indexed titles stay available offline. The
+numeric IDs of chapters are kept too, so that resolving a known chapter again
+skips its HTML page.
+
+Every title seen on a search page or a details page is also added to a full-text
+index, which :meth:`Catalog.search` queries with genre, type, status and score
+filters, without going to the site.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode
+
+from ..models import DetailsRecord, DetailsResult, Result, ResultRecord, SearchRecord, SearchResult
+from ..utils.constants import (
+    CATALOG_FINISHED_MAX_AGE,
+    CATALOG_IMAGES_MAX_AGE,
+    CATALOG_MAX_AGE,
+    CATALOG_PATH,
+    LOCAL_SEARCH_PAGE_SIZE,
+    LOCAL_SEARCH_URL,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS titles (
+    url TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    thumbnail TEXT NOT NULL,
+    series TEXT,
+    author TEXT,
+    type TEXT,
+    score REAL,
+    status TEXT,
+    fetched_at REAL NOT NULL,
+    details_fetched_at REAL,
+    chapters_fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS genres (
+    title_url TEXT NOT NULL REFERENCES titles(url) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    genre TEXT NOT NULL,
+    PRIMARY KEY (title_url, position)
+);
+CREATE INDEX IF NOT EXISTS genres_genre ON genres(genre COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS titles_author ON titles(author);
+CREATE INDEX IF NOT EXISTS titles_type ON titles(type COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS titles_status ON titles(status COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS titles_score ON titles(score);
+CREATE INDEX IF NOT EXISTS titles_thumbnail ON titles(thumbnail);
+CREATE TABLE IF NOT EXISTS chapters (
+    title_url TEXT NOT NULL REFERENCES titles(url) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (title_url, position)
+);
+CREATE TABLE IF NOT EXISTS images (
+    chapter_url TEXT PRIMARY KEY,
+    urls TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chapter_ids (
+    chapter_url TEXT PRIMARY KEY,
+    id INTEGER NOT NULL
+);
+"""
+
+# Full-text index over titles, keyed by the rowid of the matching ``titles`` row.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS titles_fts USING fts5(
+    name, series, author, genre,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+SCORE_BUCKETS = ((0, 5), (5, 6), (6, 7), (7, 8), (8, 9), (9, 10))
+
+
+def local_search_url(query: str, page: int = 1, **filters) -> str:
+    """Build the URL of a local search page, see :data:`~doudesu.utils.constants.LOCAL_SEARCH_URL`."""
+    params = {"q": query, "page": page}
+    params.update({key: value for key, value in filters.items() if value not in (None, [], ())})
+    return f"{LOCAL_SEARCH_URL}?{urlencode(params, doseq=True)}"
+
+
+def parse_local_search_url(url: str) -> dict:
+    """Inverse of :func:`local_search_url`, returns keyword arguments for :meth:`Catalog.search`."""
+    params = parse_qs(url.partition("?")[2])
+    args = {"query": params.get("q", [""])[0], "page": int(params.get("page", ["1"])[0])}
+    if "genre" in params:
+        args["genre"] = params["genre"]
+    for key in ("type", "status"):
+        if key in params:
+            args[key] = params[key][0]
+    for key in ("min_score", "max_score"):
+        if key in params:
+            args[key] = float(params[key][0])
+    return args
+
+
+class Catalog:
+    """
+    SQLite-backed metadata store.
+
+    Lookups return None when an entry is missing or stale, unless
+    ``allow_stale`` is set, which is how callers fall back to old data when the
+    site can't be reached.
+
+    Args:
+        path (str | Path): Database file, or ``":memory:"``
+        max_age (float): Seconds before details and chapter lists are refetched
+        finished_max_age (float): Same, for titles whose status is "Finished"
+        images_max_age (float): Seconds before a chapter's image list is refetched
+    """
+
+    def __init__(
+        self,
+        path: str | Path = CATALOG_PATH,
+        max_age: float = CATALOG_MAX_AGE,
+        finished_max_age: float = CATALOG_FINISHED_MAX_AGE,
+        images_max_age: float = CATALOG_IMAGES_MAX_AGE,
+    ):
+        if str(path) != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_age = max_age
+        self.finished_max_age = finished_max_age
+        self.images_max_age = images_max_age
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            try:
+                self._conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5, search falls back to LIKE.
+                self.fts = False
+            if self.fts:
+                indexed = self._conn.execute("SELECT count(*) FROM titles_fts").fetchone()[0]
+                total = self._conn.execute("SELECT count(*) FROM titles").fetchone()[0]
+                if indexed != total:
+                    self._conn.execute("DELETE FROM titles_fts")
+                    self._index()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_fresh(self, fetched_at: float | None, status: str | None = None) -> bool:
+        """Whether data fetched at ``fetched_at`` for a title with ``status`` can still be used."""
+        if fetched_at is None:
+            return False
+        max_age = self.finished_max_age if (status or "").lower() == "finished" else self.max_age
+        return time.time() - fetched_at < max_age
+
+    def get_details(self, url: str, allow_stale: bool = False) -> DetailsResult | None:
+        """
+        Look up the details of a title.
+
+        Returns:
+            DetailsResult | None: Stored details, or None if missing or stale
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM titles WHERE url = ?", (url,)).fetchone()
+            if row is None or row["details_fetched_at"] is None:
+                return None
+            if not allow_stale and not self.is_fresh(row["details_fetched_at"], row["status"]):
+                return None
+            genres = self._genres(url)
+            chapters = self._chapters(url)
+
+        return DetailsRecord.create(
+            name=row["name"],
+            url=row["url"],
+            thumbnail=row["thumbnail"],
+            genre=genres,
+            series=row["series"] or "",
+            author=row["author"] or "",
+            type=row["type"],
+            score=row["score"],
+            status=row["status"],
+            chapter_urls=chapters,
+        ).to_model()
+
+    def put_details(self, details: DetailsResult):
+        """Store the details of a title, including its chapter list."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO titles (url, name, thumbnail, series, author, type, score, status,
+                                    fetched_at, details_fetched_at, chapters_fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    name = excluded.name,
+                    thumbnail = excluded.thumbnail,
+                    series = excluded.series,
+                    author = excluded.author,
+                    type = excluded.type,
+                    score = excluded.score,
+                    status = excluded.status,
+                    fetched_at = excluded.fetched_at,
+                    details_fetched_at = excluded.details_fetched_at,
+                    chapters_fetched_at = excluded.chapters_fetched_at
+                """,
+                (
+                    details.url,
+                    details.name,
+                    details.thumbnail,
+                    details.series,
+                    details.author,
+                    details.type,
+                    details.score,
+                    details.status,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+            self._replace_genres(details.url, details.genre)
+            self._replace_chapters(details.url, details.chapter_urls)
+            self._index([details.url])
+
+    def put_results(self, results: Sequence[Result | ResultRecord]):
+        """Store titles seen on a search or listing page, keeping any details already known."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO titles (url, name, thumbnail, type, score, status, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    name = excluded.name,
+                    thumbnail = excluded.thumbnail,
+                    type = excluded.type,
+                    score = excluded.score,
+                    status = excluded.status,
+                    fetched_at = excluded.fetched_at
+                """,
+                [(r.url, r.name, r.thumbnail, r.type, r.score, r.status, now) for r in results],
+            )
+            for result in results:
+                self._replace_genres(result.url, result.genre)
+            self._index([result.url for result in results])
+
+    def search(
+        self,
+        query: str = "",
+        page: int = 1,
+        per_page: int = LOCAL_SEARCH_PAGE_SIZE,
+        genre: str | list[str] | None = None,
+        type: str | None = None,
+        status: str | None = None,
+        min_score: float | None = None,
+        max_score: float | None = None,
+    ) -> SearchResult | None:
+        """
+        Search the indexed titles.
+
+        Args:
+            query (str): Full-text query over name, series, author and genres.
+                Every word must match, as a prefix. Empty matches everything
+            page (int): Page number, starting from 1
+            per_page (int): Results per page
+            genre (str | list[str] | None): Only titles having all these genres
+            type (str | None): Only titles of this type
+            status (str | None): Only titles with this status
+            min_score (float | None): Only titles scoring at least this
+            max_score (float | None): Only titles scoring at most this
+
+        Returns:
+            SearchResult | None: A page of results with local page URLs, or None if nothing matches
+        """
+        filters = {
+            "genre": [genre] if isinstance(genre, str) else genre,
+            "type": type,
+            "status": status,
+            "min_score": min_score,
+            "max_score": max_score,
+        }
+        source, where, params, order = self._filter_sql(query, **filters)
+        offset = (max(page, 1) - 1) * per_page
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT count(*) FROM {source} WHERE {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT t.* FROM {source} WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                [*params, per_page, offset],
+            ).fetchall()
+            genres = self._genres_for([row["url"] for row in rows])
+
+        if not rows:
+            return None
+        return SearchRecord(
+            results=tuple(
+                ResultRecord.create(
+                    name=row["name"],
+                    url=row["url"],
+                    thumbnail=row["thumbnail"],
+                    genre=genres.get(row["url"], []),
+                    type=row["type"],
+                    score=row["score"],
+                    status=row["status"],
+                )
+                for row in rows
+            ),
+            next_page_url=local_search_url(query, page + 1, **filters) if offset + per_page < total else None,
+            previous_page_url=local_search_url(query, page - 1, **filters) if page > 1 else None,
+        ).to_model()
+
+    def facets(self, query: str = "", **filters) -> dict[str, dict[str, int]]:
+        """
+        Count the titles matching ``query`` and ``filters`` per genre, type, status and score range.
+
+        Returns:
+            dict[str, dict[str, int]]: Counts keyed by facet name, then by facet value
+        """
+        if isinstance(filters.get("genre"), str):
+            filters["genre"] = [filters["genre"]]
+        source, where, params, _ = self._filter_sql(query, **filters)
+        buckets = " ".join(f"WHEN t.score < {high} THEN '{low}-{high}'" for low, high in SCORE_BUCKETS[:-1])
+        score_range = f"CASE {buckets} ELSE '{SCORE_BUCKETS[-1][0]}-{SCORE_BUCKETS[-1][1]}' END"
+        queries = {
+            "genre": f"SELECT g.genre, count(*) FROM {source} JOIN genres g ON g.title_url = t.url"
+            f" WHERE {where} GROUP BY g.genre",
+            "type": f"SELECT t.type, count(*) FROM {source} WHERE {where} GROUP BY t.type",
+            "status": f"SELECT t.status, count(*) FROM {source} WHERE {where} GROUP BY t.status",
+            "score": f"SELECT {score_range}, count(*) FROM {source} WHERE {where} GROUP BY 1",
+        }
+        with self._lock:
+            return {
+                name: dict(sorted(self._conn.execute(sql, params).fetchall(), key=lambda item: -item[1]))
+                for name, sql in queries.items()
+            }
+
+    def _filter_sql(
+        self,
+        query: str,
+        genre: list[str] | None = None,
+        type: str | None = None,
+        status: str | None = None,
+        min_score: float | None = None,
+        max_score: float | None = None,
+    ) -> tuple[str, str, list, str]:
+        """Build the FROM source, WHERE clause, parameters and ORDER BY for a search."""
+        # Titles only known by URL (see put_chapters) have no name and aren't listed.
+        source, where, params, order = "titles t", ["t.name != ''"], [], "t.score DESC, t.name"
+        words = re.findall(r"\w+", query)
+        if words and self.fts:
+            source = "titles t JOIN titles_fts ON titles_fts.rowid = t.rowid"
+            where.append("titles_fts MATCH ?")
+            params.append(" ".join(f'"{word}"*' for word in words))
+            order = "bm25(titles_fts), t.score DESC"
+        else:
+            for word in words:
+                where.append("(t.name LIKE ? OR t.series LIKE ? OR t.author LIKE ?)")
+                params.extend([f"%{word}%"] * 3)
+        for name in genre or []:
+            where.append("t.url IN (SELECT title_url FROM genres WHERE genre = ? COLLATE NOCASE)")
+            params.append(name)
+        if type:
+            where.append("t.type = ? COLLATE NOCASE")
+            params.append(type)
+        if status:
+            where.append("t.status = ? COLLATE NOCASE")
+            params.append(status)
+        if min_score is not None:
+            where.append("t.score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            where.append("t.score <= ?")
+            params.append(max_score)
+        return source, " AND ".join(where), params, order
+
+    def _index(self, urls: list[str] | None = None):
+        """Refresh the full-text index for ``urls``, or index every title when None."""
+        if not self.fts:
+            return
+        select = """
+            SELECT t.rowid, t.name, coalesce(t.series, ''), coalesce(t.author, ''),
+                   coalesce((SELECT group_concat(genre, ' ') FROM genres WHERE title_url = t.url), '')
+            FROM titles t
+        """
+        if urls is None:
+            self._conn.execute(f"INSERT INTO titles_fts (rowid, name, series, author, genre) {select}")
+            return
+        params = [(url,) for url in urls]
+        self._conn.executemany(
+            "DELETE FROM titles_fts WHERE rowid = (SELECT rowid FROM titles WHERE url = ?)",
+            params,
+        )
+        self._conn.executemany(
+            f"INSERT INTO titles_fts (rowid, name, series, author, genre) {select} WHERE t.url = ?",
+            params,
+        )
+
+    def get_chapters(self, url: str, allow_stale: bool = False) -> list[str] | None:
+        """
+        Look up the chapter list of a title.
+
+        Returns:
+            list[str] | None: Chapter URLs in reading order, or None if missing or stale
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT status, chapters_fetched_at FROM titles WHERE url = ?", (url,)).fetchone()
+            if row is None or row["chapters_fetched_at"] is None:
+                return None
+            if not allow_stale and not self.is_fresh(row["chapters_fetched_at"], row["status"]):
+                return None
+            return self._chapters(url)
+
+    def put_chapters(self, url: str, chapters: list[str]):
+        """
+        Store the chapter list of a title.
+
+        A title not seen in a search or listing yet, e.g. one opened by URL,
+        gets a placeholder row without a name, which local search skips until
+        its details or a listing fill it in.
+        """
+        with self._lock, self._conn:
+            added = self._conn.execute(
+                "INSERT INTO titles (url, name, thumbnail, fetched_at) VALUES (?, '', '', 0) ON CONFLICT(url) DO NOTHING",
+                (url,),
+            ).rowcount
+            self._conn.execute("UPDATE titles SET chapters_fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._replace_chapters(url, chapters)
+            if added:
+                self._index([url])
+
+    def get_images(self, chapter_url: str, allow_stale: bool = False) -> list[str] | None:
+        """
+        Look up the resolved image URLs of a chapter.
+
+        Returns:
+            list[str] | None: Image URLs, or None if missing or stale
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT urls, fetched_at FROM images WHERE chapter_url = ?", (chapter_url,)).fetchone()
+        if row is None:
+            return None
+        if not allow_stale and time.time() - row["fetched_at"] >= self.images_max_age:
+            return None
+        return json.loads(row["urls"])
+
+    def put_images(self, chapter_url: str, images: list[str]):
+        """Store the resolved image URLs of a chapter."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (chapter_url, urls, fetched_at) VALUES (?, ?, ?)",
+                (chapter_url, json.dumps(images), time.time()),
+            )
+
+    def has_thumbnail(self, url: str) -> bool:
+        """Whether ``url`` is the cover of a title in the catalogue."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM titles WHERE thumbnail = ? LIMIT 1", (url,)).fetchone() is not None
+
+    def get_chapter_id(self, chapter_url: str) -> int | None:
+        """
+        Look up the numeric ID the site's chapter API knows a chapter by.
+
+        IDs don't change, so they never go stale.
+
+        Returns:
+            int | None: Chapter ID, or None if not known
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM chapter_ids WHERE chapter_url = ?", (chapter_url,)).fetchone()
+        return row["id"] if row else None
+
+    def put_chapter_ids(self, ids: dict[str, int]):
+        """Store chapter IDs, keyed by chapter URL."""
+        if not ids:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO chapter_ids (chapter_url, id) VALUES (?, ?)", ids.items())
+
+    def _genres_for(self, urls: list[str]) -> dict[str, list[str]]:
+        genres: dict[str, list[str]] = {}
+        if not urls:
+            return genres
+        placeholders = ",".join("?" * len(urls))
+        rows = self._conn.execute(
+            f"SELECT title_url, genre FROM genres WHERE title_url IN ({placeholders}) ORDER BY title_url, position",
+            urls,
+        )
+        for row in rows:
+            genres.setdefault(row["title_url"], []).append(row["genre"])
+        return genres
+
+    def _genres(self, url: str) -> list[str]:
+        rows = self._conn.execute("SELECT genre FROM genres WHERE title_url = ? ORDER BY position", (url,))
+        return [row["genre"] for row in rows]
+
+    def _chapters(self, url: str) -> list[str]:
+        rows = self._conn.execute("SELECT url FROM chapters WHERE title_url = ? ORDER BY position", (url,))
+        return [row["url"] for row in rows]
+
+    def _replace_genres(self, url: str, genres: list[str]):
+        self._conn.execute("DELETE FROM genres WHERE title_url = ?", (url,))
+        self._conn.executemany(
+            "INSERT INTO genres (title_url, position, genre) VALUES (?, ?, ?)",
+            [(url, i, genre) for i, genre in enumerate(genres)],
+        )
+
+    def _replace_chapters(self, url: str, chapters: list[str]):
+        self._conn.execute("DELETE FROM chapters WHERE title_url = ?", (url,))
+        self._conn.executemany(
+            "INSERT INTO chapters (title_url, position, url) VALUES (?, ?, ?)",
+            [(url, i, chapter) for i, chapter in enumerate(chapters)],
+        )
+
+
+_catalog: Catalog | None = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Return the process-wide catalogue stored in the user's data directory."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog()
+        return _catalog
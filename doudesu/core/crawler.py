@@ -0,0 +1,283 @@
+"""
+Bulk crawler for search and listing pages.
+
+Following ``next_page_url`` one hop at a time visits a listing strictly in
+sequence. :class:`Crawler` instead reads the pagination links of every page it
+fetches, expands them into the full range of page URLs, and fetches those
+concurrently while keeping a global minimum delay between requests. Titles are
+stored in the catalogue as each page is parsed, and the frontier is
+checkpointed to disk so an interrupted crawl resumes where it stopped.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from ..models import SearchRecord
+from ..utils.constants import (
+    BASE_URL,
+    CRAWL_CHECKPOINT_EVERY,
+    CRAWL_CHECKPOINT_PATH,
+    CRAWL_DELAY,
+    CRAWL_MAX_ATTEMPTS,
+    CRAWL_SEED_URL,
+    CRAWL_WORKERS,
+)
+from .doudesu import Doujindesu
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup as Bs
+
+PAGE_NUMBER_PATTERN = re.compile(r"/page/(\d+)/")
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a page URL used for deduplication: no fragment, trailing slash, no ``/page/1/``."""
+    scheme, netloc, path, query, _ = urlsplit(url)
+    if not path.endswith("/"):
+        path += "/"
+    path = re.sub(r"/page/1/$", "/", path)
+    return urlunsplit((scheme, netloc.lower(), path, query, ""))
+
+
+@dataclass
+class CrawlStats:
+    """
+    Progress of a crawl.
+
+    Attributes:
+        pages (int): Listing pages fetched and parsed
+        failed (int): Pages given up on after ``max_attempts`` tries
+        retries (int): Fetches retried after an error
+        titles (int): Distinct titles found
+        pending (int): Pages discovered but not fetched yet
+        elapsed (float): Seconds spent crawling in this run
+    """
+
+    pages: int = 0
+    failed: int = 0
+    retries: int = 0
+    titles: int = 0
+    pending: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "pages_per_second": self.pages_per_second}
+
+
+class Crawler:
+    """
+    Concurrent crawler of paginated listing or search pages.
+
+    Args:
+        seeds (list[str] | None): Pages to start from, defaults to the full
+            manga listing
+        workers (int): Pages fetched concurrently
+        delay (float): Minimum seconds between two page requests, across all workers
+        max_attempts (int): Tries per page before it is counted as failed
+        max_pages (int | None): Stop after fetching this many pages in this run
+        checkpoint_path (str | Path | None): File the frontier is saved to, None
+            disables checkpointing
+        resume (bool): Continue from an existing checkpoint instead of the seeds
+        on_page (Callable[[str, SearchRecord | None], None] | None): Called on the
+            worker thread with each parsed page
+        proxy (str | None): Proxy used for page requests
+    """
+
+    def __init__(
+        self,
+        seeds: list[str] | None = None,
+        workers: int = CRAWL_WORKERS,
+        delay: float = CRAWL_DELAY,
+        max_attempts: int = CRAWL_MAX_ATTEMPTS,
+        max_pages: int | None = None,
+        checkpoint_path: str | Path | None = CRAWL_CHECKPOINT_PATH,
+        resume: bool = True,
+        on_page: Callable[[str, SearchRecord | None], None] | None = None,
+        proxy: str | None = None,
+    ):
+        self.seeds = [normalize_url(url) for url in seeds or [CRAWL_SEED_URL]]
+        self.workers = workers
+        self.delay = delay
+        self.max_attempts = max_attempts
+        self.max_pages = max_pages
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path else None
+        self.on_page = on_page
+        self.proxy = proxy
+        self.stats = CrawlStats()
+        self._frontier: deque[str] = deque()
+        self._seen: set[str] = set()
+        self._done: set[str] = set()
+        self._titles: set[str] = set()
+        self._attempts: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._next_request = 0.0
+
+        if not (resume and self._load_checkpoint()):
+            for url in self.seeds:
+                self._enqueue(url)
+
+    def run(self) -> CrawlStats:
+        """
+        Crawl until the frontier is empty, ``max_pages`` is reached or :meth:`stop` is called.
+
+        Returns:
+            CrawlStats: Final statistics of this run
+        """
+        started = time.monotonic()
+        since_checkpoint = 0
+        fetched = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="doudesu-crawl") as executor:
+                running = {}
+                while not self._stop.is_set():
+                    with self._lock:
+                        while self._frontier and len(running) < self.workers:
+                            if self.max_pages is not None and fetched >= self.max_pages:
+                                break
+                            url = self._frontier.popleft()
+                            running[executor.submit(self._crawl_page, url)] = url
+                            fetched += 1
+                    if not running:
+                        break
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        del running[future]
+                        since_checkpoint += 1
+                    self.stats.elapsed = time.monotonic() - started
+                    if since_checkpoint >= CRAWL_CHECKPOINT_EVERY:
+                        self.save_checkpoint(in_flight=running.values())
+                        since_checkpoint = 0
+        finally:
+            # Leaving the executor waits for pages still in flight, so only
+            # unfetched pages remain in the frontier.
+            self.save_checkpoint()
+        self.stats.elapsed = time.monotonic() - started
+        return self.stats
+
+    def stop(self):
+        """Stop handing out new pages; pages in flight are finished and checkpointed."""
+        self._stop.set()
+
+    def save_checkpoint(self, in_flight=()):
+        """Atomically write the frontier, seen and done sets to the checkpoint file."""
+        if self.checkpoint_path is None:
+            return
+        with self._lock:
+            state = {
+                "seeds": self.seeds,
+                "frontier": list(dict.fromkeys(url for url in (*in_flight, *self._frontier) if url not in self._done)),
+                "seen": sorted(self._seen),
+                "done": sorted(self._done),
+                "titles": self.stats.titles,
+            }
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state))
+        os.replace(tmp, self.checkpoint_path)
+
+    def _load_checkpoint(self) -> bool:
+        if self.checkpoint_path is None:
+            return False
+        try:
+            state = json.loads(self.checkpoint_path.read_text())
+        except (OSError, ValueError):
+            return False
+        if state.get("seeds") != self.seeds or not state.get("frontier"):
+            return False
+        self._seen = set(state["seen"])
+        self._done = set(state["done"])
+        self._frontier = deque(url for url in state["frontier"] if url not in self._done)
+        self.stats.titles = state.get("titles", 0)
+        self.stats.pending = len(self._frontier)
+        return True
+
+    def _enqueue(self, url: str) -> bool:
+        """Add ``url`` to the frontier unless it was seen before. Caller holds the lock or is single-threaded."""
+        url = normalize_url(url)
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._frontier.append(url)
+        self.stats.pending = len(self._frontier)
+        return True
+
+    def _wait_turn(self):
+        """Block until this worker may send a request, keeping ``delay`` between requests."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def _crawl_page(self, url: str):
+        self._wait_turn()
+        page = Doujindesu(url, proxy=self.proxy)
+        try:
+            result = page.get_search_record()
+        except Exception:
+            with self._lock:
+                attempts = self._attempts.get(url, 0) + 1
+                self._attempts[url] = attempts
+                if attempts < self.max_attempts:
+                    self.stats.retries += 1
+                    self._frontier.append(url)
+                else:
+                    self.stats.failed += 1
+                    self._done.add(url)
+            return
+
+        links = self.discover(page.soup, url)
+        with self._lock:
+            for link in links:
+                self._enqueue(link)
+            self._done.add(url)
+            self._attempts.pop(url, None)
+            self.stats.pages += 1
+            if result:
+                new = {item.url for item in result.results} - self._titles
+                self._titles |= new
+                self.stats.titles += len(new)
+            self.stats.pending = len(self._frontier)
+
+        if self.on_page:
+            self.on_page(url, result)
+
+    @staticmethod
+    def discover(soup: "Bs | None", url: str) -> list[str]:
+        """
+        Find the other listing pages linked from a listing page.
+
+        Pagination only shows a few page numbers around the current one plus the
+        last, so the highest page number seen is expanded into the whole range
+        ``/page/2/`` .. ``/page/N/`` to let workers fetch far ahead.
+        """
+        if soup is None:
+            return []
+        links = []
+        anchors = soup.select(".pagination a[href]") or soup.select("a[title='Next page'], a[title='Previous page']")
+        for anchor in anchors:
+            links.append(urljoin(BASE_URL, anchor["href"]))
+
+        numbered = [(int(match.group(1)), link) for link in links if (match := PAGE_NUMBER_PATTERN.search(link))]
+        if numbered:
+            last, template = max(numbered)
+            links.extend(PAGE_NUMBER_PATTERN.sub(f"/page/{n}/", template, count=1) for n in range(2, last + 1))
+        base = urlsplit(url).netloc
+        return [link for link in links if urlsplit(link).netloc == base]
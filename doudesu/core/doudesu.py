@@ -5,21 +5,31 @@ This module provides a Python interface for interacting with doujindesu.tv,
 allowing users to search, download, and convert manga chapters to PDF format.
 """
 
-import re
+import os
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
 
-from bs4 import BeautifulSoup as Bs
-from tls_client import Session
-
-from ..models import DetailsResult, Result, SearchResult
+from ..models import DetailsResult, ResultRecord, SearchRecord, SearchResult
+from ..utils import extract, tracing
 from ..utils.constants import (
     BASE_URL,
     CHAPTER_API_ENDPOINT,
-    CHAPTER_ID_PATTERN,
     HEADERS,
-    IMAGE_SRC_PATTERN,
+    LOCAL_SEARCH_URL,
     TLS_CLIENT_CONFIG,
 )
 from ..utils.converter import ImageToPDFConverter
+from ..utils.metrics import CACHE_LOOKUPS, CHAPTER_IMAGES_SECONDS, SCRAPE_FAILURES, SCRAPE_SECONDS
+from ..utils.ratelimit import request_with_retries
+
+# BeautifulSoup and tls_client are imported on first scrape, keeping
+# ``import doudesu`` cheap for callers that only need the models or constants.
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup as Bs
+    from tls_client import Session
+
+    from .catalog import Catalog
 
 
 class Doujindesu(ImageToPDFConverter):
@@ -29,51 +39,146 @@ class Doujindesu(ImageToPDFConverter):
 
     Inherits from ImageToPDFConverter to provide PDF conversion capabilities.
 
+    Details, chapter lists and image lists are read through the local
+    :class:`~doudesu.core.catalog.Catalog`: fresh entries are served without
+    touching the site, and stale entries are used as a fallback when the site
+    can't be reached. Set ``DOUDESU_OFFLINE=1`` to never go to the site.
+
     Args:
         url (str): The URL to the manga page or search results
         proxy (Optional[str]): Proxy server URL if needed
+        catalog (Optional[Catalog]): Catalogue to read through, defaults to the
+            shared one when :attr:`use_catalog` is set
+        scrape_session (Optional[Session]): Session to send every page request through and
+            leave open, e.g. one per worker thread of a batch; by default each
+            request opens and closes its own
 
     Attributes:
         url (str): Current URL being processed
         proxy (Optional[str]): Proxy server configuration
         soup (Optional[Bs]): BeautifulSoup object for parsing HTML
+        use_catalog (bool): Class-wide switch for the default catalogue
+        offline (bool): Class-wide switch to serve only from the catalogue
     """
 
-    def __init__(self, url: str, proxy: str | None = None):
+    use_catalog: bool = os.environ.get("DOUDESU_CATALOG", "1") != "0"
+    offline: bool = os.environ.get("DOUDESU_OFFLINE", "0") == "1"
+
+    def __init__(
+        self,
+        url: str,
+        proxy: str | None = None,
+        catalog: "Catalog | None" = None,
+        scrape_session: "Session | None" = None,
+    ):
         super().__init__()
         self.url: str = url
         self.proxy: str | None = proxy
         self.soup: Bs | None = None
+        self.scrape_session = scrape_session
+        self._catalog = catalog
+
+    @property
+    def catalog(self) -> "Catalog | None":
+        """The catalogue lookups read through, or None when disabled."""
+        if self._catalog is None and self.use_catalog:
+            from .catalog import get_catalog
+
+            self._catalog = get_catalog()
+        return self._catalog
+
+    def _read_through(self, lookup, fetch, store):
+        """
+        Serve from the catalogue when fresh, otherwise fetch and store.
+
+        Falls back to a stale catalogue entry if fetching fails or we are offline.
+        """
+        catalog = self.catalog
+        if catalog is None:
+            return fetch()
+
+        cached = lookup(catalog, allow_stale=self.offline)
+        if cached is not None or self.offline:
+            CACHE_LOOKUPS.inc(cache="catalog", result="hit" if cached is not None else "miss")
+            return cached
+
+        try:
+            result = fetch()
+        except Exception:
+            stale = lookup(catalog, allow_stale=True)
+            if stale is None:
+                CACHE_LOOKUPS.inc(cache="catalog", result="miss")
+                raise
+            CACHE_LOOKUPS.inc(cache="catalog", result="stale")
+            return stale
+
+        CACHE_LOOKUPS.inc(cache="catalog", result="miss")
+
+        if result:
+            store(catalog, result)
+        return result
 
     @property
-    def create_session(self) -> Session:
+    def create_session(self) -> "Session":
         """
         Creates and configures a TLS session for making requests.
 
         Returns:
             Session: Configured TLS session object
         """
+        from tls_client import Session
+
         session = Session(**TLS_CLIENT_CONFIG)
         if self.proxy:
             session.proxies.update({"http": self.proxy})
         session.headers.update(HEADERS)
         return session
 
-    def scrap(self) -> None:
+    @contextmanager
+    def _session(self) -> Iterator["Session"]:
+        """The shared session if one was given, otherwise a new one closed afterwards."""
+        if self.scrape_session is not None:
+            yield self.scrape_session
+            return
+        session = self.create_session
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def scrap(self, parse: bool = True) -> bytes:
         """
         Scrapes the current URL and updates the soup attribute with parsed HTML.
-        """
-        ses = self.create_session
-        content = ses.get(self.url).text
-        self.soup = Bs(content, "html.parser")
-        ses.close()
 
-    def get_id(self, text: str) -> int | None:
+        Args:
+            parse (bool): Whether to parse the page into :attr:`soup`; pages that
+                are only scanned with :mod:`~doudesu.utils.extract` skip it
+
+        Returns:
+            bytes: The raw page
+        """
+        with SCRAPE_SECONDS.time(), tracing.span("scrape", tracing.CLIENT, url=self.url) as span:
+            with self._session() as ses:
+                try:
+                    response = request_with_retries(self.url, lambda: ses.get(self.url))
+                except Exception:
+                    SCRAPE_FAILURES.inc()
+                    raise
+            content = response.content
+            if span:
+                span.set(status=response.status_code, bytes=len(content))
+            if parse:
+                from bs4 import BeautifulSoup as Bs
+
+                self.soup = Bs(response.text, "html.parser")
+        return content
+
+    def get_id(self, text: str | bytes) -> int | None:
         """
         Extracts the manga ID from the given text.
 
         Args:
-            text (str): HTML text containing the manga ID
+            text (str | bytes): HTML text containing the manga ID
 
         Returns:
             int | None: Extracted manga ID or None if not found
@@ -81,11 +186,10 @@ class Doujindesu(ImageToPDFConverter):
         Raises:
             ValueError: If ID cannot be extracted from the text
         """
-        match = re.search(CHAPTER_ID_PATTERN, text)
-        if match:
-            return int(match.group(1))
-        else:
+        _id = extract.chapter_id(text)
+        if _id is None:
             raise ValueError("ID could not be extracted from the text.")
+        return _id
 
     def get_all_chapters(self) -> list[str]:
         """
@@ -94,34 +198,97 @@ class Doujindesu(ImageToPDFConverter):
         Returns:
             list[str]: List of chapter URLs
         """
-        self.scrap()
+
+        def fetch():
+            self.scrap()
+            return self._parse_chapters()
+
+        return self._read_through(
+            lambda catalog, allow_stale: catalog.get_chapters(self.url, allow_stale=allow_stale),
+            fetch,
+            lambda catalog, chapters: catalog.put_chapters(self.url, chapters),
+        )
+
+    def _parse_chapters(self) -> list[str]:
+        """Extracts chapter URLs from the scraped manga page, oldest first."""
         all_chapters = [BASE_URL + x.a.get("href") for x in self.soup.select("span.eps")]
 
         filtered_chapters = []
         for chapter in all_chapters:
-            match = re.search(r"chapter-([0-9.-]+)", chapter)
-            if match:
-                chapter_num = match.group(1)
-                if "-" not in chapter_num:
-                    filtered_chapters.append(chapter)
-            else:
+            chapter_num = extract.chapter_number(chapter)
+            if chapter_num is None or "-" not in chapter_num:
                 filtered_chapters.append(chapter)
 
+        if self.catalog is not None:
+            self.catalog.put_chapter_ids(self._parse_chapter_ids())
         return list(reversed(filtered_chapters))
 
+    def _parse_chapter_ids(self) -> dict[str, int]:
+        """Chapter IDs listed on the scraped manga page, from ``data-id`` attributes of the chapter entries."""
+        ids = {}
+        for eps in self.soup.select("span.eps"):
+            if eps.a is None:
+                continue
+            for tag in (eps.a, eps, eps.find_parent("li")):
+                value = tag.get("data-id") if tag is not None else None
+                if value and value.isdigit():
+                    ids[BASE_URL + eps.a.get("href")] = int(value)
+                    break
+        return ids
+
     def get_all_images(self) -> list[str]:
         """
         Retrieves all image URLs from the current chapter.
 
+        When the chapter's ID is already in the catalogue, only the chapter
+        API is called; otherwise the chapter page is scraped for the ID first.
+
         Returns:
             list[str]: List of image URLs for the chapter
         """
-        self.scrap()
-        _id = self.get_id(self.soup.prettify())
-        ses = self.create_session
-        req = ses.post(CHAPTER_API_ENDPOINT, data={"id": _id})
-        ses.close()
-        return re.findall(IMAGE_SRC_PATTERN, req.text)
+
+        def fetch():
+            catalog = self.catalog
+            known = catalog.get_chapter_id(self.url) if catalog is not None else None
+            if catalog is not None:
+                CACHE_LOOKUPS.inc(cache="chapter_id", result="hit" if known is not None else "miss")
+            if known is not None:
+                images = self.get_images_by_id(known)
+                if images:
+                    return images
+                # The ID no longer resolves; learn it again from the page.
+            _id = self.get_id(self.scrap(parse=False))
+            if catalog is not None:
+                catalog.put_chapter_ids({self.url: _id})
+            return self.get_images_by_id(_id)
+
+        with CHAPTER_IMAGES_SECONDS.time(), tracing.span("chapter.images", url=self.url):
+            return self._read_through(
+                lambda catalog, allow_stale: catalog.get_images(self.url, allow_stale=allow_stale),
+                fetch,
+                lambda catalog, images: catalog.put_images(self.url, images),
+            )
+
+    def get_images_by_id(self, chapter_id: int) -> list[str]:
+        """
+        Retrieves the image URLs of a chapter by its numeric ID, without loading the chapter page.
+
+        Args:
+            chapter_id (int): Chapter ID, as in the ``load_data(<id>)`` call of the chapter page
+
+        Returns:
+            list[str]: List of image URLs for the chapter
+        """
+        with tracing.span("chapter.resolve", tracing.CLIENT, url=CHAPTER_API_ENDPOINT, chapter_id=chapter_id) as span:
+            with self._session() as ses:
+                req = request_with_retries(
+                    CHAPTER_API_ENDPOINT,
+                    lambda: ses.post(CHAPTER_API_ENDPOINT, data={"id": chapter_id}),
+                )
+            images = extract.image_urls(req.content)
+            if span:
+                span.set(status=req.status_code, images=len(images))
+        return images
 
     def get_details(self) -> DetailsResult | None:
         """
@@ -130,6 +297,13 @@ class Doujindesu(ImageToPDFConverter):
         Returns:
             DetailsResult | None: Detailed manga information or None if not found
         """
+        return self._read_through(
+            lambda catalog, allow_stale: catalog.get_details(self.url, allow_stale=allow_stale),
+            self._fetch_details,
+            lambda catalog, details: catalog.put_details(details),
+        )
+
+    def _fetch_details(self) -> DetailsResult | None:
         self.scrap()
         soup = self.soup.find("main", {"id": "archive"})
         if not soup:
@@ -144,7 +318,7 @@ class Doujindesu(ImageToPDFConverter):
             type=soup.find("tr", {"class": "magazines"}).a.text.strip(),
             score=float(soup.find("div", {"class": "rating-prc"}).text.strip()),
             status=soup.find("tr").a.text.strip(),
-            chapter_urls=self.get_all_chapters(),
+            chapter_urls=self._parse_chapters(),
         )
 
     def get_search(self) -> SearchResult | None:
@@ -154,6 +328,16 @@ class Doujindesu(ImageToPDFConverter):
         Returns:
             SearchResult | None: Search results with pagination or None if no results found
         """
+        record = self.get_search_record()
+        return record.to_model() if record else None
+
+    def get_search_record(self) -> SearchRecord | None:
+        """
+        Retrieves search results from the current URL as compact records, for bulk use such as crawls.
+
+        Returns:
+            SearchRecord | None: Search results with pagination or None if no results found
+        """
         self.scrap()
         if "No result found" in self.soup.prettify():
             return None
@@ -167,9 +351,9 @@ class Doujindesu(ImageToPDFConverter):
             if self.soup.find("a", {"title": "Previous page"})
             else None
         )
-        return SearchResult(
-            results=[
-                Result(
+        result = SearchRecord(
+            results=tuple(
+                ResultRecord.create(
                     name=y.h3.text.strip(),
                     url=BASE_URL + y.a.get("href"),
                     thumbnail=y.img.get("src"),
@@ -179,10 +363,14 @@ class Doujindesu(ImageToPDFConverter):
                     status=y.find("div", {"class": "status"}).text,
                 )
                 for y in self.soup.find("div", {"class": "entries"}).select("article")
-            ],
+            ),
             next_page_url=next_page,
             previous_page_url=previous_page,
         )
+        if self.catalog is not None:
+            # Every title seen while browsing becomes searchable offline.
+            self.catalog.put_results(result.results)
+        return result
 
     @classmethod
     def search(cls, query: str, page: int | None = None) -> SearchResult | None:
@@ -210,9 +398,35 @@ class Doujindesu(ImageToPDFConverter):
         Returns:
             SearchResult | None: Search results or None if no results found
         """
+        if url.startswith(LOCAL_SEARCH_URL):
+            from .catalog import get_catalog, parse_local_search_url
+
+            return get_catalog().search(**parse_local_search_url(url))
         x = cls(url)
         return x.get_search()
 
+    @classmethod
+    def search_local(cls, query: str = "", page: int | None = None, **filters) -> SearchResult | None:
+        """
+        Searches the local catalogue instead of the site.
+
+        Only titles that have been seen before, on a search page or a details
+        page, can be found. Next and previous page URLs of the result can be
+        passed to :meth:`get_search_by_url` like those of a site search.
+
+        Args:
+            query (str): Search keywords, matched against name, series, author and genres
+            page (int | None): Page number
+            **filters: ``genre``, ``type``, ``status``, ``min_score`` and
+                ``max_score``, see :meth:`~doudesu.core.catalog.Catalog.search`
+
+        Returns:
+            SearchResult | None: Search results or None if no results found
+        """
+        from .catalog import get_catalog
+
+        return get_catalog().search(query, page=page or 1, **filters)
+
 
 def example_usage():
     manga = Doujindesu(f"{BASE_URL}/manga/seiwayaki-kaasan-ni-doutei-made-sewa-shitemoraimasu/")
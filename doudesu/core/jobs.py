@@ -0,0 +1,283 @@
+"""
+Background chapter download jobs.
+
+The API can't hold a request open while a chapter is downloaded and written
+as a PDF, so :class:`JobManager` runs downloads on a worker pool and hands out
+:class:`DownloadJob` handles. Clients poll a job for its status and latest
+:class:`~doudesu.utils.progress.ProgressEvent`, or follow its ``events``
+topic, which the API streams over SSE and WebSocket. The command line's batch
+mode queues its chapters here too and waits on the jobs.
+"""
+
+import itertools
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from ..models import DetailsResult
+from ..utils import tracing
+from ..utils.constants import EXPORT_FORMATS, JOB_OUTPUT_DIR, JOB_RETENTION, JOB_WORKERS
+from ..utils.converter import ImageToPDFConverter
+from ..utils.progress import JobProgress, ProgressEvent
+from ..utils.pubsub import Topic
+from .doudesu import Doujindesu
+
+
+def safe_filename(name: str) -> str:
+    """``name`` with characters that are invalid in file names replaced."""
+    return re.sub(r'[<>:"/\\|?*]', "_", name).strip(". ") or "chapter"
+
+
+def parse_chapter_selection(expression: str, total: int) -> list[int]:
+    """
+    Chapter numbers, from 1, picked by a selection expression over ``total`` chapters.
+
+    The expression is a comma-separated list of chapter numbers ``N``, ranges
+    ``A-B`` (``A-`` runs to the last chapter), ``latest`` or ``latest:N`` for
+    the last N chapters, and ``all``; for example ``1-10,15,latest:3``.
+
+    Returns:
+        list[int]: The selected chapter numbers, in order and without duplicates
+
+    Raises:
+        ValueError: If the expression is malformed, selects nothing, or names a
+            chapter outside 1 to ``total``
+    """
+    numbers: set[int] = set()
+    for part in expression.lower().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if part == "all":
+                numbers.update(range(1, total + 1))
+            elif part == "latest" or part.startswith("latest:"):
+                count = int(part.partition(":")[2] or 1)
+                if count < 1:
+                    raise ValueError
+                numbers.update(range(max(1, total - count + 1), total + 1))
+            elif "-" in part:
+                start, _, end = part.partition("-")
+                first, last = int(start), int(end) if end.strip() else total
+                if first > last:
+                    raise ValueError
+                numbers.update(range(first, last + 1))
+            else:
+                numbers.add(int(part))
+        except ValueError:
+            raise ValueError(f"Invalid chapter selection: {part!r}") from None
+    if not numbers:
+        raise ValueError("No chapters selected")
+    if min(numbers) < 1 or max(numbers) > total:
+        raise ValueError(f"Chapters must be between 1 and {total}")
+    return sorted(numbers)
+
+
+class JobCancelledError(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+
+@dataclass(eq=False)
+class DownloadJob:
+    """
+    A queued or running download of chapters of one title.
+
+    Attributes:
+        id (str): Job identifier
+        url (str): Title URL
+        chapters (list[int] | None): Chapter numbers to download, from 1, None for all
+        format (str): File format the chapters are written in, one of
+            :data:`~doudesu.utils.constants.EXPORT_FORMATS`
+        directory (str | None): Where the files go, instead of the manager's
+            ``output_dir/<job id>/``
+        details (DetailsResult | None): Details of the title, already looked
+            up by the caller; fetched when the job runs if None
+        status (str): ``queued``, ``running``, ``done`` or ``failed``
+        files (list[str]): Files written so far
+        error (str | None): Why the job failed
+        progress (JobProgress): Progress events of the job
+        events (Topic[ProgressEvent]): The progress events for streaming,
+            closed when the job finishes
+        created (float): Submission time, as a Unix timestamp
+    """
+
+    id: str
+    url: str
+    chapters: list[int] | None = None
+    format: str = "pdf"
+    directory: str | None = None
+    details: DetailsResult | None = None
+    status: str = "queued"
+    files: list[str] = field(default_factory=list)
+    error: str | None = None
+    progress: JobProgress = field(default_factory=JobProgress)
+    events: Topic[ProgressEvent] = field(default_factory=Topic)
+    created: float = field(default_factory=time.time)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self):
+        """Request cancellation. A queued job fails as soon as it starts, a running one at its next page."""
+        self._cancel.set()
+
+    def check_cancelled(self):
+        """Raise :class:`JobCancelledError` if cancellation was requested."""
+        if self._cancel.is_set():
+            raise JobCancelledError("Cancelled")
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until the job finishes or ``timeout`` seconds pass; return whether it finished."""
+        return self._done.wait(timeout)
+
+    def as_dict(self) -> dict:
+        latest = self.progress.latest
+        return {
+            "id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "files": list(self.files),
+            "error": self.error,
+            "progress": latest.as_dict() if latest else None,
+        }
+
+
+class JobManager:
+    """
+    Runs download jobs on a bounded worker pool.
+
+    Args:
+        workers (int): Jobs run concurrently; the rest wait in the queue
+        output_dir (str): Files of a job go to ``output_dir/<job id>/``
+        retention (int): Finished jobs remembered, oldest forgotten first.
+            A forgotten job's ``output_dir/<job id>/`` is deleted with it
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, output_dir: str = JOB_OUTPUT_DIR, retention: int = JOB_RETENTION):
+        self.output_dir = output_dir
+        self.retention = retention
+        self._jobs: OrderedDict[str, DownloadJob] = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="doudesu-job")
+
+    def submit(
+        self,
+        url: str,
+        chapters: list[int] | None = None,
+        format: str = "pdf",
+        directory: str | None = None,
+        details: DetailsResult | None = None,
+    ) -> DownloadJob:
+        """
+        Queue a download of ``chapters`` of the title at ``url``, all of them when None.
+
+        Args:
+            url (str): Title URL
+            chapters (list[int] | None): Chapter numbers, from 1
+            format (str): One of :data:`~doudesu.utils.constants.EXPORT_FORMATS`
+            directory (str | None): Write the files here instead of ``output_dir/<job id>/``
+            details (DetailsResult | None): Details of the title when the caller
+                has them, so the job doesn't look them up again
+
+        Raises:
+            ValueError: If ``format`` isn't supported
+        """
+        if format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported format {format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+        with self._lock:
+            job_id = f"{int(time.time())}-{next(self._ids)}"
+            job = DownloadJob(
+                job_id,
+                url,
+                chapters,
+                format,
+                directory,
+                details,
+                progress=JobProgress(len(chapters) if chapters else 1, job_id=job_id),
+            )
+            job.progress.subscribe(job.events.publish)
+            self._jobs[job_id] = job
+            pruned = self._prune()
+        for old in pruned:
+            if old.directory is None:
+                shutil.rmtree(os.path.join(self.output_dir, old.id), ignore_errors=True)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> DownloadJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> list[DownloadJob]:
+        """Forget the oldest finished jobs beyond ``retention`` and return them. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        return [self._jobs.pop(job_id) for job_id in finished[: max(0, len(finished) - self.retention)]]
+
+    def _run(self, job: DownloadJob):
+        job.status = "running"
+        progress = job.progress
+        try:
+            job.check_cancelled()
+            manga = Doujindesu(job.url)
+            details = job.details or manga.get_details()
+            if not details:
+                raise ValueError("Manga not found")
+            urls = details.chapter_urls
+            numbers = job.chapters or list(range(1, len(urls) + 1))
+            if any(number < 1 or number > len(urls) for number in numbers):
+                raise ValueError(f"Chapters must be between 1 and {len(urls)}")
+            progress.chapters = len(numbers)
+            progress.start()
+
+            directory = job.directory or os.path.join(self.output_dir, job.id)
+            os.makedirs(directory, exist_ok=True)
+            for number in numbers:
+                job.check_cancelled()
+                title = details.name if len(urls) == 1 else f"{details.name} - Chapter {number}"
+                with tracing.span("chapter", url=urls[number - 1], title=title, job=job.id):
+                    manga.url = urls[number - 1]
+                    images = manga.get_all_images()
+                    if not images:
+                        continue
+                    path = os.path.join(directory, f"{safe_filename(title)}.{job.format}")
+                    converter = ImageToPDFConverter(images, path)
+                    export = converter.convert_images_to_cbz if job.format == "cbz" else converter.convert_images_to_pdf
+                    with progress.chapter(title, len(images)) as chapter:
+                        export(images, path, progress=chapter, check_cancelled=job.check_cancelled)
+                job.files.append(path)
+        except Exception as e:
+            job.error = str(e)
+            progress.finish(job.error)
+            job.status = "failed"
+        else:
+            progress.finish()
+            job.status = "done"
+        finally:
+            job.events.close()
+            job._done.set()
+
+
+_manager: JobManager | None = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
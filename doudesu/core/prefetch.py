@@ -0,0 +1,185 @@
+"""
+Speculative prefetching of search and detail pages.
+
+After a search page is shown, the user usually either pages forward or opens
+one of the top results. :class:`Prefetcher` fetches those pages in the
+background into a short-lived cache so that the next click is served locally
+instead of waiting a full round-trip.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+
+from ..models import DetailsResult, SearchResult
+from ..utils.constants import PREFETCH_BUDGET, PREFETCH_DETAILS_TOP_N, PREFETCH_TTL
+from .doudesu import Doujindesu
+
+
+@dataclass
+class PrefetchStats:
+    """
+    Counters describing how useful prefetching has been.
+
+    Attributes:
+        issued (int): Speculative fetches started
+        hits (int): Lookups answered from the cache instead of the site
+        misses (int): Lookups that had to go to the site
+        wasted (int): Prefetched entries that expired or were dropped unused
+        skipped (int): Prefetches not started because the budget was exhausted
+    """
+
+    issued: int = 0
+    hits: int = 0
+    misses: int = 0
+    wasted: int = 0
+    skipped: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hit_rate": self.hit_rate}
+
+
+@dataclass
+class _Entry:
+    future: Future
+    expires: float
+    speculative: bool
+    used: bool = False
+
+
+class Prefetcher:
+    """
+    Short-TTL cache of search and detail pages with background prefetching.
+
+    Args:
+        ttl (float): Seconds a fetched page stays usable
+        budget (int): Maximum speculative fetches in flight at once. Prefetches
+            beyond the budget are skipped rather than queued; 0 disables prefetching
+        details_top_n (int): Also prefetch the details of the first N results of
+            each search page
+        on_search_prefetched (Callable[[SearchResult], None] | None): Called on
+            the worker thread when a speculative search page arrives
+        proxy (str | None): Proxy used when fetching detail pages
+    """
+
+    def __init__(
+        self,
+        ttl: float = PREFETCH_TTL,
+        budget: int = PREFETCH_BUDGET,
+        details_top_n: int = PREFETCH_DETAILS_TOP_N,
+        on_search_prefetched: Callable[[SearchResult], None] | None = None,
+        proxy: str | None = None,
+    ):
+        self.ttl = ttl
+        self.budget = budget
+        self.details_top_n = details_top_n
+        self.on_search_prefetched = on_search_prefetched
+        self.proxy = proxy
+        self.stats = PrefetchStats()
+        self._entries: dict[tuple[str, str], _Entry] = {}
+        self._lock = threading.Lock()
+        self._inflight = threading.BoundedSemaphore(budget) if budget > 0 else None
+        self._executor = ThreadPoolExecutor(max_workers=max(budget, 1), thread_name_prefix="doudesu-prefetch")
+
+    def get_search(self, url: str) -> SearchResult | None:
+        """Return the search page at ``url``, from the prefetch cache when possible."""
+        return self._get("search", url, Doujindesu.get_search_by_url)
+
+    def get_details(self, url: str) -> DetailsResult | None:
+        """Return the details of the manga at ``url``, from the prefetch cache when possible."""
+        return self._get("details", url, self._fetch_details)
+
+    def after_search(self, result: SearchResult | None):
+        """Speculatively fetch what's likely to be opened after showing ``result``."""
+        if not result:
+            return
+        if result.next_page_url:
+            self._prefetch("search", result.next_page_url, Doujindesu.get_search_by_url)
+        if result.previous_page_url:
+            self._prefetch("search", result.previous_page_url, Doujindesu.get_search_by_url)
+        for item in result.results[: self.details_top_n]:
+            self._prefetch("details", item.url, self._fetch_details)
+
+    def cancel(self):
+        """Drop every speculative fetch that hasn't been used yet, e.g. when the user leaves the results."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.speculative and not entry.used:
+                    if entry.future.cancel():
+                        # Never started, so it won't release its budget slot itself.
+                        self._inflight.release()
+                    self.stats.wasted += 1
+                    del self._entries[key]
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _fetch_details(self, url: str) -> DetailsResult | None:
+        return Doujindesu(url, proxy=self.proxy).get_details()
+
+    def _get(self, kind: str, url: str, fetch: Callable[[str], object]):
+        key = (kind, url)
+        with self._lock:
+            self._purge()
+            entry = self._entries.get(key)
+            if entry and not entry.future.cancelled():
+                self.stats.hits += 1
+                entry.used = True
+            else:
+                self.stats.misses += 1
+                entry = None
+
+        if entry:
+            try:
+                return entry.future.result()
+            except Exception:
+                with self._lock:
+                    self._entries.pop(key, None)
+
+        result = fetch(url)
+        future = Future()
+        future.set_result(result)
+        with self._lock:
+            self._entries[key] = _Entry(future, time.monotonic() + self.ttl, speculative=False, used=True)
+        return result
+
+    def _prefetch(self, kind: str, url: str, fetch: Callable[[str], object]):
+        key = (kind, url)
+        with self._lock:
+            self._purge()
+            if key in self._entries:
+                return
+            if not self._inflight or not self._inflight.acquire(blocking=False):
+                self.stats.skipped += 1
+                return
+            self.stats.issued += 1
+            future = self._executor.submit(self._run, kind, url, fetch)
+            self._entries[key] = _Entry(future, time.monotonic() + self.ttl, speculative=True)
+
+    def _run(self, kind: str, url: str, fetch: Callable[[str], object]):
+        try:
+            result = fetch(url)
+        finally:
+            self._inflight.release()
+        if kind == "search" and result and self.on_search_prefetched:
+            try:
+                self.on_search_prefetched(result)
+            except Exception:
+                pass
+        return result
+
+    def _purge(self):
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if entry.expires <= now:
+                if entry.speculative and not entry.used:
+                    self.stats.wasted += 1
+                del self._entries[key]
@@ -1,3 +1,4 @@
 from .manga import DetailsResult, Result, SearchResult
+from .records import DetailsRecord, ResultRecord, SearchRecord
 
-__all__ = ["Result", "DetailsResult", "SearchResult"]
+__all__ = ["Result", "DetailsResult", "SearchResult", "ResultRecord", "SearchRecord", "DetailsRecord"]
@@ -0,0 +1,168 @@
+"""
+Compact records for bulk paths.
+
+Crawls and catalogue scans handle tens of thousands of titles, where
+validating a pydantic model per title and keeping a fresh list of genre
+strings per title adds up. :class:`ResultRecord`, :class:`SearchRecord` and
+:class:`DetailsRecord` are slotted, frozen dataclasses with the same fields as
+:class:`~doudesu.models.manga.Result`,
+:class:`~doudesu.models.manga.SearchResult` and
+:class:`~doudesu.models.manga.DetailsResult`. Genres, types and statuses come
+from a small vocabulary and are interned, so every title shares one copy of
+each string. Records become pydantic models only at the API boundary, with
+their ``to_model`` methods, which skip validation since records are built
+from already parsed data.
+"""
+
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from .manga import DetailsResult, Result, SearchResult
+
+_intern = sys.intern
+
+
+@dataclass(frozen=True, slots=True)
+class ResultRecord:
+    """
+    A search result, see :class:`~doudesu.models.manga.Result`.
+
+    Build with :meth:`create`, which interns the vocabulary strings.
+    """
+
+    name: str
+    url: str
+    thumbnail: str
+    genre: tuple[str, ...]
+    type: str = "Doujinshi"
+    score: float = 0.0
+    status: str = "Finished"
+
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        url: str,
+        thumbnail: str,
+        genre: Iterable[str],
+        type: str = "Doujinshi",
+        score: float = 0.0,
+        status: str = "Finished",
+    ) -> "ResultRecord":
+        return cls(
+            name,
+            url,
+            thumbnail,
+            tuple(map(_intern, genre)),
+            _intern(type),
+            float(score),
+            _intern(status),
+        )
+
+    @classmethod
+    def from_model(cls, result: Result) -> "ResultRecord":
+        return cls.create(result.name, result.url, result.thumbnail, result.genre, result.type, result.score, result.status)
+
+    def to_model(self) -> Result:
+        return Result.model_construct(
+            name=self.name,
+            url=self.url,
+            thumbnail=self.thumbnail,
+            genre=list(self.genre),
+            type=self.type,
+            score=self.score,
+            status=self.status,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SearchRecord:
+    """A page of search results, see :class:`~doudesu.models.manga.SearchResult`."""
+
+    results: tuple[ResultRecord, ...]
+    next_page_url: str | None = None
+    previous_page_url: str | None = None
+
+    def to_model(self) -> SearchResult:
+        return SearchResult.model_construct(
+            results=[record.to_model() for record in self.results],
+            next_page_url=self.next_page_url,
+            previous_page_url=self.previous_page_url,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class DetailsRecord:
+    """
+    The details of a title, see :class:`~doudesu.models.manga.DetailsResult`.
+
+    Build with :meth:`create`, which interns the vocabulary strings.
+    """
+
+    name: str
+    url: str
+    thumbnail: str
+    genre: tuple[str, ...]
+    series: str
+    author: str
+    type: str = "Doujinshi"
+    score: float = 0.0
+    status: str = "Finished"
+    chapter_urls: tuple[str, ...] = ()
+
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        url: str,
+        thumbnail: str,
+        genre: Iterable[str],
+        series: str,
+        author: str,
+        type: str = "Doujinshi",
+        score: float = 0.0,
+        status: str = "Finished",
+        chapter_urls: Iterable[str] = (),
+    ) -> "DetailsRecord":
+        return cls(
+            name,
+            url,
+            thumbnail,
+            tuple(map(_intern, genre)),
+            series,
+            author,
+            _intern(type),
+            float(score),
+            _intern(status),
+            tuple(chapter_urls),
+        )
+
+    @classmethod
+    def from_model(cls, details: DetailsResult) -> "DetailsRecord":
+        return cls.create(
+            details.name,
+            details.url,
+            details.thumbnail,
+            details.genre,
+            details.series,
+            details.author,
+            details.type,
+            details.score,
+            details.status,
+            details.chapter_urls,
+        )
+
+    def to_model(self) -> DetailsResult:
+        return DetailsResult.model_construct(
+            name=self.name,
+            url=self.url,
+            thumbnail=self.thumbnail,
+            genre=list(self.genre),
+            series=self.series,
+            author=self.author,
+            type=self.type,
+            score=self.score,
+            status=self.status,
+            chapter_urls=list(self.chapter_urls),
+        )
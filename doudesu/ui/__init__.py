@@ -1,4 +1,23 @@
-from .cli import run_cli
-from .gui import DoujindesuApp, run_gui
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .cli import run_cli
+    from .gui import DoujindesuApp, run_gui
 
 __all__ = ["run_cli", "run_gui", "DoujindesuApp"]
+
+# The CLI needs rich and the GUI needs flet; only load the one that is used.
+_LAZY_ATTRS = {
+    "run_cli": ".cli",
+    "run_gui": ".gui",
+    "DoujindesuApp": ".gui",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_ATTRS[name], __name__), name)
+    globals()[name] = value
+    return value
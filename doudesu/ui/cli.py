@@ -2,12 +2,18 @@
 Command-line interface for the Doudesu.
 """
 
+from contextlib import contextmanager
+
 from rich.console import Console
+from rich.progress import BarColumn, Progress, TextColumn
 from rich.prompt import IntPrompt, Prompt
 from rich.table import Table
 
 from ..core.doudesu import Doujindesu
+from ..core.prefetch import Prefetcher
+from ..utils import tracing
 from ..utils.converter import ImageToPDFConverter
+from ..utils.progress import JobProgress, ProgressEvent, format_bytes, format_duration
 
 console = Console()
 
@@ -119,6 +125,58 @@ def get_score_color(score: float) -> str:
     return "bright_red"
 
 
+@contextmanager
+def show_progress(job: JobProgress):
+    """Render the job's progress events as live bars: the current chapter, plus the whole job if it has several."""
+    columns = (TextColumn("{task.description}"), BarColumn(), TextColumn("{task.fields[detail]}"))
+    with Progress(*columns, console=console) as bars:
+        chapter_bar = bars.add_task("Chapter", total=1, detail="")
+        job_bar = bars.add_task("Total", total=1, detail="") if job.chapters > 1 else None
+
+        def update(event: ProgressEvent):
+            bars.update(chapter_bar, description=truncate_text(event.title), completed=event.progress, detail=event.summary())
+            if job_bar is not None:
+                eta = f", ETA {format_duration(event.job_eta)}" if event.job_eta is not None else ""
+                saved = f", {format_bytes(event.job_bytes_saved)} deduplicated" if event.job_bytes_saved else ""
+                received = format_bytes(event.job_bytes_received)
+                detail = f"{event.chapters_done}/{event.chapters} chapters, {received}{saved}{eta}"
+                bars.update(job_bar, completed=event.job_progress, detail=detail)
+
+        unsubscribe = job.subscribe(update)
+        try:
+            yield
+        finally:
+            unsubscribe()
+
+
+def download_chapter(manga: Doujindesu, chapter_url: str, title: str, job: JobProgress | None = None):
+    """Download one chapter into ``result/{title}.pdf``, traced as a single span tree."""
+    with tracing.span("chapter", url=chapter_url, title=title):
+        manga.url = chapter_url
+        images = manga.get_all_images()
+        if not images:
+            console.print("[red]No images found in chapter[/red]")
+            return
+
+        console.print(f"Found {len(images)} images")
+        pdf_path = f"result/{title}.pdf"
+        job = job or JobProgress()
+        with job.chapter(title, len(images)) as progress:
+            ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path, progress=progress)
+        console.print(f"[green]Saved as: {pdf_path}[/green]")
+
+
+def download_chapters(manga: Doujindesu, chapters: list[tuple[str, str]]):
+    """Download ``(chapter_url, title)`` pairs in order, with live progress per chapter and overall."""
+    job = JobProgress(chapters=len(chapters))
+    with show_progress(job):
+        job.start()
+        for chapter_url, title in chapters:
+            console.print(f"\n[cyan]Downloading {title}...[/cyan]")
+            download_chapter(manga, chapter_url, title, job)
+        job.finish()
+
+
 def run_cli():
     """Run the CLI version of the application."""
     console.print("[bold cyan]Doujindesu Downloader CLI[/bold cyan]")
@@ -133,6 +191,7 @@ def run_cli():
 
         if choice == 1:
             current_results = None
+            prefetcher = Prefetcher()
             while True:
                 if current_results is None:
                     query = Prompt.ask("Enter search query")
@@ -169,6 +228,7 @@ def run_cli():
 
                 console.print("\n")
                 console.print(table)
+                prefetcher.after_search(current_results)
 
                 console.print("\n[cyan]Navigation:[/cyan]")
                 nav_options = []
@@ -190,13 +250,14 @@ def run_cli():
                 selected_option = nav_options[nav_choice - 1][1]
 
                 if selected_option == "Previous page":
-                    current_results = Doujindesu.get_search_by_url(current_results.previous_page_url)
+                    current_results = prefetcher.get_search(current_results.previous_page_url)
                     continue
                 elif selected_option == "Next page":
-                    current_results = Doujindesu.get_search_by_url(current_results.next_page_url)
+                    current_results = prefetcher.get_search(current_results.next_page_url)
                     continue
                 elif selected_option == "New search":
                     current_results = None
+                    prefetcher.cancel()
                     continue
                 elif selected_option == "Back to main menu":
                     break
@@ -212,13 +273,14 @@ def run_cli():
 
                     selected_manga = current_results.results[selection - 1]
                     manga = Doujindesu(selected_manga.url)
+                    prefetcher.cancel()
 
                     try:
-                        details = manga.get_details()
+                        details = prefetcher.get_details(selected_manga.url)
                         console.print("\n[cyan]Manga Details:[/cyan]")
                         display_manga_details(details)
 
-                        chapters = manga.get_all_chapters()
+                        chapters = details.chapter_urls
                         if not chapters:
                             console.print("[red]No chapters found[/red]")
                             continue
@@ -235,45 +297,21 @@ def run_cli():
                             ):
                                 continue
 
-                            console.print("\n[cyan]Downloading chapter...[/cyan]")
-                            chapter_url = chapters[0]
-                            manga.url = chapter_url
-                            images = manga.get_all_images()
-
-                            if images:
-                                console.print(f"Found {len(images)} images")
-                                title = f"{details.name}"
-
-                                pdf_path = f"result/{title}.pdf"
-                                ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path)
-                                console.print(f"[green]Saved as: {pdf_path}[/green]")
-                            else:
-                                console.print("[red]No images found in chapter[/red]")
+                            download_chapters(manga, [(chapters[0], details.name)])
                         else:
                             selected_indices = select_chapters(len(chapters))
-
-                            for idx in selected_indices:
-                                chapter_url = chapters[idx]
-                                console.print(f"\n[cyan]Downloading Chapter {idx + 1}...[/cyan]")
-
-                                manga.url = chapter_url
-                                images = manga.get_all_images()
-
-                                if images:
-                                    console.print(f"Found {len(images)} images")
-                                    title = f"{details.name} - Chapter {idx + 1}"
-
-                                    pdf_path = f"result/{title}.pdf"
-                                    ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path)
-                                    console.print(f"[green]Saved as: {pdf_path}[/green]")
-                                else:
-                                    console.print("[red]No images found in chapter[/red]")
+                            download_chapters(
+                                manga,
+                                [(chapters[idx], f"{details.name} - Chapter {idx + 1}") for idx in selected_indices],
+                            )
 
                     except Exception as e:
                         console.print(f"[red]Error: {e!s}[/red]")
 
                     break
 
+            prefetcher.shutdown()
+
         elif choice == 2:
             url = Prompt.ask("Enter manga URL")
             manga = Doujindesu(url)
@@ -293,39 +331,13 @@ def run_cli():
                     if not Prompt.ask("Download this chapter?", choices=["y", "n"], default="y") == "y":
                         continue
 
-                    console.print("\n[cyan]Downloading chapter...[/cyan]")
-                    chapter_url = chapters[0]
-                    manga.url = chapter_url
-                    images = manga.get_all_images()
-
-                    if images:
-                        console.print(f"Found {len(images)} images")
-                        title = f"{details.name}"
-
-                        pdf_path = f"result/{title}.pdf"
-                        ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path)
-                        console.print(f"[green]Saved as: {pdf_path}[/green]")
-                    else:
-                        console.print("[red]No images found in chapter[/red]")
+                    download_chapters(manga, [(chapters[0], details.name)])
                 else:
                     selected_indices = select_chapters(len(chapters))
-
-                    for idx in selected_indices:
-                        chapter_url = chapters[idx]
-                        console.print(f"\n[cyan]Downloading Chapter {idx + 1}...[/cyan]")
-
-                        manga.url = chapter_url
-                        images = manga.get_all_images()
-
-                        if images:
-                            console.print(f"Found {len(images)} images")
-                            title = f"{details.name} - Chapter {idx + 1}"
-
-                            pdf_path = f"result/{title}.pdf"
-                            ImageToPDFConverter(images, pdf_path).convert_images_to_pdf(images, pdf_path)
-                            console.print(f"[green]Saved as: {pdf_path}[/green]")
-                        else:
-                            console.print("[red]No images found in chapter[/red]")
+                    download_chapters(
+                        manga,
+                        [(chapters[idx], f"{details.name} - Chapter {idx + 1}") for idx in selected_indices],
+                    )
 
             except Exception as e:
                 console.print(f"[red]Error: {e!s}[/red]")
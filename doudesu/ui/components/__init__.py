@@ -1,3 +1,4 @@
+from .download_queue import DownloadQueue
 from .loading import LoadingAnimation
 
-__all__ = ["LoadingAnimation"]
+__all__ = ["DownloadQueue", "LoadingAnimation"]
@@ -0,0 +1,151 @@
+import threading
+
+import flet as ft
+from flet import (
+    BoxShadow,
+    Column,
+    Container,
+    Icon,
+    IconButton,
+    Offset,
+    ProgressBar,
+    Row,
+    Text,
+    colors,
+    icons,
+)
+
+from ..tasks import Task, TaskStatus
+
+STATUS_COLORS = {
+    TaskStatus.QUEUED: colors.ON_SURFACE_VARIANT,
+    TaskStatus.RUNNING: colors.PINK,
+    TaskStatus.DONE: colors.GREEN_700,
+    TaskStatus.FAILED: colors.RED_700,
+    TaskStatus.CANCELLED: colors.ORANGE_700,
+}
+
+
+class DownloadQueue(Container):
+    """Floating panel listing queued, running and finished downloads."""
+
+    def __init__(self, on_cancel):
+        super().__init__()
+        self.on_cancel = on_cancel
+        self.rows: dict[int, Container] = {}
+        self._lock = threading.Lock()
+        self.visible = False
+        self.right = 24
+        self.bottom = 24
+        self.width = 320
+        self.padding = 16
+        self.border_radius = 16
+        self.bgcolor = colors.SURFACE
+        self.shadow = BoxShadow(
+            spread_radius=0,
+            blur_radius=8,
+            color=colors.with_opacity(0.2, colors.SHADOW),
+            offset=Offset(0, 2),
+        )
+
+        self.header = Text("Downloads", size=14, weight=ft.FontWeight.W_500, color=colors.ON_SURFACE)
+        self.list = Column(spacing=12, scroll=ft.ScrollMode.AUTO)
+        self.content = Column(
+            [
+                Row(
+                    [
+                        Icon(icons.DOWNLOAD_ROUNDED, color=colors.ON_SURFACE),
+                        self.header,
+                        Container(expand=True),
+                        IconButton(
+                            icon=icons.CLEAR_ALL_ROUNDED,
+                            icon_color=colors.ON_SURFACE_VARIANT,
+                            tooltip="Clear finished",
+                            on_click=lambda e: self.clear_finished(),
+                        ),
+                    ],
+                    spacing=10,
+                ),
+                self.list,
+            ],
+            spacing=10,
+            tight=True,
+        )
+
+    def build_row(self, task: Task) -> Container:
+        return Container(
+            data=task,
+            content=Column(
+                [
+                    Row(
+                        [
+                            Text(
+                                task.title,
+                                size=12,
+                                weight=ft.FontWeight.W_500,
+                                color=colors.ON_SURFACE,
+                                expand=True,
+                                max_lines=1,
+                                overflow=ft.TextOverflow.ELLIPSIS,
+                            ),
+                            IconButton(
+                                icon=icons.CLOSE_ROUNDED,
+                                icon_size=16,
+                                icon_color=colors.ON_SURFACE_VARIANT,
+                                tooltip="Cancel",
+                                on_click=lambda e: self.on_cancel(task),
+                            ),
+                        ],
+                        spacing=4,
+                    ),
+                    ProgressBar(
+                        value=task.progress,
+                        height=4,
+                        color=colors.PINK,
+                        bgcolor=colors.SURFACE_VARIANT,
+                    ),
+                    Text("", size=11, color=colors.ON_SURFACE_VARIANT),
+                ],
+                spacing=4,
+            ),
+        )
+
+    def update_task(self, task: Task):
+        """Refresh the row for ``task``, adding it to the panel if needed. Safe to call from worker threads."""
+        with self._lock:
+            row = self.rows.get(task.id)
+            if row is None:
+                row = self.build_row(task)
+                self.rows[task.id] = row
+                self.list.controls.append(row)
+                self.visible = True
+                self.refresh_header()
+                self.update()
+
+        title_row, progress_bar, status_text = row.content.controls
+        cancel_button = title_row.controls[1]
+
+        progress_bar.value = task.progress if task.status != TaskStatus.QUEUED else 0
+        progress_bar.color = STATUS_COLORS[task.status]
+        status_text.value = task.message or task.status.value.capitalize()
+        status_text.color = STATUS_COLORS[task.status] if task.finished else colors.ON_SURFACE_VARIANT
+        cancel_button.visible = not task.finished
+
+        if task.finished:
+            self.refresh_header()
+            self.header.update()
+        row.update()
+
+    def refresh_header(self):
+        active = sum(not row.data.finished for row in self.rows.values())
+        self.header.value = f"Downloads ({active} active)" if active else "Downloads"
+
+    def clear_finished(self):
+        with self._lock:
+            for task_id, row in list(self.rows.items()):
+                if row.data.finished:
+                    self.list.controls.remove(row)
+                    del self.rows[task_id]
+            self.visible = bool(self.rows)
+            self.refresh_header()
+        self.update()
@@ -12,15 +12,22 @@ from pathlib import Path
 
 from rich.console import Console
 
-from ..core.doudesu import Doujindesu, Result
+from ..core.doudesu import Doujindesu
+from ..core.prefetch import Prefetcher
+from ..models import Result
+from ..utils import tracing
 from ..utils.constants import DEFAULT_SETTINGS
 from ..utils.converter import ImageToPDFConverter
+from ..utils.progress import JobProgress, ProgressEvent, format_duration
+from ..utils.thumbnails import get_thumbnail_cache
+from .tasks import Task, TaskCancelledError, TaskManager, TaskStatus
 
 console = Console()
 
 if find_spec("flet"):
     import flet as ft
 
+    from .components.download_queue import DownloadQueue
     from .components.loading import LoadingAnimation
 
 
@@ -367,12 +374,19 @@ class DoujindesuApp:
             os.environ["HTTPS_PROXY"] = self.settings.proxy
 
         self.initialize_controls()
+        self.tasks = TaskManager(max_downloads=3, on_update=self.on_task_update)
+        self.thumbnails = get_thumbnail_cache()
 
         # Get proxy settings
         self.proxy = None
         if self.settings.proxy_enabled and self.settings.proxy:
             self.proxy = {"http": self.settings.proxy, "https": self.settings.proxy}
 
+        self.prefetcher = Prefetcher(
+            on_search_prefetched=lambda page: self.thumbnails.prefetch([result.thumbnail for result in page.results]),
+            proxy=self.proxy,
+        )
+
     def load_settings(self) -> AppSettings:
         settings_file = Path.home() / ".doudesu" / "settings.json"
         if settings_file.exists():
@@ -587,8 +601,6 @@ class DoujindesuApp:
             border=ft.border.only(right=ft.BorderSide(1, ft.colors.OUTLINE)),
         )
 
-        self.is_downloading = False
-
         self.search_results = ft.ListView(
             expand=True,
             spacing=10,
@@ -607,88 +619,79 @@ class DoujindesuApp:
             action="Dismiss",
         )
 
-        self.download_container = ft.Container(
-            content=ft.Column(
-                [
-                    ft.Row(
-                        [
-                            ft.Icon(ft.icons.DOWNLOAD_ROUNDED, color=ft.colors.ON_SURFACE),
-                            ft.Text(
-                                "Downloading...",
-                                size=14,
-                                weight=ft.FontWeight.W_300,
-                                color=ft.colors.ON_SURFACE,
-                            ),
-                        ],
-                        spacing=10,
-                    ),
-                    ft.Text(
-                        "",
-                        size=12,
-                        color=ft.colors.ON_SURFACE_VARIANT,
-                    ),
-                    ft.ProgressBar(
-                        width=None,
-                        expand=True,
-                        height=4,
-                        color=ft.colors.PINK,
-                        bgcolor=ft.colors.SURFACE_VARIANT,
-                    ),
-                    ft.Text(
-                        "",
-                        size=12,
-                        color=ft.colors.ON_SURFACE_VARIANT,
-                    ),
-                ],
-                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                spacing=10,
-            ),
-            bgcolor=ft.colors.SURFACE,
-            padding=20,
-            border_radius=16,
-            width=min(280, self.page.width * 0.8) if self.page else 280,
-            shadow=ft.BoxShadow(
-                spread_radius=0,
-                blur_radius=8,
-                color=ft.colors.with_opacity(0.2, ft.colors.SHADOW),
-                offset=ft.Offset(0, 2),
-            ),
-            visible=False,
-            right=24,
-            bottom=24,
-        )
+        self.download_queue = DownloadQueue(on_cancel=self.cancel_download)
 
     def handle_previous(self, e):
         if self.previous_page_url:
-            self.loading_animation.value = "Loading previous page..."
-            self.loading_animation.visible = True
-            self.loading_animation.update()
-
-            try:
-                dodes = Doujindesu(url=None, proxy=self.proxy).get_search_by_url(self.previous_page_url)
-                self.results = dodes.results
-                self.next_page_url = dodes.next_page_url
-                self.previous_page_url = dodes.previous_page_url
-                self.update_search_results()
-            finally:
-                self.loading_animation.visible = False
-                self.loading_animation.update()
+            self.run_in_background(
+                "Loading previous page...",
+                self.prefetcher.get_search,
+                self.previous_page_url,
+                on_done=self.apply_search_result,
+                key="search",
+            )
 
     def handle_next(self, e):
         if self.next_page_url:
-            self.loading_animation.value = "Loading next page..."
-            self.loading_animation.visible = True
-            self.loading_animation.update()
+            self.run_in_background(
+                "Loading next page...",
+                self.prefetcher.get_search,
+                self.next_page_url,
+                on_done=self.apply_search_result,
+                key="search",
+            )
 
-            try:
-                dodes = Doujindesu(url=None, proxy=self.proxy).get_search_by_url(self.next_page_url)
-                self.results = dodes.results
-                self.next_page_url = dodes.next_page_url
-                self.previous_page_url = dodes.previous_page_url
-                self.update_search_results()
-            finally:
-                self.loading_animation.visible = False
-                self.loading_animation.update()
+    def run_in_background(self, message: str, fn, *args, on_done, key: str | None = None):
+        """Run ``fn`` on a worker thread behind the loading overlay and pass its result to ``on_done``."""
+        self.loading_animation.value = message
+        self.loading_animation.visible = True
+        self.loading_animation.update()
+
+        def done(result):
+            self.hide_loading()
+            on_done(result)
+
+        def error(exc: BaseException):
+            self.hide_loading()
+            self.show_message(f"Error: {exc!s}", ft.colors.RED_700)
+
+        self.tasks.run(fn, *args, on_done=done, on_error=error, key=key)
+
+    def hide_loading(self):
+        self.loading_animation.visible = False
+        self.loading_animation.update()
+
+    def show_message(self, message: str, bgcolor: str):
+        self.snackbar.bgcolor = bgcolor
+        self.snackbar.content = ft.Text(message, color=ft.colors.WHITE)
+        self.page.show_snack_bar(self.snackbar)
+
+    def apply_search_result(self, search_result):
+        self.results = search_result.results if search_result else []
+        self.next_page_url = search_result.next_page_url if search_result else None
+        self.previous_page_url = search_result.previous_page_url if search_result else None
+        self.update_search_results()
+        self.prefetcher.after_search(search_result)
+
+    def cover_image(self, url: str, **kwargs) -> "ft.Image":
+        """
+        Image of the cover at ``url``, shown at once: the local cached copy when
+        available, the remote URL otherwise, swapped for the cached copy once
+        the cache has fetched it.
+        """
+        data = self.thumbnails.get_base64(url)
+        if data:
+            return ft.Image(src_base64=data, **kwargs)
+        image = ft.Image(src=url, **kwargs)
+        self.thumbnails.prefetch([url], on_ready=lambda url: self.swap_cover(image, url))
+        return image
+
+    def swap_cover(self, image: "ft.Image", url: str):
+        """Show the cached thumbnail of ``url`` in ``image``, if it's still on the page. Called from fetch threads."""
+        data = self.thumbnails.get_base64(url)
+        if data and image.page:
+            image.src_base64 = data
+            image.update()
 
     def update_search_results(self):
         if self.results:
@@ -773,6 +776,8 @@ class DoujindesuApp:
         search_icon.selected = self.selected_nav_index == 0
         download_icon.selected = self.selected_nav_index == 1
 
+        self.prefetcher.cancel()
+
         if self.selected_nav_index == 0:
             self.details_view.visible = False
             self.search_results_view.visible = False
@@ -811,7 +816,7 @@ class DoujindesuApp:
 
         image_stack = ft.Stack(
             [
-                ft.Image(
+                self.cover_image(
                     result.thumbnail,
                     width=120,
                     height=180,
@@ -914,9 +919,15 @@ class DoujindesuApp:
 
     def show_details(self, e, result: Result):
         self.selected_result = result
+        self.run_in_background(
+            "Loading details...",
+            self.prefetcher.get_details,
+            result.url,
+            on_done=lambda details: self.render_details(result, details),
+            key="details",
+        )
 
-        details = Doujindesu(result.url, proxy=self.proxy).get_details()
-
+    def render_details(self, result: Result, details):
         if not details:
             self.snackbar.bgcolor = ft.colors.RED_700
             self.snackbar.content = ft.Text("Failed to load details!", color=ft.colors.WHITE)
@@ -951,8 +962,8 @@ class DoujindesuApp:
 
         details_image_stack = ft.Stack(
             [
-                ft.Image(
-                    src=details.thumbnail,
+                self.cover_image(
+                    details.thumbnail,
                     width=250,
                     height=350,
                     fit=ft.ImageFit.COVER,
@@ -1149,7 +1160,7 @@ class DoujindesuApp:
         self.search_results.visible = True
         self.page.update()
 
-    def convert_images_to_pdf(self, images, title):
+    def convert_images_to_pdf(self, images, title, progress_callback=None, progress=None, check_cancelled=None):
         def sanitize_filename(filename):
             invalid_chars = '<>:"/\\|?*'
             for char in invalid_chars:
@@ -1163,7 +1174,14 @@ class DoujindesuApp:
 
         pdf_path = os.path.join(self.result_folder, safe_title)
 
-        ImageToPDFConverter(images, output_pdf_file=pdf_path).convert_images_to_pdf(images, pdf_path)
+        try:
+            ImageToPDFConverter(images, output_pdf_file=pdf_path).convert_images_to_pdf(
+                images, pdf_path, progress_callback=progress_callback, progress=progress, check_cancelled=check_cancelled
+            )
+        except TaskCancelledError:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+            raise
         self.main_status_text.value = f"PDF created: {pdf_path}"
         self.page.update()
 
@@ -1175,25 +1193,13 @@ class DoujindesuApp:
             self.page.update()
             return
 
-        self.loading_animation.value = "Searching..."
-        self.loading_animation.visible = True
-        self.loading_animation.update()
-
-        try:
-            search_result = Doujindesu(url=None, proxy=self.proxy).search(query)
-            self.results = search_result.results if search_result else []
-            self.next_page_url = search_result.next_page_url if search_result else None
-            self.previous_page_url = search_result.previous_page_url if search_result else None
-
-            self.main_view.visible = False
-            self.details_view.visible = False
-            self.search_results_view.visible = True
-            self.search_results.visible = True
-
-            self.update_search_results()
-        finally:
-            self.loading_animation.visible = False
-            self.loading_animation.update()
+        self.run_in_background(
+            "Searching...",
+            Doujindesu.search,
+            query,
+            on_done=self.apply_search_result,
+            key="search",
+        )
 
     def handle_download_by_url(self, e):
         url = self.url_input.value
@@ -1203,16 +1209,22 @@ class DoujindesuApp:
             self.page.update()
             return
 
+        self.run_in_background(
+            "Fetching manga details...",
+            Doujindesu(url, proxy=self.proxy).get_details,
+            on_done=lambda details: self.show_url_download_dialog(e, url, details),
+            key="details",
+        )
+
+    def show_url_download_dialog(self, e, url: str, details):
         try:
-            manga = Doujindesu(url, proxy=self.proxy)
-            details = manga.get_details()
             if not details:
                 self.snackbar.bgcolor = ft.colors.RED_700
                 self.snackbar.content = ft.Text("Failed to get manga details!", color=ft.colors.WHITE)
                 self.page.show_snack_bar(self.snackbar)
                 return
 
-            chapters = manga.get_all_chapters()
+            chapters = details.chapter_urls
             if not chapters:
                 self.snackbar.bgcolor = ft.colors.RED_700
                 self.snackbar.content = ft.Text("No chapters found!", color=ft.colors.WHITE)
@@ -1220,7 +1232,7 @@ class DoujindesuApp:
                 return
 
             if len(chapters) == 1:
-                self.download_manga(e, url, all_chapters=True)
+                self.download_manga(e, url, all_chapters=True, title=details.name)
                 return
 
             start_chapter = ft.TextField(
@@ -1260,13 +1272,13 @@ class DoujindesuApp:
 
                 if choice == "single" and chapter_selector.value:
                     chapter_index = int(chapter_selector.value.split()[-1])
-                    self.download_manga(e, url, chapter_index=str(chapter_index))
+                    self.download_manga(e, url, chapter_index=str(chapter_index), title=details.name)
                 elif choice == "range":
                     try:
                         start = int(start_chapter.value or "1")
                         end = int(end_chapter.value or str(len(chapters)))
                         if 1 <= start <= end <= len(chapters):
-                            self.download_manga(e, url, chapter_range=(start, end))
+                            self.download_manga(e, url, chapter_range=(start, end), title=details.name)
                         else:
                             self.snackbar.bgcolor = ft.colors.RED_700
                             self.snackbar.content = ft.Text(
@@ -1282,7 +1294,7 @@ class DoujindesuApp:
                         )
                         self.page.show_snack_bar(self.snackbar)
                 elif choice == "all":
-                    self.download_manga(e, url, all_chapters=True)
+                    self.download_manga(e, url, all_chapters=True, title=details.name)
 
             dialog_content = [
                 ft.Text(f"Found {len(chapters)} chapters", size=16),
@@ -1410,132 +1422,97 @@ class DoujindesuApp:
         chapter_index: str | None = None,
         chapter_range: tuple[int, int] | None = None,
         all_chapters: bool = False,
+        title: str | None = None,
     ):
-        if self.is_downloading:
-            self.snackbar.bgcolor = ft.colors.ORANGE_700
-            self.snackbar.content = ft.Text("Download already in progress!", color=ft.colors.WHITE)
-            self.page.show_snack_bar(self.snackbar)
-            return
-
-        self.is_downloading = True
-
-        if hasattr(self, "download_button") and self.download_button.visible:
-            self.download_button.disabled = True
-            self.download_button.update()
+        """Queue a download. It runs on a worker thread and is listed in the download queue."""
+        name = title or url.rstrip("/").rsplit("/", 1)[-1]
+        if chapter_index:
+            label = f"{name} - Chapter {chapter_index}"
+        elif chapter_range:
+            label = f"{name} - Chapters {chapter_range[0]}-{chapter_range[1]}"
+        else:
+            label = f"{name} - All chapters"
+
+        self.tasks.submit(
+            label,
+            self.download_job,
+            url,
+            chapter_index=chapter_index,
+            chapter_range=chapter_range,
+            all_chapters=all_chapters,
+        )
 
-        progress_text = self.download_container.content.controls[1]
-        progress_bar = self.download_container.content.controls[2]
-        image_progress = self.download_container.content.controls[3]
+    def download_job(
+        self,
+        task: Task,
+        url: str,
+        chapter_index: str | None = None,
+        chapter_range: tuple[int, int] | None = None,
+        all_chapters: bool = False,
+    ):
+        """Body of a download task, run on a worker thread."""
+        task.report(progress=0, message="Fetching chapters...")
+        manga = Doujindesu(url, proxy=self.proxy)
+        details = manga.get_details()
+        if not details:
+            raise ValueError("Failed to get manga details!")
+        chapters = details.chapter_urls
 
-        self.download_container.visible = True
-        self.download_container.update()
+        if chapter_index:
+            numbers = [int(chapter_index)]
+        elif chapter_range:
+            numbers = list(range(chapter_range[0], chapter_range[1] + 1))
+        else:
+            numbers = list(range(1, len(chapters) + 1))
 
-        def get_title(manga: Doujindesu):
-            return "-".join(manga.soup.title.text.split("-")[:-1]).strip()
+        total = len(numbers)
+        job = JobProgress(chapters=total, job_id=str(task.id))
 
-        try:
-            manga = Doujindesu(url, proxy=self.proxy)
-            chapters = manga.get_all_chapters()
+        def on_progress(event: ProgressEvent):
+            # Runs on download threads; cancellation is checked by the converter between pages.
+            eta = f", total ETA {format_duration(event.job_eta)}" if total > 1 and event.job_eta is not None else ""
+            task.update(
+                progress=event.job_progress,
+                message=f"Chapter {event.chapter}/{total}: {event.summary()}{eta}",
+            )
 
-            self.download_container.visible = True
-            self.download_container.update()
+        job.subscribe(on_progress)
+        job.start()
+        for position, number in enumerate(numbers):
+            task.report(progress=position / total, message=f"Chapter {number}: fetching image list...")
 
-            if chapter_index:
-                chapter_url = chapters[int(chapter_index) - 1]
-                progress_text.value = f"Downloading Chapter {chapter_index}"
-                progress_text.update()
-                progress_bar.value = 0
-                progress_bar.max = 1
-                progress_bar.update()
+            title = details.name
+            filename = title if all_chapters and len(chapters) == 1 else f"{title} - Chapter {number}"
 
-                manga.url = chapter_url
+            with tracing.span("chapter", url=chapters[number - 1], title=filename):
+                manga.url = chapters[number - 1]
                 images = manga.get_all_images()
-                if images:
-                    image_progress.value = f"Processing {len(images)} images..."
-                    image_progress.update()
-                    title = get_title(manga)
-                    self.convert_images_to_pdf(images, f"{title} - Chapter {chapter_index}")
-
-                progress_bar.value = 1
-                progress_bar.update()
-
-            elif chapter_range:
-                start, end = chapter_range
-                total_chapters = end - start + 1
-                progress_bar.value = 0
-                progress_bar.max = total_chapters
-                progress_bar.update()
-
-                for idx, chapter_num in enumerate(range(start - 1, end), 1):
-                    progress_text.value = f"Downloading Chapter {chapter_num + 1}/{end}"
-                    progress_text.update()
-
-                    manga.url = chapters[chapter_num]
-                    images = manga.get_all_images()
-                    if images:
-                        image_progress.value = f"Processing {len(images)} images..."
-                        image_progress.update()
-                        title = get_title(manga)
-                        self.convert_images_to_pdf(images, f"{title} - Chapter {chapter_num + 1}")
-
-                        progress_bar.value = idx
-                        progress_bar.update()
-
-            elif all_chapters:
-                total_chapters = len(chapters)
-                progress_bar.value = 0
-                progress_bar.max = total_chapters
-                progress_bar.update()
-
-                for idx, chapter_url in enumerate(chapters, 1):
-                    progress_text.value = f"Downloading Chapter {idx}/{total_chapters}"
-                    progress_text.update()
-
-                    manga.url = chapter_url
-                    images = manga.get_all_images()
-                    if images:
-                        image_progress.value = f"Processing {len(images)} images..."
-                        image_progress.update()
-                        title = "-".join(manga.soup.title.text.split("-")[:-1]).strip()
-                        filename = f"{title} - Chapter {idx}" if len(chapters) > 1 else title
-                        self.convert_images_to_pdf(images, filename)
-
-                        progress_bar.value = idx
-                        progress_bar.update()
-
-            self.snackbar.bgcolor = ft.colors.GREEN_700
-            self.snackbar.content = ft.Text(
-                "Download completed, downloaded file(s) saved in result directory!", color=ft.colors.WHITE
-            )
-            self.page.show_snack_bar(self.snackbar)
-
-        except Exception as e:
-            self.snackbar.bgcolor = ft.colors.RED_700
-            self.snackbar.content = ft.Text(f"Error: {e!s}", color=ft.colors.WHITE)
-            self.page.show_snack_bar(self.snackbar)
-
-        finally:
-            self.is_downloading = False
+                if not images:
+                    continue
 
-            if hasattr(self, "download_button") and self.download_button.visible:
-                self.download_button.disabled = False
-                self.download_button.update()
+                task.report(message=f"Chapter {number}: downloading {len(images)} images...")
+                with job.chapter(filename, len(images)) as progress:
+                    self.convert_images_to_pdf(
+                        images,
+                        filename,
+                        progress_callback=lambda done, pages: task.check_cancelled(),
+                        progress=progress,
+                        check_cancelled=task.check_cancelled,
+                    )
 
-            if self.search_results.controls:
-                for result in self.search_results.controls:
-                    download_icon = result.content.controls[-1]
-                    download_icon.disabled = False
-                    download_icon.update()
+        job.finish()
+        task.message = f"Saved {total} chapter(s) to {self.result_folder}"
 
-            if self.details_view.visible and self.details_view.content:
-                download_container = self.details_view.content.controls[-1]
-                download_row = download_container.content
-                download_btn = download_row.controls[0]
-                download_btn.disabled = False
-                download_btn.update()
+    def on_task_update(self, task: Task):
+        """Reflect a task change in the queue panel. Called from worker threads."""
+        self.download_queue.update_task(task)
+        if task.status == TaskStatus.DONE:
+            self.show_message(f"Download completed: {task.title}", ft.colors.GREEN_700)
+        elif task.status == TaskStatus.FAILED:
+            self.show_message(f"Error: {task.message}", ft.colors.RED_700)
 
-            self.download_container.visible = False
-            self.download_container.update()
+    def cancel_download(self, task: Task):
+        self.tasks.cancel(task)
 
     def build_main_view(self):
         form_card = ft.Card(
@@ -1642,6 +1619,7 @@ class DoujindesuApp:
         )
 
     def show_main_view(self, e=None):
+        self.prefetcher.cancel()
         self.main_view.visible = True
         self.search_results_view.visible = False
         self.details_view.visible = False
@@ -1677,6 +1655,7 @@ class DoujindesuApp:
             self.page.update()
 
         self.page.on_resized = on_resized
+        self.page.on_disconnect = self.on_disconnect
 
         self.main_view = ft.Container(
             content=self.build_main_view(),
@@ -1763,7 +1742,7 @@ class DoujindesuApp:
                                 self.search_results_view,
                                 self.details_view,
                                 self.loading_animation,
-                                self.download_container,
+                                self.download_queue,
                             ],
                         ),
                         expand=True,
@@ -1778,6 +1757,10 @@ class DoujindesuApp:
 
         self.page.update()
 
+    def on_disconnect(self, e):
+        self.tasks.shutdown()
+        self.prefetcher.shutdown()
+
     def toggle_theme(self, e):
         self.is_dark = not self.is_dark
         e.control.selected = self.is_dark
@@ -1797,8 +1780,8 @@ class DoujindesuApp:
                             [
                                 ft.Row(
                                     [
-                                        ft.Image(
-                                            src=result.thumbnail,
+                                        self.cover_image(
+                                            result.thumbnail,
                                             width=100,
                                             height=150,
                                             fit=ft.ImageFit.COVER,
@@ -1897,9 +1880,14 @@ class DoujindesuApp:
 
     def handle_download_click(self, e, result):
         """Handle download button click from details view."""
-        manga = Doujindesu(result.url, proxy=self.proxy)
-        chapters = manga.get_all_chapters()
+        self.run_in_background(
+            "Fetching chapters...",
+            Doujindesu(result.url, proxy=self.proxy).get_all_chapters,
+            on_done=lambda chapters: self.show_download_dialog(e, result, chapters),
+            key="chapters",
+        )
 
+    def show_download_dialog(self, e, result, chapters: list[str]):
         if not chapters:
             self.snackbar.bgcolor = ft.colors.RED_700
             self.snackbar.content = ft.Text("No chapters found!", color=ft.colors.WHITE)
@@ -1907,7 +1895,7 @@ class DoujindesuApp:
             return
 
         if len(chapters) == 1:
-            self.download_manga(e, result.url, all_chapters=True)
+            self.download_manga(e, result.url, all_chapters=True, title=result.name)
             return
 
         input_style = {
@@ -1960,13 +1948,13 @@ class DoujindesuApp:
 
             if choice == "single" and chapter_selector.value:
                 chapter_index = int(chapter_selector.value.split()[-1])
-                self.download_manga(e, result.url, chapter_index=str(chapter_index))
+                self.download_manga(e, result.url, chapter_index=str(chapter_index), title=result.name)
             elif choice == "range":
                 try:
                     start = int(start_chapter.value or "1")
                     end = int(end_chapter.value or str(len(chapters)))
                     if 1 <= start <= end <= len(chapters):
-                        self.download_manga(e, result.url, chapter_range=(start, end))
+                        self.download_manga(e, result.url, chapter_range=(start, end), title=result.name)
                     else:
                         self.snackbar.bgcolor = ft.colors.RED_700
                         self.snackbar.content = ft.Text(
@@ -1982,7 +1970,7 @@ class DoujindesuApp:
                     )
                     self.page.show_snack_bar(self.snackbar)
             elif choice == "all":
-                self.download_manga(e, result.url, all_chapters=True)
+                self.download_manga(e, result.url, all_chapters=True, title=result.name)
 
         dialog_content = ft.Container(
             content=ft.Column(
@@ -0,0 +1,232 @@
+"""
+Background task management for the GUI.
+
+Flet runs event handlers on the UI session thread, so any scraping or PDF work
+done inside a handler freezes the window. :class:`TaskManager` moves that work
+onto worker threads and reports progress back in a throttled way, so that a
+fast download doesn't flood the client with ``update()`` calls.
+"""
+
+import itertools
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum
+
+
+class TaskCancelledError(Exception):
+    """Raised inside a task body when the task has been cancelled."""
+
+
+class TaskStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+@dataclass(eq=False)
+class Task:
+    """
+    A unit of background work.
+
+    Attributes:
+        id (int): Unique task identifier
+        title (str): Human readable title shown in the queue panel
+        status (TaskStatus): Current state of the task
+        progress (float | None): Completion ratio between 0 and 1, None if unknown
+        message (str): Short status line for the current step
+        error (BaseException | None): Exception raised by the task body, if any
+    """
+
+    id: int
+    title: str
+    status: TaskStatus = TaskStatus.QUEUED
+    progress: float | None = None
+    message: str = ""
+    error: BaseException | None = None
+    _manager: "TaskManager | None" = field(default=None, repr=False)
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _last_notified: float = field(default=0.0, repr=False)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (TaskStatus.DONE, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+    def cancel(self):
+        """Request cancellation. The task body stops at its next checkpoint."""
+        self._cancel_event.set()
+        if self.status == TaskStatus.QUEUED:
+            self.message = "Cancelled"
+            self._set_status(TaskStatus.CANCELLED)
+
+    def check_cancelled(self):
+        """Raise :class:`TaskCancelledError` if cancellation was requested."""
+        if self._cancel_event.is_set():
+            raise TaskCancelledError
+
+    def report(self, progress: float | None = None, message: str | None = None):
+        """
+        Update progress from inside the task body.
+
+        Also acts as a cancellation checkpoint. UI notifications are throttled by
+        the owning manager, so this is cheap to call for every page.
+        """
+        self.check_cancelled()
+        self.update(progress, message)
+
+    def update(self, progress: float | None = None, message: str | None = None):
+        """Like :meth:`report` but without the cancellation checkpoint, for callbacks on other threads."""
+        if progress is not None:
+            self.progress = max(0.0, min(1.0, progress))
+        if message is not None:
+            self.message = message
+        if self._manager:
+            self._manager._notify(self)
+
+    def _set_status(self, status: TaskStatus):
+        self.status = status
+        if self._manager:
+            self._manager._notify(self, force=True)
+
+
+class TaskManager:
+    """
+    Runs GUI jobs on worker threads.
+
+    Downloads go to a bounded pool so several can run at once while the rest
+    wait in the queue; short jobs (search, details, paging) use a separate pool
+    so they never queue behind a long download.
+
+    Args:
+        max_downloads (int): Number of downloads allowed to run concurrently
+        on_update (Callable[[Task], None] | None): Called on the worker thread
+            whenever a task changes, at most every ``min_interval`` seconds per
+            task unless its status changed
+        min_interval (float): Minimum delay between progress notifications per task
+    """
+
+    def __init__(
+        self,
+        max_downloads: int = 3,
+        on_update: Callable[[Task], None] | None = None,
+        min_interval: float = 0.25,
+    ):
+        self.on_update = on_update
+        self.min_interval = min_interval
+        self.tasks: list[Task] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._latest: dict[str, Task] = {}
+        self._downloads = ThreadPoolExecutor(max_workers=max_downloads, thread_name_prefix="doudesu-download")
+        self._jobs = ThreadPoolExecutor(max_workers=4, thread_name_prefix="doudesu-job")
+
+    def submit(self, title: str, fn: Callable[..., object], *args, **kwargs) -> Task:
+        """
+        Queue a download task. ``fn`` is called as ``fn(task, *args, **kwargs)``.
+
+        Returns:
+            Task: The queued task
+        """
+        task = Task(id=next(self._ids), title=title, _manager=self)
+        with self._lock:
+            self.tasks.append(task)
+        self._notify(task, force=True)
+        self._downloads.submit(self._run, task, fn, args, kwargs)
+        return task
+
+    def run(
+        self,
+        fn: Callable[..., object],
+        *args,
+        on_done: Callable[[object], None] | None = None,
+        on_error: Callable[[BaseException], None] | None = None,
+        key: str | None = None,
+    ) -> Future:
+        """
+        Run a short job in the background and hand its result to ``on_done``.
+
+        When ``key`` is given, a newer job with the same key supersedes older
+        ones: callbacks of superseded jobs are dropped, so a slow search never
+        overwrites the results of a newer one.
+        """
+        task = Task(id=next(self._ids), title=key or getattr(fn, "__name__", "job"))
+        if key:
+            with self._lock:
+                previous = self._latest.get(key)
+                self._latest[key] = task
+            if previous:
+                previous.cancel()
+
+        def job():
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                if on_error and not task.cancelled:
+                    on_error(e)
+                return
+            finally:
+                if key:
+                    with self._lock:
+                        if self._latest.get(key) is task:
+                            del self._latest[key]
+            if on_done and not task.cancelled:
+                on_done(result)
+
+        return self._jobs.submit(job)
+
+    def cancel(self, task: Task):
+        task.cancel()
+
+    def active(self) -> list[Task]:
+        with self._lock:
+            return [task for task in self.tasks if not task.finished]
+
+    def clear_finished(self):
+        with self._lock:
+            self.tasks = [task for task in self.tasks if not task.finished]
+
+    def shutdown(self):
+        """Cancel everything and stop the worker pools without waiting."""
+        for task in self.active():
+            task.cancel()
+        self._downloads.shutdown(wait=False, cancel_futures=True)
+        self._jobs.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, task: Task, fn: Callable[..., object], args: tuple, kwargs: dict):
+        if task.cancelled:
+            task._set_status(TaskStatus.CANCELLED)
+            return
+        task._set_status(TaskStatus.RUNNING)
+        try:
+            fn(task, *args, **kwargs)
+        except TaskCancelledError:
+            task.message = "Cancelled"
+            task._set_status(TaskStatus.CANCELLED)
+        except Exception as e:
+            task.error = e
+            task.message = str(e)
+            task._set_status(TaskStatus.FAILED)
+        else:
+            task.progress = 1.0
+            task._set_status(TaskStatus.DONE)
+
+    def _notify(self, task: Task, force: bool = False):
+        if not self.on_update:
+            return
+        now = time.monotonic()
+        if not force and now - task._last_notified < self.min_interval:
+            return
+        task._last_notified = now
+        try:
+            self.on_update(task)
+        except Exception:
+            # A closed browser tab must not take the worker down with it.
+            pass
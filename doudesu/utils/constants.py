@@ -5,6 +5,8 @@ This module contains all constant values used by the Doujindesu API wrapper,
 including URLs, HTTP headers, and other configuration values.
 """
 
+from pathlib import Path
+
 # Base URL for the doujindesu website
 BASE_URL = "https://doujindesu.tv"
 
@@ -17,15 +19,120 @@ HEADERS = {
     "X-Requested-With": "XMLHttpRequest",
 }
 
+# HTTP Headers for image CDN requests
+IMAGE_HEADERS = {
+    "Referer": f"{BASE_URL}/",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",  # noqa: E501
+}
+
 # TLS Client configuration
 TLS_CLIENT_CONFIG = {
     "client_identifier": "chrome_120",
     "random_tls_extension_order": True,
 }
 
-# Regular expressions
+# Regular expressions, compiled once in doudesu.utils.extract. Image sources
+# may be double- or single-quoted and are matched without surrounding spaces.
 CHAPTER_ID_PATTERN = r"load_data\((\d+)\)"
-IMAGE_SRC_PATTERN = r"src=\"(.*?)\""
+IMAGE_SRC_PATTERN = r"""src=(?:"\s*([^"\s](?:[^"\n]*[^"\s])?)\s*"|'\s*([^'\s](?:[^'\n]*[^'\s])?)\s*')"""
+CHAPTER_NUMBER_PATTERN = r"chapter-([0-9.-]+)"
+
+# Per-user data directory for settings and caches
+DATA_DIR = Path.home() / ".doudesu"
+
+# Thumbnail cache
+THUMBNAIL_CACHE_DIR = DATA_DIR / "thumbnails"
+THUMBNAIL_SIZE = (300, 450)
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_MEMORY_LIMIT = 32 * 1024 * 1024
+THUMBNAIL_DISK_LIMIT = 256 * 1024 * 1024
+# Covers of the most recent results that may be fetched on request
+THUMBNAIL_KNOWN_URLS = 10_000
+
+# Content-addressed store of downloaded page images, off unless enabled
+IMAGE_STORE_DIR = DATA_DIR / "images"
+IMAGE_STORE_DISK_LIMIT = 1024 * 1024 * 1024
+
+# Pages within this many bits of a hash in the blocklist are dropped from exports
+PAGE_BLOCKLIST_PATH = DATA_DIR / "blocklist.txt"
+PAGE_BLOCKLIST_DISTANCE = 4
+
+# Downloaded pages wait for the PDF writer in temporary files under this
+# directory, the system's temporary directory when None
+SPOOL_DIR = None
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+# Speculative prefetching of search and detail pages
+PREFETCH_TTL = 120
+PREFETCH_BUDGET = 4
+PREFETCH_DETAILS_TOP_N = 0
+
+# Local metadata catalogue (SQLite). Entries older than the max age are refetched;
+# finished titles rarely change, so they are kept much longer.
+CATALOG_PATH = DATA_DIR / "catalog.db"
+CATALOG_MAX_AGE = 6 * 60 * 60
+CATALOG_FINISHED_MAX_AGE = 30 * 24 * 60 * 60
+CATALOG_IMAGES_MAX_AGE = 30 * 24 * 60 * 60
+
+# Offline search over the catalogue. Result pages use URLs with this prefix so
+# they can be paged through like site search pages.
+LOCAL_SEARCH_URL = "local:search"
+LOCAL_SEARCH_PAGE_SIZE = 20
+
+# Bulk crawling of listing pages. The delay is the minimum time between two
+# page requests across all workers.
+CRAWL_SEED_URL = f"{BASE_URL}/manga/"
+CRAWL_WORKERS = 4
+CRAWL_DELAY = 0.5
+CRAWL_MAX_ATTEMPTS = 3
+CRAWL_CHECKPOINT_PATH = DATA_DIR / "crawl.json"
+CRAWL_CHECKPOINT_EVERY = 10
+
+# Per-host limits on origin requests. Every host gets a token bucket refilled at
+# RATE_LIMIT_RATE requests per second, and an adaptive cap on requests in flight
+# that halves on 429/503 or latency spikes and creeps back up while healthy.
+# Retries back off exponentially, and a host's Retry-After is honoured, for at
+# most RETRY_MAX_DELAY seconds.
+RATE_LIMIT_RATE = 10.0
+RATE_LIMIT_BURST = 20
+CONCURRENCY_INITIAL = 4
+CONCURRENCY_MIN = 1
+CONCURRENCY_MAX = 32
+LATENCY_SPIKE_FACTOR = 3.0
+REQUEST_MAX_RETRIES = 3
+RETRY_MAX_DELAY = 30.0
+
+# Connection pools of the shared image downloader. IMAGE_POOL_MAXSIZE is the
+# number of keep-alive connections kept per image host, IMAGE_HOST_POOLS
+# overrides it for specific hosts, e.g. {"cdn.example.com": 32}.
+IMAGE_POOL_CONNECTIONS = 8
+IMAGE_POOL_MAXSIZE = 16
+IMAGE_HOST_POOLS: dict[str, int] = {}
+
+# Background download jobs of the API. Each job writes its PDFs to
+# JOB_OUTPUT_DIR/<job id>/; the last JOB_RETENTION finished jobs can be polled, and
+# the files of older ones are deleted.
+# Chapters can also be written as EXPORT_FORMATS other than PDF, like comic
+# book archives of the original page images.
+JOB_WORKERS = 2
+JOB_OUTPUT_DIR = "result/jobs"
+JOB_RETENTION = 100
+EXPORT_FORMATS = ("pdf", "cbz")
+
+# Batch image lookups of the API. Chapters are resolved on BATCH_WORKERS
+# threads, each reusing one scraping session; a batch is capped at
+# BATCH_MAX_CHAPTERS chapters.
+BATCH_WORKERS = 8
+BATCH_MAX_CHAPTERS = 500
+
+# Serialized bodies of API lookups are served from memory for
+# RESPONSE_CACHE_TTL seconds, keeping at most RESPONSE_CACHE_MEMORY_LIMIT bytes.
+RESPONSE_CACHE_TTL = 60.0
+RESPONSE_CACHE_MEMORY_LIMIT = 16 * 1024 * 1024
+# Cached bodies of at least COMPRESS_MIN_SIZE bytes are compressed, once per
+# entry and encoding, with the best of brotli, zstd and gzip the client accepts.
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_LEVELS = {"br": 9, "zstd": 12, "gzip": 9}
 
 DEFAULT_SETTINGS = {
     "result_path": "result",
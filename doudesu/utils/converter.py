@@ -1,48 +1,358 @@
 import os
+import threading
+import zipfile
+from collections.abc import Callable, Iterator
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from io import BytesIO
+from dataclasses import asdict, dataclass, replace
+from typing import TYPE_CHECKING, NamedTuple
+from urllib.parse import urlsplit
 
-import requests
-from PIL import Image
-from reportlab.pdfgen import canvas
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from . import tracing
+from .constants import IMAGE_HEADERS, IMAGE_HOST_POOLS, IMAGE_POOL_CONNECTIONS, IMAGE_POOL_MAXSIZE, SPOOL_CHUNK_SIZE
+from .imagestore import get_image_store
+from .metrics import (
+    IMAGE_BYTES,
+    IMAGE_DEDUPLICATED_BYTES,
+    IMAGE_DOWNLOAD_SECONDS,
+    IMAGE_FAILURES,
+    IMAGE_SIZE_BYTES,
+    IMAGES_IN_FLIGHT,
+    PAGES_FILTERED,
+    PDF_FAILURES,
+    PDF_PAGE_SECONDS,
+    PDF_PAGES,
+    REGISTRY,
+)
+from .pagefilter import get_page_blocklist, hash_pages, page_thumbnail
+from .ratelimit import request_with_retries
+from .spool import PageFile, PageSpool
+
+# requests, Pillow and reportlab are imported on first use so that modes which
+# never download (``--help``, ``--search`` listings, the API metadata routes)
+# don't pay for them at startup.
+if TYPE_CHECKING:
+    import httpx
+    from PIL import Image
+    from requests.adapters import HTTPAdapter
+
+    from .progress import ChapterProgress
+
+
+class DownloadedPage(NamedTuple):
+    """
+    A page image as returned by :meth:`ImageDownloader.download_single_image`.
+
+    Attributes:
+        index (int): Position of the page in the chapter, from 0
+        image (Image.Image | None): Image opened from the page's spool or store
+            file, decoded only when it's encoded; None if it failed
+        digest (str | None): Hash of the image bytes, see :func:`~doudesu.utils.spool.content_hash`
+        size (int): Size of the image bytes
+        deduplicated (bool): Identical content was already in the image store
+        thumbnail (bytes | None): Pixels the page's perceptual hash is computed
+            from, when the page blocklist is in use
+        file (PageFile | None): Spool or store file holding the image bytes
+    """
+
+    index: int
+    image: "Image.Image | None"
+    digest: str | None = None
+    size: int = 0
+    deduplicated: bool = False
+    thumbnail: bytes | None = None
+    file: PageFile | None = None
+
+
+@dataclass
+class PoolStats:
+    """
+    Connection pool usage for one image host.
+
+    Attributes:
+        host (str): Image host
+        maxsize (int): Connections the pool keeps open
+        requests (int): Requests sent
+        connections (int): Connections opened; the rest of the requests reused one
+        in_flight (int): Requests currently running
+        peak_in_flight (int): Highest number of concurrent requests seen
+        saturated (int): Requests that found every pooled connection busy and had to wait
+        http2 (int): Requests answered over HTTP/2
+    """
+
+    host: str
+    maxsize: int
+    requests: int = 0
+    connections: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    saturated: int = 0
+    http2: int = 0
+
+    @property
+    def reuse_rate(self) -> float:
+        return 1 - self.connections / self.requests if self.requests else 0.0
+
+    @property
+    def saturation(self) -> float:
+        return self.peak_in_flight / self.maxsize if self.maxsize else 0.0
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "reuse_rate": self.reuse_rate, "saturation": self.saturation}
 
 
 class ImageDownloader:
-    def __init__(self, max_retries: int = 3, timeout: int = 10):
+    """
+    Downloads chapter images over pooled keep-alive connections.
+
+    Each image host gets its own connection pool, so connections are reused
+    across pages and chapters. Requests beyond the pool size wait for a free
+    connection instead of opening throwaway ones. Use
+    :func:`get_image_downloader` to share one instance across the process.
+
+    With ``http2`` enabled (requires ``doudesu[http2]``), HTTPS images are
+    fetched with httpx, which multiplexes concurrent requests over a single
+    connection per host when the host negotiates h2, and falls back to
+    HTTP/1.1 connections when it doesn't.
+
+    Args:
+        max_retries (int): Retries per image
+        timeout (int): Timeout in seconds per request
+        pool_connections (int): Number of host pools kept
+        pool_maxsize (int): Connections kept per host
+        host_pools (dict[str, int] | None): Per-host overrides of ``pool_maxsize``
+        http2 (bool | None): Use the HTTP/2 transport, defaults to :attr:`http2`
+        verify (bool | str): TLS certificate verification, or a CA bundle path
+
+    Attributes:
+        http2 (bool): Class-wide default for the HTTP/2 transport, set with ``DOUDESU_HTTP2=1``
+    """
+
+    http2: bool = os.environ.get("DOUDESU_HTTP2", "0") == "1"
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        timeout: int = 10,
+        pool_connections: int = IMAGE_POOL_CONNECTIONS,
+        pool_maxsize: int = IMAGE_POOL_MAXSIZE,
+        host_pools: dict[str, int] | None = None,
+        http2: bool | None = None,
+        verify: bool | str = True,
+    ):
+        import requests
+
+        # Retries go through the shared rate limiter, so 429/503 answers reach it
+        # instead of being retried blindly inside urllib3.
         self.session = requests.Session()
-        retry_strategy = Retry(
-            total=max_retries,
-            backoff_factor=0.5,
-            status_forcelist=[500, 502, 503, 504, 429],
-        )
-        self.session.mount("http://", HTTPAdapter(max_retries=retry_strategy))
-        self.session.mount("https://", HTTPAdapter(max_retries=retry_strategy))
+        self.verify = verify
+        self.max_retries = max_retries
         self.timeout = timeout
-        self.headers = {
-            "Referer": "https://doujindesu.tv/",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",  # noqa: E501
-        }
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.host_pools = dict(IMAGE_HOST_POOLS if host_pools is None else host_pools)
+        self.headers = dict(IMAGE_HEADERS)
+        self.client = self._create_http2_client(verify) if (self.http2 if http2 is None else http2) else None
+        self._pools: dict[str, PoolStats] = {}
+        self._adapters: dict[str, HTTPAdapter] = {}
+        self._streams: dict[str, set[int]] = {}
+        self._lock = threading.Lock()
+
+    def _create_http2_client(self, verify: bool | str) -> "httpx.Client | None":
+        """Build the HTTP/2 client, or return None when httpx or h2 isn't installed."""
+        try:
+            import h2  # noqa: F401
+            import httpx
+        except ImportError:
+            return None
+        connections = self.pool_connections * self.pool_maxsize
+        return httpx.Client(
+            http2=True,
+            verify=verify,
+            timeout=self.timeout,
+            headers=self.headers,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        )
+
+    def _pool_for(self, url: str) -> PoolStats:
+        """Return the stats of the host of ``url``, mounting a pool on first use."""
+        from requests.adapters import HTTPAdapter
+
+        scheme, host = urlsplit(url)[:2]
+        prefix = f"{scheme}://{host}/"
+        with self._lock:
+            stats = self._pools.get(prefix)
+            if stats is None:
+                maxsize = self.host_pools.get(host, self.pool_maxsize)
+                adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=maxsize, pool_block=True)
+                self.session.mount(prefix, adapter)
+                self._adapters[prefix] = adapter
+                self._streams[prefix] = set()
+                stats = self._pools[prefix] = PoolStats(host, maxsize)
+            return stats
+
+    def get(self, url: str, stream: bool = False):
+        """
+        GET ``url`` through the host's pool and the shared rate limiter.
+
+        With ``stream``, only the headers are read; read the body with
+        :func:`iter_body` and close the response.
+        """
+        stats = self._pool_for(url)
+        with self._lock:
+            stats.requests += 1
+            stats.saturated += stats.in_flight >= stats.maxsize
+            stats.in_flight += 1
+            stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        # httpx only negotiates h2 over TLS.
+        use_http2 = self.client is not None and url.startswith("https://")
+        try:
+            response = request_with_retries(
+                url,
+                (lambda: self.client.send(self.client.build_request("GET", url), stream=stream))
+                if use_http2
+                else (
+                    lambda: self.session.get(
+                        url, headers=self.headers, timeout=self.timeout, verify=self.verify, stream=stream
+                    )
+                ),
+                max_retries=self.max_retries,
+            )
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+        if use_http2:
+            stream = response.extensions.get("network_stream")
+            with self._lock:
+                stats.http2 += response.http_version == "HTTP/2"
+                if stream is not None:
+                    self._streams[f"https://{stats.host}/"].add(id(stream))
+        return response
+
+    def stats(self) -> list[PoolStats]:
+        """Snapshot of the pool usage of every image host seen so far."""
+        with self._lock:
+            pools = [(stats, self._adapters[prefix], len(self._streams[prefix])) for prefix, stats in self._pools.items()]
+        snapshot = []
+        for stats, adapter, streams in pools:
+            # Each host has its own adapter, so every pool in it belongs to that host.
+            manager = adapter.poolmanager
+            connections = sum(manager.pools[key].num_connections for key in manager.pools.keys())
+            with self._lock:
+                snapshot.append(replace(stats, connections=connections + streams))
+        return snapshot
+
+    def close(self):
+        self.session.close()
+        if self.client is not None:
+            self.client.close()
+
+    def download_single_image(
+        self,
+        url_data: tuple[int, str],
+        spool: PageSpool,
+        progress: "ChapterProgress | None" = None,
+        thumbnail: bool = False,
+    ) -> DownloadedPage:
+        """
+        Download one page into ``spool``, or find it in the image store, and open it.
+
+        The body is streamed to a spool file and the image is opened from a
+        memory map of the file, so it isn't read into memory until it's
+        encoded. New pages are added to the store under the hash of their
+        bytes; a page identical to one already stored is reported to
+        ``progress`` as deduplicated. With ``thumbnail``, the page is also
+        shrunk for :func:`~doudesu.utils.pagefilter.hash_pages`.
+        """
+        from PIL import Image
 
-    def download_single_image(self, url_data: tuple[int, str]) -> tuple[int, Image.Image | None]:
         index, url = url_data
+        store = get_image_store()
         try:
-            response = self.session.get(url, stream=True, headers=self.headers, timeout=self.timeout)
-            response.raise_for_status()
+            with (
+                IMAGES_IN_FLIGHT.track_in_progress(),
+                IMAGE_DOWNLOAD_SECONDS.time(),
+                tracing.span("page", index=index),
+            ):
+                duplicate = False
+                page = store.find(url)
+                cached = page is not None
+                if page is None:
+                    with tracing.span("image.fetch", tracing.CLIENT, url=url) as span:
+                        response = self.get(url, stream=True)
+                        try:
+                            if span:
+                                span.set(status=response.status_code)
+                                span.set(http_version=getattr(response, "http_version", "HTTP/1.1"))
+                            response.raise_for_status()
+                            page = spool.write(iter_body(response))
+                        finally:
+                            response.close()
+                        if span:
+                            span.set(bytes=page.size)
+                    IMAGE_BYTES.inc(page.size)
+                    IMAGE_SIZE_BYTES.observe(page.size)
 
-            img_data = BytesIO(response.content)
-            img = Image.open(img_data)
+                with tracing.span("image.decode"):
+                    img = Image.open(page.open())
+                    pixels = page_thumbnail(img) if thumbnail else None
 
-            if img.mode == "RGBA":
-                img = img.convert("RGB")
+                # Only pages Pillow can open are worth keeping.
+                if not cached:
+                    duplicate = store.put(url, page)
 
-            return index, img
+            if progress:
+                progress.page_fetched(page.size)
+                if duplicate:
+                    progress.page_deduplicated(page.size)
+            return DownloadedPage(index, img, page.digest, page.size, duplicate, pixels, page)
 
-        except requests.exceptions.RequestException:
-            return index, None
         except Exception:
-            return index, None
+            IMAGE_FAILURES.inc()
+            if progress:
+                progress.page_failed()
+            return DownloadedPage(index, None)
+
+
+def iter_body(response) -> Iterator[bytes]:
+    """The body of a streamed requests or httpx response, in chunks of :data:`~doudesu.utils.constants.SPOOL_CHUNK_SIZE`."""
+    if hasattr(response, "iter_bytes"):
+        return response.iter_bytes(SPOOL_CHUNK_SIZE)
+    return response.iter_content(SPOOL_CHUNK_SIZE)
+
+
+_downloader: ImageDownloader | None = None
+_downloader_lock = threading.Lock()
+
+
+def get_image_downloader() -> ImageDownloader:
+    """Return the process-wide image downloader shared by every chapter download."""
+    global _downloader
+    with _downloader_lock:
+        if _downloader is None:
+            _downloader = ImageDownloader()
+        return _downloader
+
+
+def _collect_pools():
+    """Export the connection pool usage of the shared downloader alongside the other metrics."""
+    if _downloader is None:
+        return
+    stats = _downloader.stats()
+    for name, kind, help, attribute in (
+        ("doudesu_image_pool_size", "gauge", "Connections kept per image host", "maxsize"),
+        ("doudesu_image_pool_peak_in_flight", "gauge", "Highest concurrent requests per image host", "peak_in_flight"),
+        ("doudesu_image_pool_connections_total", "counter", "Connections opened per image host", "connections"),
+        (
+            "doudesu_image_pool_saturated_total",
+            "counter",
+            "Requests that found every pooled connection busy",
+            "saturated",
+        ),
+    ):
+        yield name, kind, help, [("", {"host": pool.host}, getattr(pool, attribute)) for pool in stats]
+
+
+REGISTRY.add_collector(_collect_pools)
 
 
 class ImageToPDFConverter:
@@ -59,56 +369,273 @@ class ImageToPDFConverter:
         self.output_pdf_file = self._add_pdf_extension(os.path.join(self.result_dir, output_pdf_file))
         self.num_threads = min(num_threads, len(image_urls) if image_urls else 10)
         self.chunk_size = chunk_size
-        self.downloader = ImageDownloader()
+        self.pages: list[DownloadedPage] = []
+        self._downloader: ImageDownloader | None = None
+        self._spool: PageSpool | None = None
+
+    @property
+    def downloader(self) -> ImageDownloader:
+        """The process-wide image downloader, so connections are reused across chapters."""
+        if self._downloader is None:
+            self._downloader = get_image_downloader()
+        return self._downloader
+
+    @property
+    def spool(self) -> PageSpool:
+        """Temporary files of the pages downloaded by this converter, removed by :meth:`close`."""
+        if self._spool is None:
+            self._spool = PageSpool()
+        return self._spool
+
+    def close(self):
+        """Remove the spooled pages; close the images from :meth:`download_images_threaded` first."""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
 
     @staticmethod
     def _add_pdf_extension(filename: str) -> str:
         return filename if filename.lower().endswith(".pdf") else f"{filename}.pdf"
 
-    def download_images_threaded(self, urls: list[str]) -> list[Image.Image | None]:
+    def download_images_threaded(
+        self,
+        urls: list[str],
+        progress: "ChapterProgress | None" = None,
+        check_cancelled: Callable[[], None] | None = None,
+    ) -> "list[Image.Image | None]":
         total_images = len(urls)
         downloaded_images = [None] * total_images
         failed_downloads = []
+        self.pages = [DownloadedPage(index, None) for index in range(total_images)]
+        thumbnails = get_page_blocklist().active
+
+        try:
+            with tracing.span("download_images", pages=total_images) as span:
+                self._download_chunks(urls, downloaded_images, failed_downloads, progress, thumbnails, check_cancelled)
+                if span:
+                    span.set(failed=len(failed_downloads))
+        except BaseException:
+            for image in downloaded_images:
+                if image:
+                    image.close()
+            self.close()
+            raise
+
+        return downloaded_images
 
+    def _download_chunks(
+        self,
+        urls: list[str],
+        downloaded_images: list,
+        failed_downloads: list[int],
+        progress: "ChapterProgress | None",
+        thumbnails: bool = False,
+        check_cancelled: Callable[[], None] | None = None,
+    ):
+        total_images = len(urls)
+        download = tracing.wrap(self.downloader.download_single_image)
+        spool = self.spool
         for chunk_start in range(0, total_images, self.chunk_size):
+            if check_cancelled:
+                check_cancelled()
             chunk_end = min(chunk_start + self.chunk_size, total_images)
             chunk_urls = list(enumerate(urls[chunk_start:chunk_end], start=chunk_start))
 
             with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
                 future_to_url = {
-                    executor.submit(self.downloader.download_single_image, url_data): url_data
-                    for url_data in chunk_urls
+                    executor.submit(download, url_data, spool, progress, thumbnails): url_data for url_data in chunk_urls
                 }
 
-                for future in as_completed(future_to_url):
-                    index, img = future.result()
-                    if img:
-                        downloaded_images[index] = img
-                    else:
-                        failed_downloads.append(index)
+                try:
+                    for future in as_completed(future_to_url):
+                        page = future.result()
+                        self.pages[page.index] = page
+                        if page.image:
+                            downloaded_images[page.index] = page.image
+                        else:
+                            failed_downloads.append(page.index)
+                        if check_cancelled:
+                            check_cancelled()
+                except BaseException:
+                    # Drop the pages not started; keep those in flight so the caller can close them.
+                    for future in future_to_url:
+                        future.cancel()
+                    for future in future_to_url:
+                        if not future.cancelled() and future.exception() is None:
+                            page = future.result()
+                            downloaded_images[page.index] = page.image
+                    raise
 
-        return downloaded_images
+    def drop_blocked_pages(self, downloaded_images: list, progress: "ChapterProgress | None" = None) -> int:
+        """
+        Remove the pages matching the page blocklist from ``downloaded_images``.
+
+        The downloaded pages are hashed and matched in one batch.
+
+        Returns:
+            int: Pages dropped
+        """
+        pages = [page for page in self.pages if page.thumbnail is not None and downloaded_images[page.index] is not None]
+        if not pages:
+            return 0
+        with tracing.span("pages.filter", pages=len(pages)) as span:
+            blocked = get_page_blocklist().match(hash_pages([page.thumbnail for page in pages]))
+            dropped = 0
+            for page, match in zip(pages, blocked, strict=True):
+                if match:
+                    downloaded_images[page.index].close()
+                    downloaded_images[page.index] = None
+                    dropped += 1
+                    if progress:
+                        progress.page_filtered()
+            if span:
+                span.set(dropped=dropped)
+        PAGES_FILTERED.inc(dropped)
+        return dropped
+
+    def convert_images_to_pdf(
+        self,
+        images: list[str],
+        output_pdf_file: str,
+        progress_callback=None,
+        progress: "ChapterProgress | None" = None,
+        check_cancelled: Callable[[], None] | None = None,
+    ):
+        """
+        Download ``images`` and write them as the pages of ``output_pdf_file``.
+
+        Each distinct image is embedded once, as a form XObject named after
+        its content hash, and every page showing it refers to that form, so
+        a page repeated within the chapter adds no image data to the PDF.
+        Pages matching the page blocklist are left out. Pages wait for the
+        writer in spool files and each is closed once written, see
+        :mod:`~doudesu.utils.spool`.
+
+        Args:
+            images (list[str]): Page image URLs, in order
+            output_pdf_file (str): PDF path, ``.pdf`` is added if missing
+            progress_callback (Callable[[int, int], None] | None): Called with
+                the page number and page count as each page is written
+            progress (ChapterProgress | None): Receives every fetched, failed
+                and encoded page, for progress events during the downloads too
+            check_cancelled (Callable[[], None] | None): Called before each
+                chunk of downloads and after each downloaded page; an exception
+                it raises stops the downloads and is passed on
+        """
+        from reportlab.pdfgen import canvas
 
-    def convert_images_to_pdf(self, images: list[str], output_pdf_file: str, progress_callback=None):
         output_pdf_file = self._add_pdf_extension(output_pdf_file)
-        downloaded_images = self.download_images_threaded(images)
+        downloaded_images = self.download_images_threaded(images, progress, check_cancelled)
 
         try:
-            with open(output_pdf_file, "wb") as pdf_file:
+            self.drop_blocked_pages(downloaded_images, progress)
+            with (
+                tracing.span("pdf.write", path=output_pdf_file, pages=len(downloaded_images)),
+                open(output_pdf_file, "wb") as pdf_file,
+            ):
                 pdf_canvas = canvas.Canvas(pdf_file)
+                forms: set[str] = set()
 
                 for idx, image in enumerate(downloaded_images, 1):
                     if image:
+                        downloaded_images[idx - 1] = None
+                        page = self.pages[idx - 1]
+                        form = f"page{page.digest}"
                         try:
-                            pdf_canvas.setPageSize((image.width, image.height))
-                            pdf_canvas.drawInlineImage(image, 0, 0, image.width, image.height)
-                            pdf_canvas.showPage()
+                            with PDF_PAGE_SECONDS.time(), tracing.span("pdf.page", index=idx):
+                                pdf_canvas.setPageSize((image.width, image.height))
+                                if form in forms:
+                                    IMAGE_DEDUPLICATED_BYTES.inc(page.size, target="pdf")
+                                    # Counted once per page, even if the store already had it.
+                                    if progress and not page.deduplicated:
+                                        progress.page_deduplicated(page.size)
+                                else:
+                                    pdf_canvas.beginForm(form, 0, 0, image.width, image.height)
+                                    try:
+                                        pixels = image.convert("RGB") if image.mode == "RGBA" else image
+                                        pdf_canvas.drawInlineImage(pixels, 0, 0, image.width, image.height)
+                                    finally:
+                                        # A broken image must not leave the canvas inside the form.
+                                        pdf_canvas.endForm()
+                                    forms.add(form)
+                                pdf_canvas.doForm(form)
+                                pdf_canvas.showPage()
+                            PDF_PAGES.inc()
                         except Exception:
+                            PDF_FAILURES.inc()
                             continue
+                        finally:
+                            # Unmaps the page, so only the pages in flight are held.
+                            image.close()
+                            if progress:
+                                progress.page_encoded()
                     if progress_callback:
                         progress_callback(idx, len(downloaded_images))
 
                 pdf_canvas.save()
 
-        except Exception:
-            raise
+        finally:
+            for image in downloaded_images:
+                if image:
+                    image.close()
+            self.close()
+
+    def convert_images_to_cbz(
+        self,
+        images: list[str],
+        output_file: str,
+        progress_callback=None,
+        progress: "ChapterProgress | None" = None,
+        check_cancelled: Callable[[], None] | None = None,
+    ):
+        """
+        Download ``images`` and store them, unchanged and in order, in the comic book archive ``output_file``.
+
+        Pages matching the page blocklist are left out. The image files are
+        copied into the archive as they are, without recompression.
+
+        Args:
+            images (list[str]): Page image URLs, in order
+            output_file (str): Archive path, ``.cbz`` is added if missing
+            progress_callback (Callable[[int, int], None] | None): Called with
+                the page number and page count as each page is written
+            progress (ChapterProgress | None): Receives every fetched, failed
+                and written page
+            check_cancelled (Callable[[], None] | None): Called before each
+                chunk of downloads and after each downloaded page; an exception
+                it raises stops the downloads and is passed on
+        """
+        if not output_file.lower().endswith(".cbz"):
+            output_file = f"{output_file}.cbz"
+        downloaded_images = self.download_images_threaded(images, progress, check_cancelled)
+
+        try:
+            self.drop_blocked_pages(downloaded_images, progress)
+            with (
+                tracing.span("cbz.write", path=output_file, pages=len(downloaded_images)),
+                zipfile.ZipFile(output_file, "w", zipfile.ZIP_STORED) as archive,
+            ):
+                for idx, image in enumerate(downloaded_images, 1):
+                    if image:
+                        downloaded_images[idx - 1] = None
+                        extension = IMAGE_EXTENSIONS.get(image.format, "img")
+                        try:
+                            archive.write(self.pages[idx - 1].file.path, f"{idx:04d}.{extension}")
+                        except OSError:
+                            continue
+                        finally:
+                            image.close()
+                            if progress:
+                                progress.page_encoded()
+                    if progress_callback:
+                        progress_callback(idx, len(downloaded_images))
+
+        finally:
+            for image in downloaded_images:
+                if image:
+                    image.close()
+            self.close()
+
+
+# File extensions of the image formats pages come in, by Pillow format name.
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif", "BMP": "bmp", "AVIF": "avif"}
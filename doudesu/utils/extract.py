@@ -0,0 +1,63 @@
+"""
+Fast extraction of image URLs, chapter IDs and chapter numbers.
+
+The chapter API answers with a list of ``<img src="...">`` tags and a chapter
+page carries its ID in a ``load_data(<id>)`` call; neither needs an HTML
+parser. The patterns here are compiled once and run over the raw response
+bytes, skipping the decode of the whole body, and the matched image sources
+are cleaned up together, so one scan yields the final URL list.
+
+``python benchmarks/extract.py`` compares this with the previous text-based
+extraction.
+"""
+
+import html
+import re
+from urllib.parse import urljoin
+
+from .constants import CHAPTER_API_ENDPOINT, CHAPTER_ID_PATTERN, CHAPTER_NUMBER_PATTERN, IMAGE_SRC_PATTERN
+
+_IMAGE_SRC = re.compile(IMAGE_SRC_PATTERN.encode())
+_CHAPTER_ID = re.compile(CHAPTER_ID_PATTERN.encode())
+_CHAPTER_ID_TEXT = re.compile(CHAPTER_ID_PATTERN)
+_CHAPTER_NUMBER = re.compile(CHAPTER_NUMBER_PATTERN)
+
+
+def _as_bytes(body: bytes | str) -> bytes:
+    return body.encode() if isinstance(body, str) else body
+
+
+def image_urls(body: bytes | str, base: str = CHAPTER_API_ENDPOINT) -> list[str]:
+    """
+    Image URLs of the ``src`` attributes in ``body``, in document order.
+
+    Relative URLs are resolved against ``base``, the URL ``body`` was served
+    from; ``data:`` and other non-http(s) sources are skipped. HTML entities
+    are unescaped and spaces percent-encoded.
+    """
+    found = _IMAGE_SRC.findall(_as_bytes(body))
+    if not found:
+        return []
+    # Decode and clean up all sources as one block; URLs can't contain newlines.
+    text = b"\n".join(double or single for double, single in found).decode("utf-8", "replace")
+    if "&" in text:
+        text = html.unescape(text)
+    if " " in text:
+        text = text.replace(" ", "%20")
+    urls = text.split("\n")
+    if text.startswith(("https://", "http://")) and text.count("\nhttps://") + text.count("\nhttp://") == len(urls) - 1:
+        return urls
+    urls = [urljoin(base, url) for url in urls]
+    return [url for url in urls if url.startswith(("https://", "http://"))]
+
+
+def chapter_id(body: bytes | str) -> int | None:
+    """The chapter ID of a chapter page, from its ``load_data(<id>)`` call."""
+    match = (_CHAPTER_ID_TEXT if isinstance(body, str) else _CHAPTER_ID).search(body)
+    return int(match.group(1)) if match else None
+
+
+def chapter_number(url: str) -> str | None:
+    """The chapter number in a chapter URL, e.g. ``12`` or ``12.5``, or ``12-13`` for a range."""
+    match = _CHAPTER_NUMBER.search(url)
+    return match.group(1) if match else None
@@ -0,0 +1,162 @@
+"""
+Content-addressed store of downloaded page images.
+
+Pages are kept on disk under a hash of their bytes, so an image that several
+chapters or titles share, like a scanlator's credit page or a banner, is
+stored once no matter how many URLs point to it. A small reference file per
+URL maps it to its content, so a page downloaded before is read back without
+a request. Pages come in and go out as files: a spooled page is hard-linked
+into the store when it's on the same filesystem and copied otherwise, and
+stored pages are read through memory maps. A single process-wide instance
+(:func:`get_image_store`) is used by every download. The store is off unless
+``DOUDESU_IMAGE_STORE=1`` is set or ``doudesu --image-store`` is used, since it
+keeps a copy of every downloaded page on disk.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from .constants import IMAGE_STORE_DIR, IMAGE_STORE_DISK_LIMIT
+from .metrics import CACHE_LOOKUPS, IMAGE_DEDUPLICATED_BYTES
+from .spool import PageFile
+
+
+class ImageStore:
+    """
+    Size-capped, content-addressed directory of page images.
+
+    Args:
+        cache_dir (Path): Directory for the stored images and URL references
+        disk_limit (int): Maximum bytes of images kept on disk
+
+    Attributes:
+        enabled (bool): Class-wide switch, on with ``DOUDESU_IMAGE_STORE=1``.
+            When off, :meth:`find` always misses and :meth:`put` writes nothing
+    """
+
+    enabled: bool = os.environ.get("DOUDESU_IMAGE_STORE", "0") == "1"
+
+    def __init__(self, cache_dir: Path = IMAGE_STORE_DIR, disk_limit: int = IMAGE_STORE_DISK_LIMIT):
+        self.cache_dir = Path(cache_dir)
+        self.disk_limit = disk_limit
+        self._disk_bytes: int | None = None
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> Path:
+        return self.cache_dir / "objects" / digest[:2] / digest
+
+    def reference(self, url: str) -> Path:
+        key = hashlib.sha1(url.encode()).hexdigest()
+        return self.cache_dir / "urls" / key[:2] / key
+
+    def find(self, url: str) -> PageFile | None:
+        """
+        Return the image stored for ``url``, without touching the network.
+
+        Returns:
+            PageFile | None: The stored image, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        try:
+            digest = self.reference(url).read_text()
+            path = self.path(digest)
+            size = path.stat().st_size
+            os.utime(path)
+        except (OSError, ValueError):
+            CACHE_LOOKUPS.inc(cache="image", result="miss")
+            return None
+        CACHE_LOOKUPS.inc(cache="image", result="hit")
+        return PageFile(path, size, digest)
+
+    def put(self, url: str, page: PageFile) -> bool:
+        """
+        Store ``page``, downloaded from ``url``.
+
+        Returns:
+            bool: True if identical content was already stored, so no image
+            bytes were written
+        """
+        if not self.enabled:
+            return False
+        path = self.path(page.digest)
+        duplicate = path.exists()
+        try:
+            if duplicate:
+                os.utime(path)
+            else:
+                _install(path, page.path)
+            _write(self.reference(url), page.digest.encode())
+        except OSError:
+            return duplicate
+
+        if duplicate:
+            IMAGE_DEDUPLICATED_BYTES.inc(page.size, target="disk")
+            return True
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(f.stat().st_size for f in self.cache_dir.glob("objects/*/*"))
+            else:
+                self._disk_bytes += page.size
+            if self._disk_bytes > self.disk_limit:
+                self._evict_disk()
+        return False
+
+    def _evict_disk(self):
+        """Delete least recently used images until the store is at 90% of its limit. Caller holds the lock."""
+        entries = []
+        for f in self.cache_dir.glob("objects/*/*"):
+            try:
+                stat = f.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+        entries.sort()
+
+        # References to deleted images are left behind; reading one is a miss.
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_limit * 0.9
+        for _, size, f in entries:
+            if total <= target:
+                break
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+
+def _write(path: Path, data: bytes):
+    """Write ``data`` to ``path`` atomically, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _install(path: Path, source: Path):
+    """Put the file ``source`` at ``path`` atomically, as a hard link when possible."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, path)
+
+
+_store: ImageStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    """Return the process-wide image store shared by every chapter download."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ImageStore()
+        return _store
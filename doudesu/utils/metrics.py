@@ -0,0 +1,296 @@
+"""
+Metrics for the hot paths, in the Prometheus text format.
+
+A small self-contained registry of counters, gauges and histograms, so no
+client library is needed. Metrics are off unless enabled, either with
+``DOUDESU_METRICS=1``, by the API app (which serves them at ``/metrics``), or
+by ``--metrics-file`` on the CLI. While disabled every recording call returns
+after a single attribute check.
+
+All metrics are defined at the bottom of this module so the instrumented code
+only imports the ones it records.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, type, help, [(suffix, labels, value), ...]) produced by collectors at scrape time
+Family = tuple[str, str, str, list[tuple[str, dict[str, str], float]]]
+
+_NULL = nullcontext()
+
+
+class Registry:
+    """
+    Holds every metric and renders them.
+
+    Args:
+        enabled (bool): Whether recording calls do anything
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> "Metric":
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Register a callable producing extra metric families when metrics are rendered."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def families(self) -> Iterator[Family]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            yield metric.name, metric.type, metric.help, metric.samples()
+        for collector in collectors:
+            yield from collector()
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for name, kind, help, samples in self.families():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> dict:
+        """Every metric as ``{name: {"type", "help", "samples": [...]}}``, for JSON dumps."""
+        return {
+            name: {
+                "type": kind,
+                "help": help,
+                "samples": [{"name": name + suffix, "labels": labels, "value": value} for suffix, labels, value in samples],
+            }
+            for name, kind, help, samples in self.families()
+        }
+
+    def write(self, path: str | Path):
+        """
+        Dump the metrics to ``path``: JSON for ``.json`` files, otherwise the text
+        format, e.g. for the node exporter textfile collector. Written atomically.
+        """
+        path = Path(path)
+        data = json.dumps(self.as_dict(), indent=2) if path.suffix == ".json" else self.render()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(data)
+        os.replace(tmp, path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class of labelled metrics. Label values are passed as keyword arguments."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), registry: Registry | None = None):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.registry = registry or REGISTRY
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        self.registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _labels(self, key: tuple) -> dict[str, str]:
+        return dict(zip(self.labels, key, strict=True))
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        with self._lock:
+            return [("", self._labels(key), value) for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    """Monotonically increasing count. Names end in ``_total``."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def track_in_progress(self, **labels):
+        """Context manager incrementing the gauge for the duration of the block."""
+        if not self.registry.enabled:
+            return _NULL
+        return self._in_progress(labels)
+
+    @contextmanager
+    def _in_progress(self, labels: dict):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. durations in seconds."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry | None = None,
+    ):
+        super().__init__(name, help, labels, registry)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the duration of the block in seconds."""
+        if not self.registry.enabled:
+            return _NULL
+        return self._timer(labels)
+
+    @contextmanager
+    def _timer(self, labels: dict):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list[tuple[str, dict[str, str], float]]:
+        samples = []
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts, strict=True):
+                cumulative += bucket_count
+                samples.append(("_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+REGISTRY = Registry(enabled=os.environ.get("DOUDESU_METRICS", "0") == "1")
+
+
+def enable():
+    """Turn recording on for the whole process."""
+    REGISTRY.enabled = True
+
+
+SIZE_BUCKETS = (16_384, 65_536, 262_144, 524_288, 1_048_576, 2_097_152, 4_194_304, 8_388_608)
+
+SCRAPE_SECONDS = Histogram("doudesu_scrape_seconds", "Time to fetch and parse a site page")
+SCRAPE_FAILURES = Counter("doudesu_scrape_failures_total", "Site pages that could not be fetched")
+CHAPTER_IMAGES_SECONDS = Histogram(
+    "doudesu_chapter_images_seconds", "Time to resolve the image URLs of a chapter, including cache lookups"
+)
+CACHE_LOOKUPS = Counter(
+    "doudesu_cache_lookups_total",
+    "Cache lookups by cache and result (hit, miss, stale)",
+    ("cache", "result"),
+)
+REQUEST_RETRIES = Counter("doudesu_request_retries_total", "Origin requests retried", ("host",))
+REQUEST_THROTTLED = Counter("doudesu_request_throttled_total", "Origin responses with status 429 or 503", ("host",))
+IMAGE_DOWNLOAD_SECONDS = Histogram("doudesu_image_download_seconds", "Time to fetch or look up one page image and open it")
+IMAGE_BYTES = Counter("doudesu_image_bytes_total", "Bytes of page images downloaded")
+IMAGE_SIZE_BYTES = Histogram("doudesu_image_size_bytes", "Size of downloaded page images", buckets=SIZE_BUCKETS)
+IMAGE_FAILURES = Counter("doudesu_image_failures_total", "Page images that could not be downloaded or decoded")
+IMAGE_DEDUPLICATED_BYTES = Counter(
+    "doudesu_image_deduplicated_bytes_total",
+    "Bytes of page images not stored again because identical content was, by target (disk, pdf)",
+    ("target",),
+)
+IMAGES_IN_FLIGHT = Gauge("doudesu_images_in_flight", "Page image downloads in progress")
+PAGES_FILTERED = Counter("doudesu_pages_filtered_total", "Pages dropped because they matched the page blocklist")
+PDF_PAGE_SECONDS = Histogram("doudesu_pdf_page_seconds", "Time to encode one page into a PDF")
+PDF_PAGES = Counter("doudesu_pdf_pages_total", "Pages written to PDFs")
+PDF_FAILURES = Counter("doudesu_pdf_page_failures_total", "Pages that could not be written to a PDF")
+API_REQUEST_SECONDS = Histogram("doudesu_api_request_seconds", "API request duration by route", ("method", "route"))
+API_REQUESTS = Counter(
+    "doudesu_api_requests_total",
+    "API requests by route and status code",
+    ("method", "route", "status"),
+)
+API_IN_FLIGHT = Gauge("doudesu_api_requests_in_flight", "API requests in progress", ("method", "route"))
+STREAM_SUBSCRIBERS = Gauge("doudesu_stream_subscribers", "Clients streaming job progress over SSE or WebSocket")
+STREAM_EVENTS_DROPPED = Counter(
+    "doudesu_stream_events_dropped_total",
+    "Intermediate progress events skipped because a subscriber read them too slowly",
+)
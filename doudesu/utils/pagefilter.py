@@ -0,0 +1,184 @@
+"""
+Perceptual-hash filtering of ad and credit pages.
+
+Scanlation groups put the same ad and credit pages in every chapter. Each page
+gets a 64-bit difference hash: the page is shrunk to 9x8 grayscale pixels and
+every bit says whether a pixel is brighter than its right neighbour, so
+re-encoded or resized copies of a page hash the same or a few bits apart.
+Pages within :data:`~doudesu.utils.constants.PAGE_BLOCKLIST_DISTANCE` bits of a
+hash in the user's blocklist are dropped before they are encoded.
+
+Download threads only shrink the pages, in Pillow. The hashes, and their
+distances to every blocked hash, are computed for a whole chapter at once,
+vectorized with NumPy when ``doudesu[filter]`` is installed and in plain
+Python otherwise.
+"""
+
+import os
+import threading
+from collections.abc import Sequence
+from functools import cache
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+from .constants import PAGE_BLOCKLIST_DISTANCE, PAGE_BLOCKLIST_PATH
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+HASH_WIDTH = 9
+HASH_HEIGHT = 8
+
+
+@cache
+def _numpy():
+    """NumPy, imported on first use since it's slow to import, or None when it isn't installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def page_thumbnail(data: "bytes | BinaryIO | Image.Image") -> bytes:
+    """
+    The 9x8 grayscale pixels a page, as bytes, a binary file or an open image, is hashed from.
+
+    An open image that isn't loaded yet is left as it is: its pixels are read
+    again from its file at a fraction of its size, and the file is rewound, so
+    it can still be loaded, or passed through as is, when it's written.
+    """
+    from PIL import Image
+
+    if isinstance(data, Image.Image):
+        if getattr(data, "fp", None) is None:
+            return data.convert("L").resize((HASH_WIDTH, HASH_HEIGHT), Image.Resampling.BOX).tobytes()
+        position = data.fp.tell()
+        try:
+            data.fp.seek(0)
+            return page_thumbnail(data.fp)
+        finally:
+            data.fp.seek(position)
+
+    img = Image.open(BytesIO(data) if isinstance(data, bytes) else data)
+    # JPEGs are decoded straight at a fraction of their size.
+    img.draft("L", (HASH_WIDTH * 8, HASH_HEIGHT * 8))
+    return img.convert("L").resize((HASH_WIDTH, HASH_HEIGHT), Image.Resampling.BOX).tobytes()
+
+
+def hash_pages(thumbnails: Sequence[bytes]) -> list[int]:
+    """Difference hashes of the :func:`page_thumbnail` of each page, in one batch."""
+    if not thumbnails:
+        return []
+    np = _numpy()
+    if np is not None:
+        pixels = np.frombuffer(b"".join(thumbnails), dtype=np.uint8).reshape(-1, HASH_HEIGHT, HASH_WIDTH)
+        bits = (pixels[:, :, 1:] > pixels[:, :, :-1]).reshape(len(thumbnails), -1)
+        return np.packbits(bits, axis=1).view(">u8").ravel().tolist()
+    hashes = []
+    for pixels in thumbnails:
+        value = 0
+        for row in range(0, HASH_WIDTH * HASH_HEIGHT, HASH_WIDTH):
+            for column in range(row, row + HASH_WIDTH - 1):
+                value = value << 1 | (pixels[column + 1] > pixels[column])
+        hashes.append(value)
+    return hashes
+
+
+def _popcount(np, values):
+    """Set bits of each element of a ``uint64`` array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values[..., None].view(np.uint8), axis=-1).sum(axis=-1)
+
+
+class PageBlocklist:
+    """
+    The user's blocklist of page hashes.
+
+    The file holds one hash per line, as 16 hex digits; anything after a
+    ``#`` is a comment. It's reread whenever it changes, so hashes can be
+    added by hand or with :meth:`add` (``doudesu --block-page``) while
+    downloads run.
+
+    Args:
+        path (Path): Blocklist file
+        distance (int): Pages at most this many bits from a blocked hash are dropped
+
+    Attributes:
+        enabled (bool): Class-wide switch, off with ``DOUDESU_PAGE_FILTER=0``
+    """
+
+    enabled: bool = os.environ.get("DOUDESU_PAGE_FILTER", "1") != "0"
+
+    def __init__(self, path: Path = PAGE_BLOCKLIST_PATH, distance: int = PAGE_BLOCKLIST_DISTANCE):
+        self.path = Path(path)
+        self.distance = distance
+        self._hashes: list[int] = []
+        self._version: tuple[int, int] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether pages should be hashed at all: the filter is on and something is blocked."""
+        return self.enabled and bool(self.hashes())
+
+    def hashes(self) -> list[int]:
+        """The blocked hashes, reloaded if the file changed."""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return []
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if version != self._version:
+                self._hashes = self._load()
+                self._version = version
+            return self._hashes
+
+    def _load(self) -> list[int]:
+        hashes = []
+        try:
+            lines = self.path.read_text().splitlines()
+        except OSError:
+            return hashes
+        for line in lines:
+            value = line.split("#", 1)[0].strip()
+            if value:
+                try:
+                    hashes.append(int(value, 16))
+                except ValueError:
+                    continue
+        return hashes
+
+    def add(self, page_hash: int, note: str = ""):
+        """Append ``page_hash`` to the blocklist, with ``note`` as its comment."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, self.path.open("a") as f:
+            f.write(f"{page_hash:016x}" + (f"  # {note}" if note else "") + "\n")
+
+    def match(self, hashes: Sequence[int]) -> list[bool]:
+        """Whether each of ``hashes`` is within :attr:`distance` bits of a blocked hash."""
+        blocked = self.hashes()
+        if not hashes or not blocked:
+            return [False] * len(hashes)
+        np = _numpy()
+        if np is not None:
+            # Every page against every blocked hash: an (N, M) matrix of distances.
+            distances = _popcount(np, np.array(hashes, dtype=np.uint64)[:, None] ^ np.array(blocked, dtype=np.uint64))
+            return (distances.min(axis=1) <= self.distance).tolist()
+        return [min((value ^ other).bit_count() for other in blocked) <= self.distance for value in hashes]
+
+
+_blocklist: PageBlocklist | None = None
+_blocklist_lock = threading.Lock()
+
+
+def get_page_blocklist() -> PageBlocklist:
+    """Return the process-wide page blocklist."""
+    global _blocklist
+    with _blocklist_lock:
+        if _blocklist is None:
+            _blocklist = PageBlocklist()
+        return _blocklist
@@ -0,0 +1,372 @@
+"""
+Built-in profiling of CLI and API runs.
+
+:class:`Profiler` records where a run spends its time and allocates memory,
+split by stage:
+
+- ``parse``: HTML parsing with BeautifulSoup
+- ``download``: HTTP requests, from ``requests``/``tls_client``/``httpx`` down to the socket
+- ``decode``: image decoding and conversion with Pillow
+- ``pdf``: PDF encoding with reportlab
+
+A stack is attributed to the stage of its frames checked in the order ``pdf``,
+``decode``, ``parse``, ``download``, so Pillow calls made by reportlab count as
+``pdf``; everything else is ``other``.
+
+Two modes are available. ``sample`` (the default) snapshots the stacks of every
+thread every few milliseconds, so the download workers are covered too, and
+leaves idle threads out. ``cprofile`` runs :mod:`cProfile` in every thread
+started while profiling; it counts every call but slows the run down
+noticeably, and attributes each function to a stage by its own module only.
+With ``memory`` on, :mod:`tracemalloc` tracks allocations too and the report
+lists the allocation sites live at the traced-memory peak. It is off by default:
+tracing every allocation slows allocation-heavy pure-Python code, such as
+reportlab's fallback ASCII85 encoder, by an order of magnitude and would skew
+the time shares.
+
+Used by ``--profile`` on the CLI and by the API when ``DOUDESU_PROFILE_DIR`` is set::
+
+    python -m doudesu --url ... --profile profile.txt
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+STAGES = ("parse", "download", "decode", "pdf")
+
+# Stage markers, in priority order: (stage, package directories, stdlib module files)
+_STAGE_MARKERS = (
+    ("pdf", ("reportlab",), ()),
+    ("decode", ("PIL",), ()),
+    ("parse", ("bs4", "soupsieve"), ("html/parser.py",)),
+    (
+        "download",
+        ("requests", "urllib3", "tls_client", "httpx", "httpcore", "h2"),
+        ("ssl.py", "socket.py", "http/client.py"),
+    ),
+)
+
+# Innermost frames of a thread with nothing to do.
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("concurrent/futures/thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+# Builtins in which cProfile sees threads waiting rather than working.
+_IDLE_CALLS = {
+    "<method 'acquire' of '_thread.lock' objects>",
+    "<method 'get' of '_queue.SimpleQueue' objects>",
+    "<method 'poll' of 'select.epoll' objects>",
+    "<method 'poll' of 'select.poll' objects>",
+}
+
+MODES = ("sample", "cprofile")
+
+
+def _stage_of(filename: str) -> str | None:
+    filename = filename.replace(os.sep, "/")
+    for stage, packages, modules in _STAGE_MARKERS:
+        if any(f"/{package}/" in filename for package in packages):
+            return stage
+        if any(filename.endswith("/" + module) for module in modules):
+            return stage
+    return None
+
+
+def classify(filenames) -> str:
+    """Stage of a stack given the file names of its frames, in any order."""
+    found = {_stage_of(filename) for filename in filenames}
+    for stage, _, _ in _STAGE_MARKERS:
+        if stage in found:
+            return stage
+    return "other"
+
+
+def _short(filename: str) -> str:
+    """Path relative to the package or site-packages directory it lives in."""
+    filename = filename.replace(os.sep, "/")
+    for marker in ("/site-packages/", "/doudesu/", "/lib/python"):
+        if marker in filename:
+            tail = filename.rsplit(marker, 1)[1]
+            return ("doudesu/" + tail) if marker == "/doudesu/" else tail.split("/", 1)[-1]
+    return filename
+
+
+def _is_idle(frame) -> bool:
+    filename = frame.f_code.co_filename.replace(os.sep, "/")
+    return any(filename.endswith(name) and frame.f_code.co_name == func for name, func in _IDLE_FRAMES)
+
+
+class Profiler:
+    """
+    Profiles everything the process does between :meth:`start` and :meth:`stop`.
+
+    Args:
+        mode (str): ``sample`` or ``cprofile``
+        interval (float): Seconds between stack samples in ``sample`` mode
+        memory (bool): Track allocations with tracemalloc, at a large cost in speed
+        nframes (int): Frames kept per allocation traceback. Allocations are
+            attributed to a stage by these frames; one frame is much cheaper
+            but counts Pillow allocations made for reportlab as ``decode``
+        memory_interval (float): Seconds between checks for a new memory peak
+    """
+
+    def __init__(
+        self,
+        mode: str = "sample",
+        interval: float = 0.005,
+        memory: bool = False,
+        nframes: int = 1,
+        memory_interval: float = 1.0,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode!r}, expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.interval = interval
+        self.memory = memory
+        self.nframes = nframes
+        self.memory_interval = memory_interval
+        self.samples: Counter[str] = Counter()
+        self.own: dict[str, Counter] = {}
+        self.total: dict[str, Counter] = {}
+        self.elapsed = 0.0
+        self.peak_memory = 0
+        self._snapshot: tracemalloc.Snapshot | None = None
+        self._snapshot_size = 0
+        self._profiles: list[cProfile.Profile] = []
+        self._profiles_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._started = 0.0
+        self._tracing_memory = False
+
+    def __enter__(self) -> "Profiler":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.nframes)
+            self._tracing_memory = True
+        if self.mode == "cprofile":
+            threading.setprofile(self._profile_thread)
+            profile = cProfile.Profile()
+            self._profiles.append(profile)
+            profile.enable()
+        self._started = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="doudesu-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop profiling. Safe to call more than once."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed = time.perf_counter() - self._started
+        if self.mode == "cprofile":
+            threading.setprofile(None)
+            for profile in self._profiles:
+                profile.disable()
+        if self._tracing_memory:
+            self._check_memory()
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self._tracing_memory = False
+
+    def _profile_thread(self, frame, event, arg):
+        # Runs once in every new thread: hand the thread over to its own profiler.
+        profile = cProfile.Profile()
+        with self._profiles_lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def _run(self):
+        me = threading.get_ident()
+        next_memory = time.monotonic()
+        while not self._stop.wait(self.interval if self.mode == "sample" else self.memory_interval):
+            if self.mode == "sample":
+                self._sample(me)
+            if self._tracing_memory and time.monotonic() >= next_memory:
+                self._check_memory()
+                next_memory = time.monotonic() + self.memory_interval
+
+    def _sample(self, me: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == me or _is_idle(frame):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append((frame.f_code.co_filename, frame.f_code.co_name, frame.f_code.co_firstlineno))
+                frame = frame.f_back
+            stage = classify(filename for filename, _, _ in stack)
+            self.samples[stage] += 1
+            self.own.setdefault(stage, Counter())[stack[0]] += 1
+            self.total.setdefault(stage, Counter()).update(set(stack))
+
+    def _check_memory(self):
+        """Keep a snapshot of the allocations live at the highest traced memory seen."""
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_memory = max(self.peak_memory, peak)
+        # Snapshots are slow with many live blocks, so only retake one on a clear new peak.
+        if current > self._snapshot_size * 1.1:
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+            )
+            self._snapshot_size = current
+
+    def report(self, top: int = 15) -> dict:
+        """
+        Summarize the run.
+
+        Returns:
+            dict: ``stages`` with the share of time per stage, ``functions``
+            with the hottest functions per stage, and ``memory`` with the
+            largest allocation sites at the peak
+        """
+        report = {"mode": self.mode, "elapsed": self.elapsed}
+        if self.mode == "sample":
+            report.update(self._sample_report(top))
+        else:
+            report.update(self._cprofile_report(top))
+        report["memory"] = self._memory_report(top)
+        return report
+
+    def _sample_report(self, top: int) -> dict:
+        count = sum(self.samples.values())
+        seconds = self.elapsed / count if count else 0.0
+        stages = {stage: {"samples": samples, "share": samples / count} for stage, samples in self.samples.most_common()}
+        functions = {}
+        for stage in stages:
+            functions[stage] = [
+                {
+                    "function": f"{_short(filename)}:{line}({name})",
+                    "own": own,
+                    "total": self.total[stage][(filename, name, line)],
+                    "own_share": own / count,
+                }
+                for (filename, name, line), own in self.own[stage].most_common(top)
+            ]
+        return {
+            "interval": self.interval,
+            "samples": count,
+            "seconds_per_sample": seconds,
+            "stages": stages,
+            "functions": functions,
+        }
+
+    def _cprofile_report(self, top: int) -> dict:
+        stats = self.stats()
+        by_stage: dict[str, list] = {}
+        for (filename, line, name), (_, calls, own, total, callers) in stats.stats.items():
+            if name in _IDLE_CALLS:
+                continue
+            if filename == "~":
+                # Builtins belong to the stage of the caller that spent the most time in them.
+                function = name
+                if callers:
+                    filename = max(callers.items(), key=lambda item: item[1][2])[0][0]
+            else:
+                function = f"{_short(filename)}:{line}({name})"
+            by_stage.setdefault(classify([filename]), []).append((own, total, calls, function))
+        overall = sum(entry[0] for entries in by_stage.values() for entry in entries) or 1.0
+        stages = {
+            stage: {"seconds": sum(entry[0] for entry in entries), "share": sum(entry[0] for entry in entries) / overall}
+            for stage, entries in sorted(by_stage.items(), key=lambda item: -sum(entry[0] for entry in item[1]))
+        }
+        functions = {
+            stage: [
+                {"function": function, "own": own, "total": total, "calls": calls}
+                for own, total, calls, function in sorted(by_stage[stage], reverse=True)[:top]
+            ]
+            for stage in stages
+        }
+        return {"stages": stages, "functions": functions}
+
+    def _memory_report(self, top: int) -> dict | None:
+        if self._snapshot is None:
+            return None
+        sites: dict[str, Counter] = {}
+        blocks: dict[str, Counter] = {}
+        for stat in self._snapshot.statistics("traceback"):
+            stage = classify(frame.filename for frame in stat.traceback)
+            frame = stat.traceback[0]
+            site = f"{_short(frame.filename)}:{frame.lineno}"
+            sites.setdefault(stage, Counter())[site] += stat.size
+            blocks.setdefault(stage, Counter())[site] += stat.count
+        return {
+            "peak": self.peak_memory,
+            "live_at_peak": self._snapshot_size,
+            "stages": {stage: sum(counter.values()) for stage, counter in sites.items()},
+            "sites": {
+                stage: [{"site": site, "size": size, "blocks": blocks[stage][site]} for site, size in counter.most_common(top)]
+                for stage, counter in sites.items()
+            },
+        }
+
+    def stats(self) -> pstats.Stats:
+        """Merged cProfile statistics of every profiled thread (``cprofile`` mode only)."""
+        if not self._profiles:
+            raise ValueError("No cProfile data, profile with mode='cprofile'")
+        return pstats.Stats(*self._profiles)
+
+    def format(self, top: int = 15) -> str:
+        """The report as plain text."""
+        report = self.report(top)
+        lines = [f"doudesu profile: {report['elapsed']:.2f}s wall, mode {report['mode']}"]
+        if self.mode == "sample":
+            lines[0] += f", {report['samples']} samples every {report['interval'] * 1000:g}ms"
+        lines += ["", f"{'stage':10} {'share':>7}"]
+        lines += [f"{stage:10} {info['share']:7.1%}" for stage, info in report["stages"].items()]
+
+        for stage, functions in report["functions"].items():
+            lines += ["", f"== {stage}: hot functions"]
+            if self.mode == "sample":
+                lines.append(f"{'own':>7} {'total':>7}  function")
+                lines += [f"{item['own']:7} {item['total']:7}  {item['function']}" for item in functions]
+            else:
+                lines.append(f"{'own s':>8} {'total s':>8} {'calls':>8}  function")
+                lines += [
+                    f"{item['own']:8.3f} {item['total']:8.3f} {item['calls']:8}  {item['function']}" for item in functions
+                ]
+
+        memory = report["memory"]
+        if memory:
+            lines += [
+                "",
+                f"== memory: peak {memory['peak'] / 2**20:.1f} MiB traced, "
+                f"{memory['live_at_peak'] / 2**20:.1f} MiB live at the sampled peak",
+            ]
+            for stage, sites in sorted(memory["sites"].items(), key=lambda item: -memory["stages"][item[0]]):
+                lines.append(f"-- {stage}: {memory['stages'][stage] / 2**20:.1f} MiB")
+                lines += [f"{site['size'] / 2**10:10.1f} KiB {site['blocks']:8} blocks  {site['site']}" for site in sites]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str | Path, top: int = 15):
+        """
+        Write the report to ``path``: JSON for ``.json`` files, otherwise text. In
+        ``cprofile`` mode the raw statistics also go to ``path`` with a ``.prof``
+        suffix, for snakeviz or ``python -m pstats``.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(self.report(top), indent=2) if path.suffix == ".json" else self.format(top)
+        path.write_text(data)
+        if self.mode == "cprofile":
+            self.stats().dump_stats(path.with_suffix(".prof"))
@@ -0,0 +1,393 @@
+"""
+Structured progress of chapter and job downloads.
+
+A :class:`JobProgress` covers one or more chapters. Each chapter is tracked by
+the :class:`ChapterProgress` returned from :meth:`JobProgress.chapter`, which
+the converter updates as pages are fetched and encoded into the PDF.
+Subscribers receive :class:`ProgressEvent` snapshots with pages, bytes
+received and saved by deduplication, smoothed throughput and ETAs for the
+chapter and the job.
+
+Page updates only bump counters; an event is built and delivered at most
+every ``interval`` seconds, on whichever thread crosses the interval, plus
+once at every chapter and job start and end. Callbacks run on download
+threads, so they should be quick and must not block.
+"""
+
+import math
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+# Time constant, in seconds, of the smoothed download rate.
+RATE_TIME_CONSTANT = 5.0
+# Weight of the newest page in the smoothed PDF encoding time per page.
+ENCODE_SMOOTHING = 0.3
+
+
+@dataclass
+class ProgressEvent:
+    """
+    Snapshot of a download job.
+
+    Attributes:
+        kind (str): ``job.start``, ``chapter.start``, ``progress``,
+            ``chapter.done`` or ``job.done``
+        job_id (str | None): Identifier given to the job, if any
+        title (str): Title of the current chapter
+        chapter (int): Position of the current chapter in the job, from 1
+        chapters (int): Chapters in the job
+        chapters_done (int): Chapters finished
+        pages (int): Pages of the current chapter
+        pages_fetched (int): Pages downloaded and decoded
+        pages_failed (int): Pages that could not be downloaded or decoded
+        pages_encoded (int): Pages written to the PDF
+        pages_filtered (int): Pages dropped because they matched the page blocklist
+        bytes_received (int): Image bytes received for the current chapter
+        job_bytes_received (int): Image bytes received for the whole job
+        bytes_saved (int): Image bytes of the current chapter identical to an
+            image already stored, on disk or earlier in the PDF, so kept only once
+        job_bytes_saved (int): Image bytes saved by deduplication for the whole job
+        throughput (float): Smoothed download rate in bytes per second, as of
+            the last time pages were being fetched
+        progress (float): Completion of the current chapter, between 0 and 1
+        job_progress (float): Completion of the job, between 0 and 1
+        elapsed (float): Seconds since the job started
+        eta (float | None): Estimated seconds left for the current chapter
+        job_eta (float | None): Estimated seconds left for the job
+        error (str | None): Why the chapter or job failed
+    """
+
+    kind: str
+    job_id: str | None
+    title: str
+    chapter: int
+    chapters: int
+    chapters_done: int
+    pages: int
+    pages_fetched: int
+    pages_failed: int
+    pages_encoded: int
+    pages_filtered: int
+    bytes_received: int
+    job_bytes_received: int
+    bytes_saved: int
+    job_bytes_saved: int
+    throughput: float
+    progress: float
+    job_progress: float
+    elapsed: float
+    eta: float | None
+    job_eta: float | None
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        """One status line, e.g. ``12/30 pages, 3.1 MB at 1.2 MB/s, ETA 0:14``."""
+        if not self.pages:
+            return "Starting..." if self.kind != "job.done" else "Done"
+        if self.pages_fetched + self.pages_failed < self.pages:
+            done = f"{self.pages_fetched + self.pages_failed}/{self.pages} pages"
+        else:
+            done = f"{self.pages_encoded}/{self.pages - self.pages_failed - self.pages_filtered} pages encoded"
+        parts = [done, f"{format_bytes(self.bytes_received)} at {format_bytes(self.throughput)}/s"]
+        if self.bytes_saved:
+            parts.append(f"{format_bytes(self.bytes_saved)} deduplicated")
+        if self.pages_filtered:
+            parts.append(f"{self.pages_filtered} filtered")
+        if self.pages_failed:
+            parts.append(f"{self.pages_failed} failed")
+        if self.eta is not None:
+            parts.append(f"ETA {format_duration(self.eta)}")
+        return ", ".join(parts)
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1000:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} GB"
+
+
+def format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(math.ceil(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class _Average:
+    """Exponentially weighted average of samples."""
+
+    __slots__ = ("value", "weight")
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.value: float | None = None
+
+    def add(self, sample: float):
+        self.value = sample if self.value is None else self.value + self.weight * (sample - self.value)
+
+
+class _Rate:
+    """Exponentially weighted rate of a growing counter, with a time-based decay."""
+
+    __slots__ = ("_time", "_value", "rate")
+
+    def __init__(self):
+        self.rate: float | None = None
+        self._time: float | None = None
+        self._value = 0.0
+
+    def update(self, value: float, now: float):
+        if self._time is None:
+            self._time, self._value = now, value
+            return
+        elapsed = now - self._time
+        if elapsed <= 0:
+            return
+        instant = (value - self._value) / elapsed
+        weight = 1 - math.exp(-elapsed / RATE_TIME_CONSTANT)
+        self.rate = instant if self.rate is None else self.rate + weight * (instant - self.rate)
+        self._time, self._value = now, value
+
+    def restart(self, value: float, now: float):
+        """Keep the smoothed rate but measure further changes from ``value``."""
+        self._time, self._value = now, value
+
+
+class ChapterProgress:
+    """
+    Progress of one chapter, updated from the download and PDF threads.
+
+    Use as a context manager around the chapter's work; leaving it marks the
+    chapter done, or failed if an exception escapes.
+    """
+
+    def __init__(self, job: "JobProgress", title: str, pages: int):
+        self.job = job
+        self.title = title
+        self.pages = pages
+        self.fetched = 0
+        self.failed = 0
+        self.encoded = 0
+        self.filtered = 0
+        self.bytes = 0
+        self.saved = 0
+        self.started = time.monotonic()
+        self._last_page = self.started
+
+    def __enter__(self) -> "ChapterProgress":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.job._finish_chapter(self, f"{exc_type.__name__}: {exc}" if exc_type else None)
+
+    @property
+    def fetching(self) -> bool:
+        return self.fetched + self.failed < self.pages
+
+    def page_fetched(self, size: int):
+        """A page image of ``size`` bytes was downloaded and decoded."""
+        with self.job._lock:
+            self.fetched += 1
+            self.bytes += size
+            self.job._bytes += size
+            self._last_page = time.monotonic()
+        self.job._tick()
+
+    def page_deduplicated(self, size: int):
+        """A page image of ``size`` bytes was identical to one already stored, so it was kept once."""
+        with self.job._lock:
+            self.saved += size
+            self.job._saved += size
+
+    def page_failed(self):
+        with self.job._lock:
+            self.failed += 1
+            self._last_page = time.monotonic()
+        self.job._tick()
+
+    def page_filtered(self):
+        """A page matched the page blocklist and won't be encoded."""
+        with self.job._lock:
+            self.filtered += 1
+        self.job._tick()
+
+    def page_encoded(self):
+        """A page was written to the PDF."""
+        with self.job._lock:
+            self.encoded += 1
+            now = time.monotonic()
+            # The first page is timed from the end of the downloads.
+            self.job._encode_seconds.add(now - self._last_page)
+            self._last_page = now
+        self.job._tick()
+
+    @property
+    def progress(self) -> float:
+        # Fetching and encoding each count for half; failed pages are done with both
+        # and filtered pages with encoding.
+        if not self.pages:
+            return 1.0
+        return min(1.0, (self.fetched + 2 * self.failed + self.encoded + self.filtered) / (2 * self.pages))
+
+
+class JobProgress:
+    """
+    Progress of a download job of one or more chapters, and its subscribers.
+
+    Args:
+        chapters (int): Chapters the job will download
+        job_id (str | None): Identifier passed along in every event
+        interval (float): Minimum seconds between two ``progress`` events
+    """
+
+    def __init__(self, chapters: int = 1, job_id: str | None = None, interval: float = 0.25):
+        self.chapters = chapters
+        self.job_id = job_id
+        self.interval = interval
+        self.current: ChapterProgress | None = None
+        self.chapters_done = 0
+        self.latest: ProgressEvent | None = None
+        self.started = time.monotonic()
+        self._bytes = 0
+        self._saved = 0
+        self._chapter_seconds: list[float] = []
+        self._download_rate = _Rate()
+        self._encode_seconds = _Average(ENCODE_SMOOTHING)
+        self._next_event = 0.0
+        self._subscribers: list[Callable[[ProgressEvent], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[ProgressEvent], None]) -> Callable[[], None]:
+        """
+        Call ``callback`` with every event from now on.
+
+        Returns:
+            Callable[[], None]: Removes the subscription
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def start(self):
+        self._emit("job.start")
+
+    def chapter(self, title: str, pages: int) -> ChapterProgress:
+        """Start tracking the next chapter, of ``pages`` pages."""
+        now = time.monotonic()
+        with self._lock:
+            self.current = ChapterProgress(self, title, pages)
+            # The bandwidth estimate carries over; only the baseline moves to the new chapter.
+            self._download_rate.restart(self._bytes, now)
+        self._emit("chapter.start")
+        return self.current
+
+    def finish(self, error: str | None = None):
+        """Mark the whole job done, or failed with ``error``."""
+        self._emit("job.done", error)
+
+    def _finish_chapter(self, chapter: ChapterProgress, error: str | None):
+        with self._lock:
+            self.chapters_done += 1
+            self._chapter_seconds.append(time.monotonic() - chapter.started)
+        self._emit("chapter.done", error)
+
+    def _tick(self):
+        # Checked without the lock: a racing thread at worst sends one extra event.
+        if time.monotonic() >= self._next_event:
+            self._emit("progress")
+
+    def _emit(self, kind: str, error: str | None = None):
+        with self._lock:
+            now = time.monotonic()
+            self._next_event = now + self.interval
+            event = self._snapshot(kind, now, error)
+            self.latest = event
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception:
+                # A broken consumer must not fail the download.
+                pass
+
+    def snapshot(self) -> ProgressEvent:
+        """The current state as a ``progress`` event, without notifying anyone."""
+        with self._lock:
+            return self._snapshot("progress", time.monotonic(), None)
+
+    def _snapshot(self, kind: str, now: float, error: str | None) -> ProgressEvent:
+        """Build an event. Caller holds the lock."""
+        chapter = self.current
+        if chapter and chapter.fetching:
+            self._download_rate.update(self._bytes, now)
+        elif chapter and self._download_rate.rate is None:
+            # Every page arrived before the first event: use the chapter average.
+            self._download_rate.rate = chapter.bytes / max(chapter._last_page - chapter.started, 1e-3)
+        eta = self._chapter_eta(chapter) if chapter and kind != "chapter.done" else None
+
+        position = self.chapters_done + (1 if chapter and kind not in ("chapter.done", "job.done") else 0)
+        in_chapter = chapter.progress if chapter and kind not in ("chapter.done", "job.done") else 0.0
+        job_progress = min(1.0, (self.chapters_done + in_chapter) / self.chapters) if self.chapters else 1.0
+        job_eta = None
+        if kind == "job.done":
+            job_progress, job_eta = 1.0, 0.0
+        elif eta is not None or not chapter:
+            remaining = self.chapters - position
+            if self._chapter_seconds:
+                per_chapter = sum(self._chapter_seconds) / len(self._chapter_seconds)
+            elif chapter and eta is not None:
+                per_chapter = now - chapter.started + eta
+            else:
+                per_chapter = None
+            if per_chapter is not None:
+                job_eta = (eta or 0.0) + max(0, remaining) * per_chapter
+
+        return ProgressEvent(
+            kind=kind,
+            job_id=self.job_id,
+            title=chapter.title if chapter else "",
+            chapter=max(1, position) if chapter else 0,
+            chapters=self.chapters,
+            chapters_done=self.chapters_done,
+            pages=chapter.pages if chapter else 0,
+            pages_fetched=chapter.fetched if chapter else 0,
+            pages_failed=chapter.failed if chapter else 0,
+            pages_encoded=chapter.encoded if chapter else 0,
+            pages_filtered=chapter.filtered if chapter else 0,
+            bytes_received=chapter.bytes if chapter else 0,
+            job_bytes_received=self._bytes,
+            bytes_saved=chapter.saved if chapter else 0,
+            job_bytes_saved=self._saved,
+            throughput=self._download_rate.rate or 0.0,
+            progress=chapter.progress if chapter else 0.0,
+            job_progress=job_progress,
+            elapsed=now - self.started,
+            eta=eta,
+            job_eta=job_eta,
+            error=error,
+        )
+
+    def _chapter_eta(self, chapter: ChapterProgress) -> float | None:
+        """Seconds left: pages still to fetch at the smoothed bandwidth, plus pages still to encode."""
+        to_fetch = chapter.pages - chapter.fetched - chapter.failed
+        to_encode = chapter.pages - chapter.failed - chapter.encoded - chapter.filtered
+        fetch_eta = 0.0
+        if to_fetch:
+            rate = self._download_rate.rate
+            if not chapter.fetched or not rate:
+                return None
+            fetch_eta = to_fetch * (chapter.bytes / chapter.fetched) / rate
+        per_page = self._encode_seconds.value
+        return fetch_eta + (to_encode * per_page if per_page is not None else 0.0)
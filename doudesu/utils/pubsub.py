@@ -0,0 +1,143 @@
+"""
+In-process publish/subscribe for progress streams.
+
+A :class:`Topic` keeps a short, numbered history of events instead of a queue
+per subscriber. A subscriber is just a cursor into that history: when it
+reads, it gets every event it hasn't seen yet, with droppable events
+(intermediate ``progress`` updates) collapsed into the latest one. Only that
+latest droppable event is kept at all, so progress ticks never push other
+events out of the history. A slow consumer therefore costs no memory, catches
+up in one read, and only misses intermediate events.
+
+Events are published from worker threads and consumed by asyncio tasks (the
+API's SSE and WebSocket handlers). All waiters on one event loop share a
+single future, so a publish costs one thread-safe wake-up per event loop, not
+one per subscriber.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from typing import Generic, TypeVar
+
+from .metrics import STREAM_EVENTS_DROPPED
+
+T = TypeVar("T")
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Topic(Generic[T]):
+    """
+    A stream of events with any number of subscribers.
+
+    Args:
+        history (int): Non-droppable events kept for subscribers that are behind
+        droppable (Callable[[T], bool] | None): Whether an event may be skipped
+            when a newer one is pending, by default events whose ``kind`` is
+            ``progress``
+    """
+
+    def __init__(self, history: int = 64, droppable: Callable[[T], bool] | None = None):
+        self.droppable = droppable or (lambda event: getattr(event, "kind", None) == "progress")
+        self.closed = False
+        self.history = history
+        self._events: deque[tuple[int, T]] = deque()
+        self._sequence = 0
+        self._waiters: dict[asyncio.AbstractEventLoop, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sequence(self) -> int:
+        """Number of the latest event, 0 before the first."""
+        return self._sequence
+
+    def publish(self, event: T):
+        """Add an event and wake every subscriber. Safe to call from any thread."""
+        with self._lock:
+            if self.closed:
+                return
+            self._sequence += 1
+            # A droppable event is superseded by whatever follows it, so the
+            # history holds at most one, at the end.
+            if self._events and self.droppable(self._events[-1][1]):
+                self._events.pop()
+            self._events.append((self._sequence, event))
+            if len(self._events) > self.history + self.droppable(event):
+                self._events.popleft()
+            waiters, self._waiters = self._waiters, {}
+        self._notify(waiters)
+
+    def close(self):
+        """End the stream; subscribers stop once they have read the last event."""
+        with self._lock:
+            self.closed = True
+            waiters, self._waiters = self._waiters, {}
+        self._notify(waiters)
+
+    @staticmethod
+    def _notify(waiters: dict[asyncio.AbstractEventLoop, asyncio.Future]):
+        for loop, future in waiters.items():
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The loop was closed with a subscriber still registered.
+                pass
+
+    def read(self, after: int) -> list[tuple[int, T]]:
+        """
+        Events newer than sequence number ``after``, oldest first.
+
+        Droppable events are only kept while nothing newer is published, so
+        the result holds every non-droppable event still in the history plus
+        the latest event.
+        """
+        with self._lock:
+            kept = [(sequence, event) for sequence, event in self._events if sequence > after]
+        if not kept:
+            return []
+        skipped = kept[-1][0] - after - len(kept)
+        if skipped > 0:
+            STREAM_EVENTS_DROPPED.inc(skipped)
+        return kept
+
+    def _waiter(self, loop: asyncio.AbstractEventLoop) -> asyncio.Future | None:
+        """The future resolved by the next publish, shared by every waiter on ``loop``; None once closed."""
+        with self._lock:
+            if self.closed:
+                return None
+            future = self._waiters.get(loop)
+            if future is None:
+                future = self._waiters[loop] = loop.create_future()
+            return future
+
+    async def subscribe(self, after: int = 0, timeout: float | None = None) -> AsyncIterator[tuple[int, T] | None]:
+        """
+        Yield ``(sequence, event)`` pairs newer than ``after`` until the topic is closed.
+
+        Args:
+            after (int): Sequence number of the last event already seen, e.g.
+                from an SSE ``Last-Event-ID`` header
+            timeout (float | None): Yield None after this many idle seconds, so
+                the caller can send keep-alives
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            # Register before reading so a publish in between isn't missed.
+            waiter = self._waiter(loop)
+            events = self.read(after)
+            for sequence, event in events:
+                yield sequence, event
+                after = sequence
+            if events:
+                continue
+            if waiter is None:
+                return
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            except asyncio.TimeoutError:  # noqa: UP041 - not the builtin TimeoutError before 3.11
+                yield None
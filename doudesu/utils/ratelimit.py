@@ -0,0 +1,413 @@
+"""
+Process-wide rate limiting of origin requests.
+
+Every host gets a :class:`TokenBucket` capping the request rate and an
+:class:`AdaptiveConcurrency` capping requests in flight. The concurrency cap
+follows AIMD: it grows by about one per round of successful requests, and is
+halved when the host answers 429 or 503, when a request fails outright, or when
+latency spikes well above its running baseline. The scraping sessions and the
+image downloader share the same limiter (:func:`get_rate_limiter`), so parallel
+searches, crawls and downloads together stay within what the site sustains.
+"""
+
+import math
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from typing import TypeVar
+from urllib.parse import urlsplit
+
+from .constants import (
+    CONCURRENCY_INITIAL,
+    CONCURRENCY_MAX,
+    CONCURRENCY_MIN,
+    LATENCY_SPIKE_FACTOR,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_RATE,
+    REQUEST_MAX_RETRIES,
+    RETRY_MAX_DELAY,
+)
+from .metrics import REGISTRY, REQUEST_RETRIES, REQUEST_THROTTLED
+
+# Statuses worth retrying, and the subset meaning the origin wants less traffic.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+OVERLOAD_STATUSES = frozenset({429, 503})
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Blocking token bucket.
+
+    Args:
+        rate (float): Tokens added per second
+        burst (int): Maximum tokens stored, i.e. requests allowed back to back
+        max_pause (float): Longest :meth:`pause` honoured, in seconds
+    """
+
+    def __init__(self, rate: float, burst: int, max_pause: float = RETRY_MAX_DELAY):
+        self.rate = rate
+        self.burst = burst
+        self.max_pause = max_pause
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for ``seconds``, at most :attr:`max_pause`, e.g. to honour a ``Retry-After`` header."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + min(seconds, self.max_pause))
+            self._tokens = 0.0
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the number of requests in flight.
+
+    Args:
+        initial (int): Starting limit
+        minimum (int): The limit never drops below this
+        maximum (int): The limit never grows above this
+        backoff (float): Factor applied to the limit on overload
+        latency_factor (float): A request slower than this many times the
+            baseline latency counts as overload
+        cooldown (float): Minimum seconds between two decreases, so one burst
+            of rejections only halves the limit once
+    """
+
+    def __init__(
+        self,
+        initial: int = CONCURRENCY_INITIAL,
+        minimum: int = CONCURRENCY_MIN,
+        maximum: int = CONCURRENCY_MAX,
+        backoff: float = 0.5,
+        latency_factor: float = LATENCY_SPIKE_FACTOR,
+        cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.baseline: float | None = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Block until a request may start."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, overloaded: bool, latency: float) -> bool:
+        """
+        Finish a request and adapt the limit.
+
+        Args:
+            overloaded (bool): The origin rejected or failed the request
+            latency (float): Seconds the request took
+
+        Returns:
+            bool: Whether the request counted as overload, including latency spikes
+        """
+        with self._condition:
+            self.in_flight -= 1
+            spike = self.baseline is not None and latency > self.baseline * self.latency_factor
+            if overloaded or spike:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+                if spike:
+                    # Follow a lasting slowdown slowly so it stops counting as a spike.
+                    self.baseline = 0.95 * self.baseline + 0.05 * latency
+            else:
+                self.baseline = latency if self.baseline is None else 0.9 * self.baseline + 0.1 * latency
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            return overloaded or spike
+
+
+@dataclass
+class Permit:
+    """
+    Handed out by :meth:`HostLimiter.request`; the caller fills in the outcome.
+
+    Attributes:
+        status (int | None): HTTP status of the response
+        retry_after (float | None): Seconds from the ``Retry-After`` header
+    """
+
+    status: int | None = None
+    retry_after: float | None = None
+
+
+@dataclass
+class HostStats:
+    """
+    Counters for one host.
+
+    Attributes:
+        requests (int): Requests sent
+        throttled (int): Requests answered with 429 or 503
+        errors (int): Requests that raised, e.g. timeouts and connection errors
+        spikes (int): Successful requests slow enough to count as overload
+        waited (float): Total seconds requests spent waiting for a token
+        limit (float): Current concurrency limit
+        in_flight (int): Requests currently running
+    """
+
+    requests: int = 0
+    throttled: int = 0
+    errors: int = 0
+    spikes: int = 0
+    waited: float = 0.0
+    limit: float = 0.0
+    in_flight: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class HostLimiter:
+    """Token bucket and adaptive concurrency limit for a single host."""
+
+    def __init__(self, host: str, bucket: TokenBucket, concurrency: AdaptiveConcurrency):
+        self.host = host
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.stats = HostStats(limit=concurrency.limit)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def request(self) -> Iterator[Permit]:
+        """
+        Wait for a token and a concurrency slot, then time the request made inside the block.
+
+        Set ``permit.status`` (and ``permit.retry_after``) before leaving the
+        block; an exception raised inside it counts as overload.
+        """
+        waited = self.bucket.acquire()
+        self.concurrency.acquire()
+        permit = Permit()
+        started = time.monotonic()
+        failed = True
+        try:
+            yield permit
+            failed = False
+        finally:
+            overloaded = failed or permit.status in OVERLOAD_STATUSES
+            spike = self.concurrency.release(overloaded, time.monotonic() - started) and not overloaded
+            if permit.retry_after:
+                self.bucket.pause(permit.retry_after)
+            if permit.status in OVERLOAD_STATUSES:
+                REQUEST_THROTTLED.inc(host=self.host)
+            with self._lock:
+                self.stats.requests += 1
+                self.stats.waited += waited
+                self.stats.errors += failed
+                self.stats.throttled += permit.status in OVERLOAD_STATUSES
+                self.stats.spikes += spike
+                self.stats.limit = self.concurrency.limit
+                self.stats.in_flight = self.concurrency.in_flight
+
+
+class RateLimiter:
+    """
+    Registry of per-host limiters, all created with the same settings.
+
+    Args:
+        rate (float): Requests per second per host
+        burst (int): Requests allowed back to back per host
+        initial_concurrency (int): Starting concurrency limit per host
+        min_concurrency (int): Lowest concurrency limit per host
+        max_concurrency (int): Highest concurrency limit per host
+        latency_factor (float): Latency spike threshold, as a multiple of the baseline
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RATE,
+        burst: int = RATE_LIMIT_BURST,
+        initial_concurrency: int = CONCURRENCY_INITIAL,
+        min_concurrency: int = CONCURRENCY_MIN,
+        max_concurrency: int = CONCURRENCY_MAX,
+        latency_factor: float = LATENCY_SPIKE_FACTOR,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_factor = latency_factor
+        self._hosts: dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def for_url(self, url: str) -> HostLimiter:
+        """Return the limiter of the host ``url`` points to."""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                limiter = HostLimiter(
+                    host,
+                    TokenBucket(self.rate, self.burst),
+                    AdaptiveConcurrency(
+                        self.initial_concurrency,
+                        self.min_concurrency,
+                        self.max_concurrency,
+                        latency_factor=self.latency_factor,
+                    ),
+                )
+                self._hosts[host] = limiter
+            return limiter
+
+    def stats(self) -> dict[str, dict]:
+        """Counters of every host seen so far, keyed by host."""
+        with self._lock:
+            return {host: limiter.stats.as_dict() for host, limiter in self._hosts.items()}
+
+
+def parse_retry_after(value: str | None, cap: float = RETRY_MAX_DELAY) -> float | None:
+    """
+    Seconds to wait from a ``Retry-After`` header, in either delta-seconds or HTTP-date form.
+
+    The wait is capped at ``cap`` seconds, so one response asking for hours
+    doesn't stall every request to its host.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    if math.isnan(seconds):
+        return None
+    return min(cap, max(0.0, seconds))
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = RETRY_MAX_DELAY) -> float:
+    """Exponential backoff with full jitter for the given retry attempt, starting at 0."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def request_with_retries(
+    url: str,
+    send: Callable[[], T],
+    max_retries: int = REQUEST_MAX_RETRIES,
+    limiter: RateLimiter | None = None,
+) -> T:
+    """
+    Send a request through the rate limiter, retrying errors and retryable statuses.
+
+    Args:
+        url (str): URL requested, used to pick the host limiter
+        send (Callable[[], T]): Sends the request and returns a response with
+            ``status_code`` and ``headers``
+        max_retries (int): Retries after the first attempt
+        limiter (RateLimiter | None): Limiter to use, defaults to the process-wide one
+
+    Returns:
+        T: The last response, which may still have a retryable status once
+        retries are exhausted
+
+    Raises:
+        Exception: Whatever ``send`` raised on the last attempt
+    """
+    host = (limiter or get_rate_limiter()).for_url(url)
+    attempt = 0
+    while True:
+        try:
+            with host.request() as permit:
+                response = send()
+                permit.status = response.status_code
+                if permit.status in RETRY_STATUSES:
+                    permit.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        except Exception:
+            if attempt >= max_retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return response
+            # A streamed response holds its connection until closed.
+            close = getattr(response, "close", None)
+            if close is not None:
+                close()
+            if permit.retry_after:
+                # The host's bucket is paused for that long, the next attempt waits there.
+                REQUEST_RETRIES.inc(host=host.host)
+                attempt += 1
+                continue
+        REQUEST_RETRIES.inc(host=host.host)
+        time.sleep(backoff_delay(attempt))
+        attempt += 1
+
+
+_limiter: RateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter shared by scraping and image downloads."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def _collect():
+    """Export the per-host limiter state alongside the other metrics."""
+    if _limiter is None:
+        return
+    stats = _limiter.stats()
+    yield (
+        "doudesu_rate_limit_concurrency",
+        "gauge",
+        "Current adaptive concurrency limit per host",
+        [("", {"host": host}, host_stats["limit"]) for host, host_stats in stats.items()],
+    )
+    yield (
+        "doudesu_rate_limit_wait_seconds_total",
+        "counter",
+        "Seconds requests spent waiting for a rate limit token",
+        [("", {"host": host}, host_stats["waited"]) for host, host_stats in stats.items()],
+    )
+
+
+REGISTRY.add_collector(_collect)
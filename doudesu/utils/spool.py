@@ -0,0 +1,92 @@
+"""
+Spool of page images between download and encoding.
+
+Page bodies are streamed from the network in chunks into temporary files and
+hashed as they arrive, then read back through read-only memory maps: Pillow
+decodes straight from the map, and the image store links or copies the file
+without the bytes passing through Python. A chapter's pages wait for the PDF
+writer on disk rather than in memory, and each page's map is closed once the
+page is written, so memory use follows the pages in flight instead of the
+length of the chapter.
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from .constants import SPOOL_DIR
+
+
+def content_hash(data: bytes = b""):
+    """A hasher of image bytes; its hex digest identifies an image by its content."""
+    return hashlib.blake2b(data, digest_size=20)
+
+
+@dataclass(frozen=True, slots=True)
+class PageFile:
+    """
+    A page image held in a file.
+
+    Attributes:
+        path (Path): File with the image bytes
+        size (int): Size of the image bytes
+        digest (str): Hash of the image bytes, see :func:`content_hash`
+    """
+
+    path: Path
+    size: int
+    digest: str
+
+    def open(self) -> mmap.mmap:
+        """A read-only memory map of the image, usable as a binary file; closing it unmaps it."""
+        with open(self.path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PageSpool:
+    """
+    Temporary directory holding the downloaded pages of one chapter.
+
+    Use as a context manager, or call :meth:`close`; everything in it is
+    removed then, so close the images read from it first.
+
+    Args:
+        directory (str | None): Where the spool directory is made, defaults to
+            :data:`~doudesu.utils.constants.SPOOL_DIR`, or the system's
+            temporary directory when that's None
+    """
+
+    def __init__(self, directory: str | None = SPOOL_DIR):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(prefix="doudesu-spool-", dir=directory))
+
+    def write(self, chunks: Iterable[bytes]) -> PageFile:
+        """Write ``chunks`` to a new file of the spool, hashing them on the way."""
+        fd, name = tempfile.mkstemp(suffix=".page", dir=self.path)
+        hasher = content_hash()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            os.unlink(name)
+            raise
+        return PageFile(Path(name), size, hasher.hexdigest())
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self) -> "PageSpool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
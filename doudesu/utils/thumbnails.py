@@ -0,0 +1,267 @@
+"""
+Local thumbnail cache.
+
+Covers are fetched once, downscaled, and kept in a size-capped in-memory LRU
+backed by a size-capped directory on disk. A single process-wide instance
+(:func:`get_thumbnail_cache`) is shared by every GUI session, including all
+browser-mode clients, and by the API. The cache remembers which covers were
+shown in results, so the API only fetches those instead of any URL it's given.
+"""
+
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from io import BytesIO
+from pathlib import Path
+
+from .constants import (
+    THUMBNAIL_CACHE_DIR,
+    THUMBNAIL_DISK_LIMIT,
+    THUMBNAIL_KNOWN_URLS,
+    THUMBNAIL_MEMORY_LIMIT,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_SIZE,
+)
+from .metrics import CACHE_LOOKUPS
+
+
+class ThumbnailCache:
+    """
+    Two-level (memory, disk) LRU cache of downscaled JPEG thumbnails.
+
+    Args:
+        cache_dir (Path): Directory for on-disk entries
+        memory_limit (int): Maximum bytes kept in memory
+        disk_limit (int): Maximum bytes kept on disk
+        size (tuple[int, int]): Bounding box thumbnails are downscaled into
+        quality (int): JPEG quality of stored thumbnails
+        max_workers (int): Threads used for fetching and prefetching
+        known_limit (int): Cover URLs from results remembered for :meth:`allowed`
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = THUMBNAIL_CACHE_DIR,
+        memory_limit: int = THUMBNAIL_MEMORY_LIMIT,
+        disk_limit: int = THUMBNAIL_DISK_LIMIT,
+        size: tuple[int, int] = THUMBNAIL_SIZE,
+        quality: int = THUMBNAIL_QUALITY,
+        max_workers: int = 4,
+        known_limit: int = THUMBNAIL_KNOWN_URLS,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.size = size
+        self.quality = quality
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: int | None = None
+        self._inflight: dict[str, Future] = {}
+        self._known: OrderedDict[str, None] = OrderedDict()
+        self.known_limit = known_limit
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="doudesu-thumbnail")
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def cached(self, url: str) -> bytes | None:
+        """
+        Return the thumbnail for ``url`` if it's cached, without touching the network.
+
+        Returns:
+            bytes | None: JPEG bytes or None on a cache miss
+        """
+        key = self.key(url)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        path = self.path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        os.utime(path)
+        self._remember(key, data)
+        return data
+
+    def get(self, url: str) -> bytes | None:
+        """
+        Return the thumbnail for ``url``, fetching and caching it on a miss.
+
+        Concurrent callers asking for the same URL share a single fetch.
+
+        Returns:
+            bytes | None: JPEG bytes or None if the cover couldn't be fetched
+        """
+        data = self.cached(url)
+        if data is not None:
+            CACHE_LOOKUPS.inc(cache="thumbnail", result="hit")
+            return data
+        CACHE_LOOKUPS.inc(cache="thumbnail", result="miss")
+        return self._submit(url).result()
+
+    def get_base64(self, url: str) -> str | None:
+        """Return the cached thumbnail as base64, for ``ft.Image(src_base64=...)``. Never fetches."""
+        data = self.cached(url)
+        return base64.b64encode(data).decode() if data is not None else None
+
+    def allow(self, urls: Iterable[str]):
+        """Remember ``urls`` as covers shown in results, so :meth:`allowed` accepts them."""
+        with self._lock:
+            for url in urls:
+                if url:
+                    self._known[url] = None
+                    self._known.move_to_end(url)
+            while len(self._known) > self.known_limit:
+                self._known.popitem(last=False)
+
+    def allowed(self, url: str) -> bool:
+        """Whether ``url`` is a cover seen in results, or already cached."""
+        with self._lock:
+            if url in self._known:
+                return True
+        return self.cached(url) is not None
+
+    def fetch_many(self, urls: list[str], timeout: float | None = None):
+        """Fetch every missing thumbnail concurrently, waiting at most ``timeout`` seconds."""
+        self.allow(urls)
+        futures = [self._submit(url) for url in urls if url and self.cached(url) is None]
+        if futures:
+            wait(futures, timeout=timeout)
+
+    def prefetch(self, urls: list[str], on_ready: Callable[[str], None] | None = None):
+        """
+        Warm the cache for ``urls`` in the background.
+
+        Args:
+            urls (list[str]): Cover URLs
+            on_ready (Callable[[str], None] | None): Called with each URL that
+                wasn't cached yet once its thumbnail is, on a fetch thread
+        """
+        self.allow(urls)
+        for url in urls:
+            if url and self.cached(url) is None:
+                future = self._submit(url)
+                if on_ready:
+                    future.add_done_callback(lambda f, url=url: f.result() is not None and on_ready(url))
+
+    def _submit(self, url: str) -> Future:
+        key = self.key(url)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._load, url, key)
+                self._inflight[key] = future
+        return future
+
+    def _load(self, url: str, key: str) -> bytes | None:
+        try:
+            data = self._downscale(self._fetch(url))
+        except Exception:
+            data = None
+        else:
+            self._store(key, data)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return data
+
+    def _fetch(self, url: str) -> bytes:
+        # Covers come from the same image hosts as pages, so share their connection pools.
+        from .converter import get_image_downloader
+
+        response = get_image_downloader().get(url)
+        response.raise_for_status()
+        return response.content
+
+    def _downscale(self, data: bytes) -> bytes:
+        from PIL import Image
+
+        img = Image.open(BytesIO(data))
+        img.draft("RGB", self.size)
+        img.thumbnail(self.size)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = BytesIO()
+        img.save(out, "JPEG", quality=self.quality, optimize=True)
+        return out.getvalue()
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_limit and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _store(self, key: str, data: bytes):
+        self._remember(key, data)
+
+        path = self.path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(f.stat().st_size for f in self.cache_dir.glob("*/*.jpg"))
+            else:
+                self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_limit:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk cache is at 90% of its limit."""
+        entries = []
+        for f in self.cache_dir.glob("*/*.jpg"):
+            try:
+                stat = f.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, f))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_limit * 0.9
+        for _, size, f in entries:
+            if total <= target:
+                break
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+
+_cache: ThumbnailCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Return the process-wide thumbnail cache, shared by all GUI sessions and the API."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache()
+        return _cache
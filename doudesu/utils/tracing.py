@@ -0,0 +1,293 @@
+"""
+Lightweight span tracing.
+
+Spans carry OpenTelemetry-compatible trace and span IDs and are exported as
+OTLP/JSON, either appended to a local file (one ``resourceSpans`` document per
+line, the format of the collector's file exporter) or posted to a collector's
+OTLP/HTTP endpoint. Tracing is off unless configured, with ``--trace`` on the
+CLI, ``DOUDESU_TRACE_FILE`` or ``DOUDESU_OTLP_ENDPOINT``; while off,
+:func:`span` returns a shared no-op context manager.
+
+The current span lives in a context variable. Worker threads don't inherit it,
+so work handed to an executor is wrapped with :func:`wrap` to stay in the same
+trace. A chapter build then shows up as one waterfall::
+
+    python -m doudesu.utils.tracing trace.jsonl
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import urllib.request
+from collections.abc import Callable
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+SERVICE_NAME = "doudesu"
+
+# Span kinds, as in the OTLP protocol.
+INTERNAL = 1
+CLIENT = 3
+
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("doudesu_span", default=None)
+_NULL = nullcontext()
+
+
+class Span:
+    """
+    A timed operation within a trace.
+
+    Attributes:
+        name (str): Operation name, e.g. ``image.fetch``
+        trace_id (str): 32 hex digit trace ID shared by every span of the trace
+        span_id (str): 16 hex digit ID of this span
+        parent_id (str | None): Span ID of the parent, None for the root span
+        kind (int): OTLP span kind
+        attributes (dict): Key/value details, e.g. URL and byte counts
+        error (str | None): Error message if the operation raised
+    """
+
+    __slots__ = ("attributes", "end", "error", "kind", "name", "parent_id", "span_id", "start", "trace_id")
+
+    def __init__(self, name: str, parent: "Span | None", kind: int, attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = attributes
+        self.error: str | None = None
+        self.start = time.time_ns()
+        self.end: int | None = None
+
+    def set(self, **attributes):
+        """Add attributes, e.g. a status code known only once the operation is done."""
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items() if value is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _document(spans: list[Span]) -> dict:
+    """Wrap spans in an OTLP ``ExportTraceServiceRequest``."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "doudesu"}, "spans": [span.to_otlp() for span in spans]}],
+            }
+        ]
+    }
+
+
+class FileExporter:
+    """Appends finished spans to a file, one OTLP/JSON document per line, flushed in batches."""
+
+    def __init__(self, path: str | Path, batch_size: int = 64):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self._batch: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) >= self.batch_size or span.parent_id is None:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._batch:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a") as f:
+            f.write(json.dumps(_document(self._batch)) + "\n")
+        self._batch = []
+
+
+class OTLPExporter:
+    """Posts finished spans to an OTLP/HTTP collector (``/v1/traces``) from a background thread."""
+
+    def __init__(self, endpoint: str, interval: float = 2.0, batch_size: int = 256, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + ("" if endpoint.rstrip("/").endswith("/v1/traces") else "/v1/traces")
+        self.interval = interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._batch: list[Span] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name="doudesu-otlp", daemon=True).start()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._batch.append(span)
+            if len(self._batch) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if not batch:
+            return
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(_document(batch)).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError:
+            # A missing collector must never break a download.
+            pass
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+_exporter: "FileExporter | OTLPExporter | None" = None
+
+
+def configure(path: str | Path | None = None, endpoint: str | None = None):
+    """
+    Turn tracing on, exporting to the file at ``path`` or to the collector at ``endpoint``.
+
+    Pending spans are flushed at exit.
+    """
+    global _exporter
+    if path:
+        _exporter = FileExporter(path)
+    elif endpoint:
+        _exporter = OTLPExporter(endpoint)
+    else:
+        _exporter = None
+        return
+    atexit.register(_exporter.flush)
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def span(name: str, kind: int = INTERNAL, **attributes):
+    """
+    Context manager recording a span, child of the current one if any.
+
+    Yields the :class:`Span` so attributes can be added inside the block, or
+    None when tracing is off.
+    """
+    if _exporter is None:
+        return _NULL
+    return _span(name, kind, attributes)
+
+
+@contextmanager
+def _span(name: str, kind: int, attributes: dict):
+    current = Span(name, _current.get(), kind, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end = time.time_ns()
+        if _exporter is not None:
+            _exporter.export(current)
+
+
+def current_trace_id() -> str | None:
+    current = _current.get()
+    return current.trace_id if current else None
+
+
+def wrap(fn: Callable) -> Callable:
+    """Bind ``fn`` to the current span, for work submitted to another thread."""
+    if _exporter is None:
+        return fn
+    parent = _current.get()
+
+    def run(*args, **kwargs):
+        # A copied Context can only be entered by one thread at a time, so
+        # each call re-binds the parent span in the worker's own context.
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
+
+
+def print_waterfall(path: str | Path, out=sys.stdout):
+    """Print every trace in a trace file as an indented timeline."""
+    spans = []
+    for line in Path(path).read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+
+    children: dict[str | None, list[dict]] = {}
+    for item in spans:
+        children.setdefault(item.get("parentSpanId"), []).append(item)
+    for items in children.values():
+        items.sort(key=lambda item: int(item["startTimeUnixNano"]))
+
+    def show(item: dict, depth: int, origin: int, width: float):
+        start = (int(item["startTimeUnixNano"]) - origin) / 1e6
+        duration = (int(item["endTimeUnixNano"]) - int(item["startTimeUnixNano"])) / 1e6
+        offset = int(start / width * 40) if width else 0
+        bar = " " * offset + "█" * max(1, int(duration / width * 40) if width else 1)
+        failed = " !" if item["status"].get("code") == 2 else ""
+        print(f"{start:9.1f}ms {duration:9.1f}ms  {bar:<41} {'  ' * depth}{item['name']}{failed}", file=out)
+        for child in children.get(item["spanId"], []):
+            show(child, depth + 1, origin, width)
+
+    for root in children.get(None, []):
+        origin = int(root["startTimeUnixNano"])
+        width = (int(root["endTimeUnixNano"]) - origin) / 1e6
+        print(f"trace {root['traceId']}", file=out)
+        show(root, 0, origin, width)
+        print(file=out)
+
+
+configure(os.environ.get("DOUDESU_TRACE_FILE"), os.environ.get("DOUDESU_OTLP_ENDPOINT"))
+
+
+if __name__ == "__main__":
+    print_waterfall(sys.argv[1])
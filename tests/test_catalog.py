@@ -0,0 +1,129 @@
+"""Read-through catalogue of titles, chapters and images."""
+
+import pytest
+
+from doudesu.core import catalog as catalog_module
+from doudesu.core.catalog import Catalog
+from doudesu.models import DetailsRecord, DetailsResult, Result
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(tmp_path / "catalog.db")
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture(params=["fts", "like"])
+def searchable(request, tmp_path, monkeypatch):
+    """A catalogue of a few titles, searched through FTS5 or, as without FTS5, with LIKE."""
+    if request.param == "like":
+        monkeypatch.setattr(catalog_module, "FTS_SCHEMA", "CREATE VIRTUAL TABLE titles_fts USING no_such_module(name);")
+    catalog = Catalog(tmp_path / "catalog.db")
+    assert catalog.fts is (request.param == "fts")
+    catalog.put_results(
+        [
+            result("Heroic Tales", "https://example.com/manga/heroic/", genre=["Action", "Fantasy"], score=8.5),
+            result("Hero Academy", "https://example.com/manga/academy/", genre=["Comedy"], type="Manhwa", score=6.0),
+            result("Quiet Days", "https://example.com/manga/quiet/", genre=["Slice of Life"], score=9.0),
+        ]
+    )
+    catalog.put_chapters("https://example.com/manga/hero-unseen/", ["https://example.com/hero-unseen/chapter-1"])
+    yield catalog
+    catalog.close()
+
+
+def names(found) -> list[str]:
+    return sorted(r.name for r in found.results) if found else []
+
+
+def result(name: str, url: str, **fields) -> Result:
+    values = {"thumbnail": f"{url}/cover.jpg", "genre": [], "type": "Manga", "score": 7.0, "status": "Publishing"}
+    return Result(name=name, url=url, **{**values, **fields})
+
+
+def test_chapters_of_unseen_title(catalog):
+    url = "https://example.com/manga/unseen/"
+    chapters = [f"{url}chapter-{n}" for n in (1, 2, 3)]
+    assert catalog.get_chapters(url) is None
+
+    catalog.put_chapters(url, chapters)
+
+    assert catalog.get_chapters(url) == chapters
+    assert catalog.get_details(url) is None
+    assert catalog.search("") is None
+
+
+def test_chapters_survive_later_search_results(catalog):
+    url = "https://example.com/manga/later/"
+    catalog.put_chapters(url, [f"{url}chapter-1"])
+    catalog.put_results([result("Later Title", url)])
+
+    assert catalog.get_chapters(url) == [f"{url}chapter-1"]
+    assert [r.name for r in catalog.search("later").results] == ["Later Title"]
+
+
+def test_chapters_replace_previous_list(catalog):
+    url = "https://example.com/manga/known/"
+    catalog.put_results([result("Known", url)])
+    catalog.put_chapters(url, ["a", "b"])
+    catalog.put_chapters(url, ["a", "b", "c"])
+
+    assert catalog.get_chapters(url) == ["a", "b", "c"]
+
+
+def test_search_words_match_as_prefixes(searchable):
+    assert names(searchable.search("hero")) == ["Hero Academy", "Heroic Tales"]
+    assert names(searchable.search("HERO tales")) == ["Heroic Tales"]
+    assert names(searchable.search("hero days")) == []
+    assert searchable.search("nothing") is None
+
+
+def test_search_with_filters(searchable):
+    assert names(searchable.search("hero", genre="fantasy")) == ["Heroic Tales"]
+    assert names(searchable.search("hero", type="manhwa")) == ["Hero Academy"]
+    assert names(searchable.search("hero", min_score=7)) == ["Heroic Tales"]
+    assert names(searchable.search("", max_score=8)) == ["Hero Academy"]
+
+
+def test_search_pages(searchable):
+    first = searchable.search("", per_page=2)
+    assert [r.name for r in first.results] == ["Quiet Days", "Heroic Tales"]
+    assert first.next_page_url and first.previous_page_url is None
+    second = searchable.search("", page=2, per_page=2)
+    assert [r.name for r in second.results] == ["Hero Academy"]
+    assert second.next_page_url is None and second.previous_page_url
+
+
+@pytest.mark.parametrize("searchable", ["fts"], indirect=True)
+def test_fts_search_matches_genres(searchable):
+    assert names(searchable.search("slice")) == ["Quiet Days"]
+    assert [r.name for r in searchable.search("heroic").results] == ["Heroic Tales"]
+
+
+@pytest.mark.parametrize("searchable", ["like"], indirect=True)
+def test_like_search_matches_inside_words(searchable):
+    assert names(searchable.search("roic")) == ["Heroic Tales"]
+    assert names(searchable.search("acad")) == ["Hero Academy"]
+
+
+def test_details_round_trip(catalog):
+    url = "https://example.com/manga/detailed/"
+    details = DetailsResult(
+        name="Detailed",
+        url=url,
+        thumbnail=f"{url}cover.jpg",
+        genre=["Action", "Drama"],
+        series="Original",
+        author="Someone",
+        type="Manhwa",
+        score=7.5,
+        status="Publishing",
+        chapter_urls=[f"{url}chapter-1", f"{url}chapter-2"],
+    )
+    assert DetailsRecord.from_model(details).to_model() == details
+
+    catalog.put_details(details)
+    stored = catalog.get_details(url)
+    assert stored == details
+    assert stored.model_dump_json() == details.model_dump_json()
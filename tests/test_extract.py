@@ -0,0 +1,61 @@
+"""Image URL, chapter ID and chapter number extraction."""
+
+from doudesu.utils.constants import BASE_URL
+from doudesu.utils.extract import chapter_id, chapter_number, image_urls
+
+READER = b"""
+<div class="reader-area">
+<img src="https://desu.photos/storage/uploads/chapter/123/001.webp" alt="Page 1">
+<img class="lazy" data-src="https://desu.photos/storage/uploads/chapter/123/002.webp">
+<img src='https://desu.photos/storage/uploads/chapter/123/003.webp'>
+<img src=" https://desu.photos/storage/uploads/chapter/123/004 a.webp ">
+<img src="https://desu.photos/image.php?id=5&amp;w=800">
+</div>
+"""
+
+LISTING = """
+<div class="entries">
+<article><a href="/manga/title-1/"><img src="//cdn.example.com/thumb/1.webp"></a></article>
+<article><a href="/manga/title-2/"><img src="/storage/thumb/2.webp"></a></article>
+<article><a href="/manga/title-3/"><img src="thumb/3.webp"></a></article>
+<article><img src="data:image/gif;base64,R0lGODlhAQABAAAAACw="><img src=""></article>
+</div>
+"""
+
+
+def test_image_urls_from_reader():
+    assert image_urls(READER) == [
+        "https://desu.photos/storage/uploads/chapter/123/001.webp",
+        "https://desu.photos/storage/uploads/chapter/123/002.webp",
+        "https://desu.photos/storage/uploads/chapter/123/003.webp",
+        "https://desu.photos/storage/uploads/chapter/123/004%20a.webp",
+        "https://desu.photos/image.php?id=5&w=800",
+    ]
+
+
+def test_image_urls_resolves_relative_sources():
+    assert image_urls(LISTING, base=f"{BASE_URL}/manga/") == [
+        "https://cdn.example.com/thumb/1.webp",
+        f"{BASE_URL}/storage/thumb/2.webp",
+        f"{BASE_URL}/manga/thumb/3.webp",
+    ]
+    assert image_urls('<img src="/storage/1.webp">') == [f"{BASE_URL}/storage/1.webp"]
+
+
+def test_image_urls_without_images():
+    assert image_urls(b"<p>No images</p>") == []
+    assert image_urls('<img src="data:image/png;base64,iVBORw0KGgo=">') == []
+
+
+def test_chapter_id():
+    page = b"<script>var a = 1;</script><script>load_data(123456);</script>"
+    assert chapter_id(page) == 123456
+    assert chapter_id(page.decode()) == 123456
+    assert chapter_id(b"<script>load_data();</script>") is None
+
+
+def test_chapter_number():
+    assert chapter_number(f"{BASE_URL}/title-chapter-12/") == "12"
+    assert chapter_number(f"{BASE_URL}/title-chapter-12.5/") == "12.5"
+    assert chapter_number(f"{BASE_URL}/title-chapter-12-13/") == "12-13"
+    assert chapter_number(f"{BASE_URL}/title-oneshot/") is None
@@ -0,0 +1,20 @@
+"""Every mode's entry module imports cleanly."""
+
+import importlib
+
+import pytest
+
+
+@pytest.mark.parametrize("module", ["doudesu", "doudesu.__main__", "doudesu.core", "doudesu.ui.cli"])
+def test_import(module):
+    importlib.import_module(module)
+
+
+def test_import_gui():
+    pytest.importorskip("flet")
+    importlib.import_module("doudesu.ui.gui")
+
+
+def test_import_api():
+    pytest.importorskip("fastapi")
+    importlib.import_module("doudesu.api")
@@ -0,0 +1,73 @@
+"""Chapter selections and cancellation of download jobs."""
+
+import threading
+
+import pytest
+
+from doudesu.core import jobs
+from doudesu.core.jobs import JobCancelledError, JobManager, parse_chapter_selection
+
+
+def test_selection_numbers_and_ranges():
+    assert parse_chapter_selection("3", 5) == [3]
+    assert parse_chapter_selection("1-3,5", 5) == [1, 2, 3, 5]
+    assert parse_chapter_selection("3-", 5) == [3, 4, 5]
+    assert parse_chapter_selection("2-2", 5) == [2]
+    assert parse_chapter_selection("all", 3) == [1, 2, 3]
+
+
+def test_selection_latest():
+    assert parse_chapter_selection("latest", 5) == [5]
+    assert parse_chapter_selection("latest:2", 5) == [4, 5]
+    assert parse_chapter_selection("LATEST:9", 3) == [1, 2, 3]
+    assert parse_chapter_selection("1-10,15,latest:3", 20) == [*range(1, 11), 15, 18, 19, 20]
+
+
+def test_selection_drops_duplicates():
+    assert parse_chapter_selection(" 2 , 2,1 ", 4) == [1, 2]
+    assert parse_chapter_selection("1-3,2-4,latest", 4) == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("expression", ["x", "1-a", "3-1", "-2", "1--2", "latest:0", "latest:-1", "latest:x", "1.5"])
+def test_selection_invalid(expression):
+    with pytest.raises(ValueError, match="Invalid chapter selection"):
+        parse_chapter_selection(expression, 5)
+
+
+@pytest.mark.parametrize("expression", ["0", "6", "4-6", "0-2"])
+def test_selection_out_of_range(expression):
+    with pytest.raises(ValueError, match="between 1 and 5"):
+        parse_chapter_selection(expression, 5)
+
+
+def test_selection_empty():
+    with pytest.raises(ValueError, match="No chapters selected"):
+        parse_chapter_selection(" , ", 5)
+
+
+def test_queued_job_cancelled(tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    class Blocking:
+        def __init__(self, url):
+            calls.append(url)
+
+        def get_details(self):
+            started.set()
+            release.wait(5)
+
+    monkeypatch.setattr(jobs, "Doujindesu", Blocking)
+    manager = JobManager(workers=1, output_dir=str(tmp_path))
+    running = manager.submit("https://example.com/first")
+    queued = manager.submit("https://example.com/second")
+    assert started.wait(5)
+    queued.cancel()
+    release.set()
+
+    assert running.wait(5) and queued.wait(5)
+    assert running.error == "Manga not found"
+    assert queued.status == "failed" and queued.error == "Cancelled"
+    assert calls == ["https://example.com/first"]
+    with pytest.raises(JobCancelledError):
+        queued.check_cancelled()
@@ -0,0 +1,70 @@
+"""Event history of progress topics."""
+
+import asyncio
+from types import SimpleNamespace
+
+from doudesu.utils.pubsub import Topic
+
+
+def event(kind: str, n: int = 0) -> SimpleNamespace:
+    return SimpleNamespace(kind=kind, n=n)
+
+
+def kinds(items) -> list[str]:
+    return [item.kind for _, item in items]
+
+
+def test_progress_does_not_evict_boundaries():
+    topic = Topic(history=4)
+    topic.publish(event("chapter.start"))
+    for n in range(10):
+        topic.publish(event("progress", n))
+    topic.publish(event("chapter.done"))
+    for n in range(10):
+        topic.publish(event("progress", n))
+    topic.publish(event("job.done"))
+
+    assert kinds(topic.read(0)) == ["chapter.start", "chapter.done", "job.done"]
+
+
+def test_latest_progress_is_kept():
+    topic = Topic(history=2)
+    topic.publish(event("chapter.start"))
+    for n in range(5):
+        topic.publish(event("progress", n))
+
+    events = topic.read(0)
+    assert kinds(events) == ["chapter.start", "progress"]
+    assert events[-1][1].n == 4
+    assert events[-1][0] == topic.sequence
+    assert topic.read(topic.sequence) == []
+
+
+def test_history_bounds_boundary_events():
+    topic = Topic(history=2)
+    for n in range(5):
+        topic.publish(event("chapter.done", n))
+    topic.publish(event("progress"))
+
+    assert [item.n for _, item in topic.read(0)[:-1]] == [3, 4]
+
+
+def test_slow_subscriber_gets_boundaries():
+    topic = Topic(history=4)
+
+    async def consume() -> list[str]:
+        return [item.kind async for _, item in topic.subscribe()]
+
+    async def main() -> list[str]:
+        task = asyncio.create_task(consume())
+        for n in range(100):
+            topic.publish(event("progress", n))
+            if n == 50:
+                topic.publish(event("chapter.done"))
+        topic.publish(event("job.done"))
+        topic.close()
+        return await task
+
+    received = asyncio.run(main())
+    assert received.count("chapter.done") == 1
+    assert received[-1] == "job.done"
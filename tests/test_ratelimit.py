@@ -0,0 +1,35 @@
+"""Retry-After handling of the rate limiter."""
+
+import time
+from email.utils import formatdate
+
+from doudesu.utils.constants import RETRY_MAX_DELAY
+from doudesu.utils.ratelimit import TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after("5") == 5.0
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("nan") is None
+
+
+def test_parse_retry_after_is_capped():
+    assert parse_retry_after("86400") == RETRY_MAX_DELAY
+    assert parse_retry_after("inf") == RETRY_MAX_DELAY
+    assert parse_retry_after(formatdate(time.time() + 86400, usegmt=True)) == RETRY_MAX_DELAY
+    assert parse_retry_after("120", cap=60.0) == 60.0
+
+
+def test_parse_retry_after_date():
+    assert 0 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after(formatdate(time.time() - 10, usegmt=True)) == 0.0
+
+
+def test_pause_is_capped():
+    bucket = TokenBucket(rate=10.0, burst=1, max_pause=0.05)
+    bucket.pause(86400)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start < 1.0
@@ -0,0 +1,89 @@
+"""ETags, 304s and content encodings of cached API responses."""
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from doudesu.api import responses
+from doudesu.api.responses import COMPRESSORS, ResponseCache, negotiate_encoding
+from doudesu.utils.constants import COMPRESS_MIN_SIZE
+
+
+@pytest.fixture
+def client() -> TestClient:
+    cache = ResponseCache(ttl=60)
+    app = FastAPI()
+
+    @app.get("/items/{size}")
+    def item(size: int, request: Request):
+        return cache.get(size, request) or cache.put(size, {"data": "x" * size}, request)
+
+    return TestClient(app)
+
+
+def test_ok_with_etag(client):
+    first = client.get("/items/10", headers={"Accept-Encoding": "identity"})
+    assert first.status_code == 200
+    assert first.json() == {"data": "x" * 10}
+    assert first.headers["etag"].startswith('"') and "-" not in first.headers["etag"]
+    assert first.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in first.headers
+
+    again = client.get("/items/10", headers={"Accept-Encoding": "identity"})
+    assert again.status_code == 200
+    assert again.headers["etag"] == first.headers["etag"]
+
+
+def test_not_modified(client):
+    etag = client.get("/items/10").headers["etag"]
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/items/10", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304, if_none_match
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    response = client.get("/items/10", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get(f"/items/{COMPRESS_MIN_SIZE // 2}", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.parametrize("encoding", ["br", "zstd", "gzip"])
+def test_encoding(client, encoding):
+    if encoding not in COMPRESSORS:
+        pytest.skip(f"{encoding} compressor not installed")
+    size = COMPRESS_MIN_SIZE * 4
+    response = client.get(f"/items/{size}", headers={"Accept-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].endswith(f'-{encoding}"')
+    assert response.json() == {"data": "x" * size}
+    assert int(response.headers["content-length"]) < size
+
+    identity = client.get(f"/items/{size}", headers={"Accept-Encoding": "identity"})
+    assert identity.headers["etag"] != response.headers["etag"]
+    # Any representation of the entry revalidates it.
+    revalidated = client.get(
+        f"/items/{size}", headers={"Accept-Encoding": encoding, "If-None-Match": identity.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == response.headers["etag"]
+
+
+def test_negotiate_encoding(monkeypatch):
+    monkeypatch.setattr(responses, "COMPRESSORS", dict.fromkeys(("br", "zstd", "gzip")))
+    assert negotiate_encoding("gzip, zstd, br") == "br"
+    assert negotiate_encoding("gzip;q=0.5, zstd") == "zstd"
+    assert negotiate_encoding("br;q=0, gzip") == "gzip"
+    assert negotiate_encoding("*") == "br"
+    assert negotiate_encoding("*, br;q=0") == "zstd"
+    assert negotiate_encoding("gzip;q=bad") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None